@@ -4,19 +4,25 @@ Main service entry point implementing 9-stage processing pipeline
 """
 
 import asyncio
+import hmac
+import json
 import logging
 import os
 from pathlib import Path
+from typing import List
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.pipeline.document_processor import DocumentProcessor
+from src.pipeline.job_queue import QueueFullError, ServiceDrainingError
+from src.storage.file_manager import FileTooLargeError
+from src.storage.page_images import PageRenderError
 from src.config.settings import Settings
-from src.models.response_models import ProcessingResponse, QualityResponse
+from src.models.response_models import BatchResponse, ProcessingResponse, QualityResponse
 from src.utils.logger import setup_logger
 
 # Setup logging
@@ -25,6 +31,18 @@ logger = setup_logger(__name__)
 # Global processor instance
 processor: DocumentProcessor = None
 
+# Allowance for multipart boundaries and form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Endpoints whose request bodies are checked against the size limits
+UPLOAD_PATHS = ("/api/v1/process/document", "/api/v1/process/batch")
+
+# Idle seconds between SSE keep-alive comments (keeps proxies from closing the stream)
+SSE_HEARTBEAT_SECONDS = 15.0
+
+# Upper bound for long-poll status requests
+MAX_STATUS_WAIT_SECONDS = 60.0
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,10 +50,10 @@ async def lifespan(app: FastAPI):
     global processor
     logger.info("Starting CotAi Edge AI Service")
     
-    # Initialize processor
+    # Initialize processor; models load in the background so probes answer right away
     settings = Settings()
     processor = DocumentProcessor(settings)
-    await processor.initialize()
+    await processor.initialize(load_models_in_background=True)
     
     yield
     
@@ -62,19 +80,67 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject uploads by Content-Length before the multipart body is read"""
+    if request.method == "POST" and request.url.path in UPLOAD_PATHS:
+        content_length = request.headers.get("content-length", "")
+        max_size = processor.settings.max_file_size
+        if request.url.path == "/api/v1/process/batch":
+            max_size *= processor.settings.max_batch_documents
+        if content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds maximum size of {max_size} bytes"}
+            )
+    
+    return await call_next(request)
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; 503 with drain progress while shutting down"""
+    if processor is not None and processor.draining:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "draining", "service": "cotai-edge-ai",
+                     "drain": processor.drain_status()}
+        )
     return {"status": "healthy", "service": "cotai-edge-ai"}
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: answers as soon as the server runs; 503 if model loading failed"""
+    if processor is not None and processor.startup_error:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed", "service": "cotai-edge-ai", "error": processor.startup_error}
+        )
+    return {"status": "alive", "service": "cotai-edge-ai"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once models are loaded and warm, 503 while starting,
+    draining or when the processing queue is full
+    """
+    readiness = await processor.readiness()
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"service": "cotai-edge-ai", **readiness})
+    return {"service": "cotai-edge-ai", **readiness}
+
+
 @app.post("/api/v1/process/document", response_model=ProcessingResponse)
 async def process_document(
     file: UploadFile = File(...),
     ano: int = Form(None),
     uasg: str = Form(None),
     numero_pregao: str = Form(None),
-    callback_url: str = Form(None)
+    callback_url: str = Form(None),
+    tenant_id: str = Form(None),
+    profile: str = Form(None)
 ):
     """
     Process document using 9-stage Docling pipeline
@@ -85,6 +151,8 @@ async def process_document(
         uasg: UASG code for organization (optional)
         numero_pregao: Tender number for organization (optional)
         callback_url: URL for completion callback (optional)
+        tenant_id: Scheduling tenant, defaults to the UASG (optional)
+        profile: Pipeline profile, e.g. fast, balanced or accurate (optional)
     
     Returns:
         ProcessingResponse with task_id and initial status
@@ -102,34 +170,200 @@ async def process_document(
             "ano": ano,
             "uasg": uasg,
             "numero_pregao": numero_pregao,
-            "callback_url": callback_url
+            "callback_url": callback_url,
+            "tenant_id": tenant_id,
+            "profile": profile
         }
         
-        # Start processing
+        # Queue processing
         task_id = await processor.process_document(file, context)
         
         return ProcessingResponse(
             task_id=task_id,
-            status="processing",
-            message="Document processing started"
+            status="pending",
+            message="Document queued for processing"
         )
         
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceDrainingError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejecting document, processing queue is full: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/process/batch", response_model=BatchResponse)
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    ano: int = Form(None),
+    uasg: str = Form(None),
+    numero_pregao: str = Form(None),
+    callback_url: str = Form(None),
+    tenant_id: str = Form(None),
+    profile: str = Form(None)
+):
+    """
+    Process several documents of one procurement (edital plus annexes)
+    
+    Args:
+        files: PDF documents and/or ZIP archives of PDFs
+        ano: Year for organization (optional)
+        uasg: UASG code for organization (optional)
+        numero_pregao: Tender number for organization (optional)
+        callback_url: URL for per-document completion callbacks (optional)
+        tenant_id: Scheduling tenant, defaults to the UASG (optional)
+        profile: Pipeline profile, e.g. fast, balanced or accurate (optional)
+    
+    Returns:
+        BatchResponse with batch_id and one task per document
+    """
+    try:
+        context = {
+            "ano": ano,
+            "uasg": uasg,
+            "numero_pregao": numero_pregao,
+            "callback_url": callback_url,
+            "tenant_id": tenant_id,
+            "profile": profile
+        }
+        
+        batch = await processor.process_batch(files, context)
+        
+        return BatchResponse(
+            batch_id=batch["batch_id"],
+            status="pending",
+            message=f"{len(batch['documents'])} documents queued for processing",
+            documents=batch["documents"],
+            skipped=batch["skipped"]
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServiceDrainingError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejecting batch, processing queue is full: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/process/batch/{batch_id}/status")
+async def get_batch_status(batch_id: str):
+    """Aggregated status and progress of a batch and its documents"""
+    try:
+        return await processor.get_batch_status(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting batch status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/v1/process/{task_id}/status")
-async def get_processing_status(task_id: str):
-    """Get processing status for a task"""
+async def get_processing_status(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=MAX_STATUS_WAIT_SECONDS),
+    since_version: int = Query(None)
+):
+    """
+    Get processing status for a task, including its queue position while pending
+    
+    With wait > 0 the request is held until the task version exceeds
+    since_version (or changes from its current version when omitted), the task
+    finishes, or wait seconds pass. Clients pass back the returned version.
+    """
     try:
-        status = await processor.get_task_status(task_id)
+        status = await processor.get_task_status(task_id, wait=wait, since_version=since_version)
         return status
     except Exception as e:
         logger.error(f"Error getting task status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete("/api/v1/process/{task_id}")
+async def cancel_processing(task_id: str):
+    """
+    Cancel a queued or running task
+    
+    Queued work is withdrawn and running work is stopped, freeing its worker
+    slot. Finished tasks cannot be cancelled (409).
+    """
+    try:
+        if not await processor.cancel_task(task_id):
+            raise HTTPException(status_code=409, detail=f"Task {task_id} has already finished")
+        return {"task_id": task_id, "status": "cancelled"}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error cancelling task: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/process/{task_id}/events")
+async def stream_processing_events(task_id: str):
+    """
+    Server-Sent Events stream of task progress
+    
+    Emits a "status" event on every stage transition (stage id, name, progress,
+    stage timings so far) and a final "completed", "failed" or "cancelled"
+    event carrying the result location, then closes.
+    """
+    events = processor.watch_task(task_id, SSE_HEARTBEAT_SECONDS)
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    
+    def format_event(task) -> str:
+        data = task.to_dict()
+        event = "status"
+        if task.status in ("completed", "failed", "cancelled"):
+            event = task.status
+            if task.status == "completed":
+                data["result_url"] = f"/api/v1/process/{task_id}/result"
+        return f"event: {event}\nid: {task.version}\ndata: {json.dumps(data)}\n\n"
+    
+    async def stream():
+        try:
+            yield format_event(first)
+            async for task in events:
+                yield ": keep-alive\n\n" if task is None else format_event(task)
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/v1/process/{task_id}/quality", response_model=QualityResponse)
 async def get_quality_scores(task_id: str):
     """Get quality scores and confidence metrics for a processed document"""
@@ -152,6 +386,81 @@ async def get_processing_result(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/process/{task_id}/pages/{page_number}.png")
+async def get_page_image(task_id: str, page_number: int, dpi: int = Query(150)):
+    """
+    Render a page (1-based) of the original document as PNG
+    
+    Pages are rasterized on first request and served from a disk cache after
+    that; dpi is bounded by PAGE_IMAGE_MAX_DPI. Works for queued and running
+    tasks too, since only the stored original is read.
+    """
+    try:
+        image = await processor.get_page_image(task_id, page_number, dpi)
+        return Response(
+            content=image,
+            media_type="image/png",
+            headers={"Cache-Control": "private, max-age=86400"}
+        )
+    except PageRenderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rendering page image: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/metrics/queue")
+async def get_queue_metrics():
+    """Queue depth and per-tenant fair-share metrics"""
+    try:
+        return await processor.get_queue_stats()
+    except Exception as e:
+        logger.error(f"Error getting queue metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/metrics/callbacks")
+async def get_callback_metrics():
+    """Callback delivery success rate, retries and latency"""
+    return processor.get_callback_stats()
+
+
+@app.get("/api/v1/metrics/cache")
+async def get_cache_metrics():
+    """Extraction artifact, result and page image cache hit/miss counters"""
+    return processor.get_cache_stats()
+
+
+def require_admin(authorization: str = Header(None)):
+    """Admin endpoints need ADMIN_TOKEN as a bearer token and are disabled without it"""
+    token = processor.settings.admin_token
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@app.post("/api/v1/admin/drain", status_code=202, dependencies=[Depends(require_admin)])
+async def drain_service():
+    """
+    Stop admitting work and let running jobs finish ahead of a shutdown
+    
+    Meant for deploy pre-stop hooks: /health reports progress and turns 503
+    so load balancers stop routing uploads here. SIGTERM drains as well.
+    Requires the ADMIN_TOKEN bearer token; a drain cannot be undone.
+    """
+    processor.start_drain()
+    return processor.drain_status()
+
+
 @app.post("/api/v1/models/download")
 async def download_models():
     """Download and cache Docling models"""
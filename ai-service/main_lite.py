@@ -40,6 +40,16 @@ async def health_check():
         "timestamp": time.time()
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe (same path as the full service)"""
+    return {"status": "alive", "timestamp": time.time()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe; the lite service loads no models, so it is always ready"""
+    return {"status": "ready", "timestamp": time.time()}
+
 @app.post("/api/v1/process/document")
 async def process_document_lite(
     file: UploadFile = File(...),
@@ -4,7 +4,7 @@ Configuration settings for CotAi Edge AI Service
 
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -24,6 +24,7 @@ class Settings(BaseSettings):
     # Docling Configuration
     docling_artifacts_path: Optional[str] = Field(default=None, env="DOCLING_ARTIFACTS_PATH")
     enable_remote_services: bool = Field(default=False, env="DOCLING_ENABLE_REMOTE_SERVICES")
+    model_warmup: bool = Field(default=True, env="MODEL_WARMUP")  # load models and convert a built-in PDF at startup
     
     # OCR Configuration
     ocr_engine: str = Field(default="easyocr", env="OCR_ENGINE")  # easyocr, tesseract, rapidocr
@@ -34,6 +35,58 @@ class Settings(BaseSettings):
     max_file_size: int = Field(default=50_000_000, env="MAX_FILE_SIZE")  # 50MB
     max_pages: int = Field(default=1000, env="MAX_PAGES")
     num_threads: int = Field(default=4, env="OMP_NUM_THREADS")
+    extraction_workers: int = Field(default=0, env="EXTRACTION_WORKERS")  # 0 = cpu_count // num_threads
+    split_page_threshold: int = Field(default=100, env="SPLIT_PAGE_THRESHOLD")  # 0 = never split
+    split_window_pages: int = Field(default=50, env="SPLIT_WINDOW_PAGES")
+    text_fast_path: bool = Field(default=True, env="TEXT_FAST_PATH")  # convert born-digital PDFs without OCR
+    text_fast_path_coverage: float = Field(default=0.95, env="TEXT_FAST_PATH_COVERAGE")  # min share of pages with a text layer
+    adaptive_ocr: bool = Field(default=True, env="ADAPTIVE_OCR")  # below that share, OCR only the scanned pages
+    adaptive_ocr_min_run: int = Field(default=3, env="ADAPTIVE_OCR_MIN_RUN")  # shorter digital runs are OCRed with their neighbours
+    max_processing_time: int = Field(default=3600, env="MAX_PROCESSING_TIME")  # seconds per attempt, 0 = no deadline
+    
+    # Job Queue Configuration
+    max_concurrent_jobs: int = Field(default=2, env="MAX_CONCURRENT_JOBS")
+    max_queue_depth: int = Field(default=20, env="MAX_QUEUE_DEPTH")
+    estimated_job_seconds: float = Field(default=120.0, env="ESTIMATED_JOB_SECONDS")  # Retry-After seed
+    max_batch_documents: int = Field(default=100, env="MAX_BATCH_DOCUMENTS")
+    shutdown_grace_period: float = Field(default=60.0, env="SHUTDOWN_GRACE_PERIOD")  # seconds running jobs get to finish on shutdown
+    
+    # Scheduling (job cost = scanned-page equivalents, estimated before conversion)
+    small_job_cost: float = Field(default=20.0, env="SMALL_JOB_COST")  # fast-lane threshold
+    small_lane_slots: int = Field(default=1, env="SMALL_LANE_SLOTS")  # pipeline slots reserved for small jobs
+    job_cost_weight_seconds: float = Field(default=1.0, env="JOB_COST_WEIGHT_SECONDS")  # aging: queue delay per cost unit
+    
+    # Pipeline profiles selectable per request (profile form field); JSON object of name -> options:
+    # ocr none|auto|full, table_structure, table_mode fast|accurate, picture_images,
+    # analyzers (subset of risks, opportunities, product_tables). Omitted options keep their defaults.
+    pipeline_profiles: Dict[str, Dict[str, Any]] = Field(default={
+        "fast": {"ocr": "none", "table_mode": "fast", "analyzers": []},
+        "balanced": {},
+        "accurate": {"ocr": "full", "picture_images": True}
+    }, env="PIPELINE_PROFILES")
+    default_pipeline_profile: str = Field(default="balanced", env="DEFAULT_PIPELINE_PROFILE")
+    
+    # Tenant fair sharing (tenant = explicit tenant_id, else UASG); JSON maps such as {"980123": 2}
+    tenant_weights: Dict[str, float] = Field(default_factory=dict, env="TENANT_WEIGHTS")
+    default_tenant_weight: float = Field(default=1.0, env="DEFAULT_TENANT_WEIGHT")
+    tenant_max_concurrent: int = Field(default=0, env="TENANT_MAX_CONCURRENT")  # per-tenant running jobs, 0 = no cap
+    tenant_concurrency_limits: Dict[str, int] = Field(default_factory=dict, env="TENANT_CONCURRENCY_LIMITS")
+    
+    # Execution Mode: embedded runs pipelines in the API process, distributed
+    # makes the API a producer for `python -m src.worker` processes
+    execution_mode: str = Field(default="embedded", env="EXECUTION_MODE")  # embedded, distributed
+    job_visibility_timeout: int = Field(default=300, env="JOB_VISIBILITY_TIMEOUT")  # seconds
+    job_max_attempts: int = Field(default=3, env="JOB_MAX_ATTEMPTS")
+    
+    # Callback Delivery (outbox under STORAGE_ROOT_PATH/outbox, at-least-once)
+    callback_timeout: float = Field(default=30.0, env="CALLBACK_TIMEOUT")  # seconds per POST
+    callback_max_attempts: int = Field(default=8, env="CALLBACK_MAX_ATTEMPTS")
+    callback_retry_base: float = Field(default=1.0, env="CALLBACK_RETRY_BASE")  # first backoff, doubles per attempt
+    callback_max_backoff: float = Field(default=300.0, env="CALLBACK_MAX_BACKOFF")
+    callback_max_per_host: int = Field(default=4, env="CALLBACK_MAX_PER_HOST")  # concurrent POSTs per receiver
+    callback_batch_window: float = Field(default=0.0, env="CALLBACK_BATCH_WINDOW")  # seconds to coalesce per URL, 0 = off
+    callback_batch_max: int = Field(default=100, env="CALLBACK_BATCH_MAX")
+    callback_outbox_lease: float = Field(default=60.0, env="CALLBACK_OUTBOX_LEASE")  # idle seconds before another process adopts an entry
     
     # Quality Thresholds
     quality_threshold_excellent: float = Field(default=0.9, env="QUALITY_THRESHOLD_EXCELLENT")
@@ -44,6 +97,12 @@ class Settings(BaseSettings):
     storage_root_path: str = Field(default="./storage", env="STORAGE_ROOT_PATH")
     temp_directory_path: str = Field(default="./temp", env="TEMP_DIRECTORY_PATH")
     results_directory_path: str = Field(default="./results", env="RESULTS_DIRECTORY_PATH")
+    artifact_cache_enabled: bool = Field(default=True, env="ARTIFACT_CACHE_ENABLED")
+    artifact_cache_max_bytes: int = Field(default=2 * 1024 * 1024 * 1024, env="ARTIFACT_CACHE_MAX_BYTES")  # 2GB
+    result_cache_max_bytes: int = Field(default=256 * 1024 * 1024, env="RESULT_CACHE_MAX_BYTES")  # parsed results in memory, 0 = off
+    page_image_cache_max_bytes: int = Field(default=512 * 1024 * 1024, env="PAGE_IMAGE_CACHE_MAX_BYTES")  # rendered page PNGs, 512MB
+    page_image_max_dpi: int = Field(default=300, env="PAGE_IMAGE_MAX_DPI")
+    enable_checkpoints: bool = Field(default=True, env="ENABLE_CHECKPOINTS")  # per-stage checkpoints, resume on restart
     
     # Database Configuration
     supabase_url: str = Field(env="SUPABASE_URL")
@@ -53,6 +112,12 @@ class Settings(BaseSettings):
     # Redis Configuration
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
     cache_ttl: int = Field(default=3600, env="CACHE_TTL")  # 1 hour
+    redis_key_prefix: str = Field(default="cotai:", env="REDIS_KEY_PREFIX")
+    
+    # Task Registry Configuration
+    task_store_backend: str = Field(default="memory", env="TASK_STORE_BACKEND")  # memory, redis
+    task_store_max_entries: int = Field(default=10_000, env="TASK_STORE_MAX_ENTRIES")
+    enable_deduplication: bool = Field(default=True, env="ENABLE_DEDUPLICATION")  # reuse results by content hash
     
     # LLM Configuration
     llm_model: str = Field(default="llama-3.2", env="LLM_MODEL")
@@ -62,6 +127,7 @@ class Settings(BaseSettings):
     
     # Security
     jwt_secret: str = Field(env="JWT_SECRET")
+    admin_token: Optional[str] = Field(default=None, env="ADMIN_TOKEN")  # bearer token for /api/v1/admin/*, unset = disabled
     allowed_origins: List[str] = Field(default=["*"], env="ALLOWED_ORIGINS")
     
     # Monitoring
@@ -95,6 +161,22 @@ class Settings(BaseSettings):
         """Get temp path as Path object"""
         return Path(self.temp_directory_path)
     
+    def extraction_output_settings(self) -> Dict[str, Any]:
+        """
+        Settings besides the pipeline profile that change extraction output;
+        part of the artifact cache and duplicate detection keys
+        """
+        return {
+            "ocr_engine": self.ocr_engine,
+            # Window boundaries change layout and table detection at the seams
+            "split": [self.split_page_threshold, self.split_window_pages],
+            # Decide which documents and pages skip OCR
+            "text_fast_path": [self.text_fast_path, self.text_fast_path_coverage],
+            "adaptive_ocr": [self.adaptive_ocr, self.adaptive_ocr_min_run],
+            "quality_thresholds": [self.quality_threshold_excellent, self.quality_threshold_good,
+                                   self.quality_threshold_fair]
+        }
+    
     def get_storage_path(self, ano: Optional[int] = None, uasg: Optional[str] = None, 
                         numero_pregao: Optional[str] = None) -> Path:
         """Get organized storage path"""
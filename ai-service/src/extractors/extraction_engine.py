@@ -0,0 +1,300 @@
+"""
+Process-pool extraction engine for Docling conversions
+Keeps OCR, layout and table models off the API event loop
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from ..config.settings import Settings
+from .pdf_splitter import (
+    PageWindow,
+    count_pages,
+    merge_extraction_results,
+    plan_ocr_windows,
+    plan_windows,
+    write_windows
+)
+from .text_layer import measure_text_layer
+from ..models.extraction_models import ExtractionResult
+from ..models.pipeline_models import PipelineProfile
+from ..utils.logger import setup_logger
+
+if TYPE_CHECKING:
+    from .docling_extractor import DoclingExtractor
+
+logger = setup_logger(__name__)
+
+# Extractor owned by the current worker process, created by the pool initializer
+_worker_extractor: Optional["DoclingExtractor"] = None
+
+# Model load and warm-up timings of the current worker process
+_worker_warmup: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(settings: Settings):
+    """Pool initializer: build and warm up the converters once per worker process"""
+    global _worker_extractor, _worker_warmup
+    
+    # Docling, spaCy and torch are only imported here, never in the API process
+    from .docling_extractor import DoclingExtractor
+    
+    # Each worker gets its own share of the CPU threads
+    os.environ["OMP_NUM_THREADS"] = str(settings.num_threads)
+    
+    _worker_extractor = DoclingExtractor(settings)
+    _worker_extractor.initialize_sync()
+    if settings.model_warmup:
+        _worker_warmup = _worker_extractor.warm_up_sync()
+
+
+def _worker_ready() -> Dict[str, Any]:
+    """No-op task used to force worker processes to start; describes the worker"""
+    return {
+        "pid": os.getpid(),
+        "fingerprints": _worker_extractor.pipeline_fingerprints(),
+        "warmup": _worker_warmup
+    }
+
+
+def _extract_in_worker(file_path: str, filename: str, ocr: bool = True,
+                       profile: Optional[str] = None) -> ExtractionResult:
+    """Run stages 1-3 inside a worker process"""
+    return _worker_extractor.extract_document_sync(Path(file_path), filename, ocr, profile)
+
+
+def _download_models_in_worker():
+    """Trigger model downloads inside a worker process"""
+    _worker_extractor.download_models_sync()
+
+
+class ExtractionEngine:
+    """
+    Runs Docling extraction in a pool of worker processes.
+    
+    Every worker owns a pre-initialized DocumentConverter, so N documents can be
+    converted in parallel across cores while the API event loop stays responsive.
+    Each worker is a single-process executor handed out to one conversion at a
+    time: when a conversion is cancelled (deadline or client cancel) or its
+    process dies, that process is killed and replaced without touching the
+    conversions running in the other workers.
+    """
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.max_workers = self._resolve_worker_count()
+        self._executors: List[ProcessPoolExecutor] = []
+        self._idle: Optional[asyncio.Queue] = None
+        
+        # Warm-up report of the first worker (None with MODEL_WARMUP=false)
+        self.warmup: Optional[Dict[str, Any]] = None
+        
+        # Pipeline profiles, and the converter configuration the workers run
+        # for each (reported by them so this process does not import Docling)
+        self.profiles = PipelineProfile.from_settings(settings)
+        self.default_profile = self.profiles[settings.default_pipeline_profile]
+        self.fingerprints: Dict[str, str] = {}
+    
+    def _resolve_worker_count(self) -> int:
+        """Use EXTRACTION_WORKERS or split the available cores by OMP_NUM_THREADS"""
+        if self.settings.extraction_workers > 0:
+            return self.settings.extraction_workers
+        
+        cpu_count = os.cpu_count() or 1
+        return max(1, cpu_count // max(1, self.settings.num_threads))
+    
+    def _new_executor(self) -> ProcessPoolExecutor:
+        """Single worker process with its own converter"""
+        # spawn avoids forking a process that already runs an event loop and model threads
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.settings,)
+        )
+    
+    async def initialize(self):
+        """Start the worker processes and wait for every converter to be loaded and warm"""
+        logger.info(f"Starting extraction engine with {self.max_workers} worker processes")
+        
+        self._executors = [self._new_executor() for _ in range(self.max_workers)]
+        self._idle = asyncio.Queue()
+        
+        loop = asyncio.get_running_loop()
+        workers = await asyncio.gather(*[
+            loop.run_in_executor(executor, _worker_ready)
+            for executor in self._executors
+        ])
+        
+        for executor in self._executors:
+            self._idle.put_nowait(executor)
+        
+        self.fingerprints = workers[0]["fingerprints"]
+        self.warmup = workers[0]["warmup"]
+        if self.warmup is not None:
+            logger.info(f"Docling models warmed up: {self.warmup}")
+        logger.info(f"Extraction engine ready, worker pids: {sorted(worker['pid'] for worker in workers)}")
+    
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Run fn in the next idle worker process
+        
+        If the caller is cancelled while fn runs, the worker process is killed
+        so the conversion stops consuming CPU, and a fresh worker takes its place.
+        """
+        if self._idle is None:
+            raise RuntimeError("Extraction engine is not initialized")
+        
+        executor = await self._idle.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except asyncio.CancelledError:
+            executor = self._replace(executor, "conversion cancelled")
+            raise
+        except BrokenProcessPool:
+            executor = self._replace(executor, "worker process died")
+            raise
+        finally:
+            if self._idle is not None:
+                self._idle.put_nowait(executor)
+    
+    def _replace(self, executor: ProcessPoolExecutor, reason: str) -> ProcessPoolExecutor:
+        """Kill a worker process and start a replacement"""
+        # ProcessPoolExecutor cannot interrupt a running call, so stop the process itself
+        processes = list((executor._processes or {}).values())
+        for process in processes:
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        replacement = self._new_executor()
+        if executor in self._executors:
+            self._executors[self._executors.index(executor)] = replacement
+        
+        # Load and warm up the converter now rather than on the next job
+        replacement.submit(_worker_ready)
+        logger.warning(f"Replaced extraction worker {[p.pid for p in processes]}: {reason}")
+        return replacement
+    
+    async def extract(self, file_path: Path, filename: str,
+                      profile: Optional[PipelineProfile] = None) -> ExtractionResult:
+        """
+        Execute stages 1-3 in a worker process
+        
+        Only the path crosses the process boundary; the worker reads the file itself.
+        With the profile's ocr set to auto, PDFs whose text layer covers at
+        least TEXT_FAST_PATH_COVERAGE of their pages are converted without OCR,
+        and in other mixed PDFs only the runs of scanned pages are OCRed
+        (ADAPTIVE_OCR). Profiles with ocr none or full skip that inspection.
+        PDFs longer than SPLIT_PAGE_THRESHOLD pages are converted as page
+        windows spread over the pool.
+        """
+        if self._idle is None:
+            raise RuntimeError("Extraction engine is not initialized")
+        
+        profile = profile or self.default_profile
+        ocr = profile.ocr != "none"
+        
+        if file_path.suffix.lower() != ".pdf":
+            return await self._run(_extract_in_worker, str(file_path), filename, ocr, profile.name)
+        
+        threshold = self.settings.split_page_threshold
+        window_pages = self.settings.split_window_pages if threshold > 0 else None
+        windows: Optional[List[PageWindow]] = None
+        page_count = None
+        
+        if self.settings.text_fast_path and profile.ocr == "auto":
+            coverage = await asyncio.to_thread(measure_text_layer, file_path)
+            page_count = coverage.pages or None
+            if coverage.pages and coverage.ratio >= self.settings.text_fast_path_coverage:
+                ocr = False
+            elif self.settings.adaptive_ocr and any(coverage.text_pages):
+                # Short PDFs are only split where OCR starts or stops
+                if coverage.pages <= threshold:
+                    window_pages = None
+                windows = plan_ocr_windows(coverage.text_pages, window_pages,
+                                           self.settings.adaptive_ocr_min_run)
+                if len(windows) == 1:
+                    ocr, windows = windows[0].ocr, None
+            
+            if windows:
+                ocr_pages = sum(window.num_pages for window in windows if window.ocr)
+            else:
+                ocr_pages = coverage.pages if ocr else 0
+            logger.info(f"{filename}: text layer on {coverage.ratio:.0%} of {coverage.pages} pages, "
+                        f"OCR on {ocr_pages} pages")
+        
+        if windows is None and threshold > 0:
+            if page_count is None:
+                page_count = await asyncio.to_thread(count_pages, file_path)
+            if page_count > threshold:
+                windows = plan_windows(page_count, self.settings.split_window_pages, ocr)
+        
+        if windows:
+            return await self._extract_windows(file_path, filename, windows, profile.name)
+        
+        return await self._run(_extract_in_worker, str(file_path), filename, ocr, profile.name)
+    
+    async def _extract_windows(self, file_path: Path, filename: str,
+                               windows: List[PageWindow], profile: str) -> ExtractionResult:
+        """Convert page windows in parallel worker processes and merge the results"""
+        start_time = time.time()
+        logger.info(f"Splitting {filename} ({windows[-1].end_page} pages) into {len(windows)} windows")
+        
+        Path(self.settings.temp_directory_path).mkdir(parents=True, exist_ok=True)
+        window_dir = Path(tempfile.mkdtemp(prefix="windows_", dir=self.settings.temp_directory_path))
+        try:
+            window_paths = await asyncio.to_thread(write_windows, file_path, windows, window_dir)
+            
+            # Leave pool workers for small documents (fast lane) while windows run
+            reserved = min(max(0, self.settings.small_lane_slots), self.max_workers - 1)
+            window_slots = asyncio.Semaphore(self.max_workers - reserved)
+            
+            async def convert(path: Path, window: PageWindow) -> ExtractionResult:
+                async with window_slots:
+                    return await self._run(_extract_in_worker, str(path), filename, window.ocr, profile)
+            
+            tasks = [
+                asyncio.create_task(convert(path, window))
+                for path, window in zip(window_paths, windows)
+            ]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                # One window failed (or the job was cancelled): stop the others
+                # before their input files are removed below
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            
+            result = await asyncio.to_thread(
+                merge_extraction_results, results, windows, filename, self.settings
+            )
+        finally:
+            await asyncio.to_thread(shutil.rmtree, window_dir, True)
+        
+        result.total_processing_time = time.time() - start_time
+        logger.info(f"Merged {len(windows)} windows of {filename} in {result.total_processing_time:.2f}s")
+        return result
+    
+    async def download_models(self):
+        """Download and cache Docling models using a worker process"""
+        await self._run(_download_models_in_worker)
+    
+    async def shutdown(self):
+        """Stop worker processes"""
+        if self._idle is None:
+            return
+        
+        logger.info("Shutting down extraction engine")
+        executors, self._executors, self._idle = self._executors, [], None
+        for executor in executors:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
@@ -0,0 +1,274 @@
+"""
+Page-window splitting for large and mixed scanned/digital PDFs
+Cuts a document into page ranges with pypdfium2 and merges per-window extractions back
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pypdfium2 as pdfium
+
+from ..config.settings import Settings
+from ..models.extraction_models import (
+    ExtractionResult,
+    ProcessingStage,
+    QualityScores
+)
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Docling document lists addressed by JSON pointers such as "#/texts/12"
+_ITEM_LISTS = ("texts", "tables", "pictures", "groups", "key_value_items", "form_items")
+_REF_PATTERN = re.compile(r"^#/(\w+)/(\d+)$")
+
+
+@dataclass
+class PageWindow:
+    """Contiguous 1-based, inclusive page range of the source document"""
+    start_page: int
+    end_page: int
+    ocr: bool = True  # False when every page of the window has a usable text layer
+    
+    @property
+    def page_offset(self) -> int:
+        """Amount added to window-local page numbers to get document page numbers"""
+        return self.start_page - 1
+    
+    @property
+    def num_pages(self) -> int:
+        return self.end_page - self.start_page + 1
+
+
+def count_pages(file_path: Path) -> int:
+    """Number of pages in a PDF"""
+    pdf = pdfium.PdfDocument(str(file_path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def plan_windows(page_count: int, window_pages: int, ocr: bool = True) -> List[PageWindow]:
+    """Split page_count pages into windows of at most window_pages pages"""
+    return [
+        PageWindow(start, min(start + window_pages - 1, page_count), ocr)
+        for start in range(1, page_count + 1, window_pages)
+    ]
+
+
+def plan_ocr_windows(text_pages: List[bool], window_pages: Optional[int],
+                     min_text_run: int) -> List[PageWindow]:
+    """
+    Group pages into runs that need OCR and runs that can use their text layer
+    
+    Every conversion has a fixed start-up cost, so runs of fewer than
+    min_text_run digital pages between scanned pages are OCRed with their
+    neighbours rather than converted on their own. Scanned pages are always
+    OCRed. Runs longer than window_pages are split further.
+    
+    Args:
+        text_pages: Per page, True if the page has a usable text layer
+        window_pages: Maximum pages per window, None for no limit
+        min_text_run: Shortest run of digital pages converted without OCR
+    """
+    runs: List[PageWindow] = []
+    for page, has_text in enumerate(text_pages, start=1):
+        if runs and runs[-1].ocr != has_text:
+            runs[-1].end_page = page
+        else:
+            runs.append(PageWindow(page, page, ocr=not has_text))
+    
+    # Fold short digital runs into the OCR runs around them
+    merged: List[PageWindow] = []
+    for run in runs:
+        if not run.ocr and run.num_pages < min_text_run and len(runs) > 1:
+            run.ocr = True
+        if merged and merged[-1].ocr == run.ocr:
+            merged[-1].end_page = run.end_page
+        else:
+            merged.append(run)
+    
+    windows = []
+    for run in merged:
+        size = window_pages or run.num_pages
+        windows.extend(
+            PageWindow(start, min(start + size - 1, run.end_page), run.ocr)
+            for start in range(run.start_page, run.end_page + 1, size)
+        )
+    return windows
+
+
+def write_windows(file_path: Path, windows: List[PageWindow], output_dir: Path) -> List[Path]:
+    """
+    Write each window as a standalone PDF
+    
+    Returns:
+        Paths of the window files, in window order
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    source = pdfium.PdfDocument(str(file_path))
+    paths = []
+    
+    try:
+        for window in windows:
+            part = pdfium.PdfDocument.new()
+            try:
+                part.import_pages(source, list(range(window.start_page - 1, window.end_page)))
+                path = output_dir / f"pages_{window.start_page:05d}_{window.end_page:05d}.pdf"
+                part.save(str(path))
+                paths.append(path)
+            finally:
+                part.close()
+    finally:
+        source.close()
+    
+    return paths
+
+
+def merge_extraction_results(results: List[ExtractionResult], windows: List[PageWindow],
+                             filename: str, settings: Settings) -> ExtractionResult:
+    """
+    Merge per-window extractions into one document-level ExtractionResult
+    
+    Page numbers are shifted by each window's offset, table ids are renumbered
+    in document order and the Docling JSON exports are concatenated into a
+    single document with consistent references.
+    """
+    tables = []
+    for result, window in zip(results, windows):
+        for table in result.tables:
+            table.table_id = len(tables)
+            table.page_number += window.page_offset
+            tables.append(table)
+    
+    total_pages = sum(window.num_pages for window in windows)
+    
+    def weighted(values: List[float]) -> float:
+        return sum(v * w.num_pages for v, w in zip(values, windows)) / total_pages
+    
+    scores = [result.quality_scores for result in results]
+    overall_score = weighted([s.overall_score for s in scores])
+    quality_scores = QualityScores(
+        overall_score=overall_score,
+        layout_score=weighted([s.layout_score for s in scores]),
+        ocr_score=weighted([s.ocr_score for s in scores]),
+        parse_score=weighted([s.parse_score for s in scores]),
+        table_score=weighted([s.table_score for s in scores]),
+        quality_grade=_score_to_grade(overall_score, settings)
+    )
+    
+    stages = _merge_stages(results)
+    for stage in stages:
+        if "ocr" in stage.metadata:
+            stage.metadata["ocr"] = any(window.ocr for window in windows)
+            stage.metadata["ocr_pages"] = sum(window.num_pages for window in windows if window.ocr)
+    
+    return ExtractionResult(
+        filename=filename,
+        markdown_content="\n\n".join(result.markdown_content for result in results),
+        text_content="\n\n".join(result.text_content for result in results),
+        json_content=_merge_documents([r.json_content for r in results], windows, filename),
+        tables=tables,
+        quality_scores=quality_scores,
+        processing_stages=stages,
+        total_processing_time=max(result.total_processing_time for result in results),
+        confidence_score=weighted([result.confidence_score for result in results])
+    )
+
+
+def _merge_stages(results: List[ExtractionResult]) -> List[ProcessingStage]:
+    """
+    Combine stage records of windows that ran in parallel: wall time is the
+    slowest window, CPU time is the sum over windows
+    """
+    merged: Dict[int, ProcessingStage] = {}
+    for result in results:
+        for stage in result.processing_stages:
+            current = merged.get(stage.stage_id)
+            if current is None:
+                merged[stage.stage_id] = ProcessingStage(
+                    stage_id=stage.stage_id,
+                    stage_name=stage.stage_name,
+                    duration_seconds=stage.duration_seconds,
+                    status=stage.status,
+                    confidence=stage.confidence,
+                    errors=list(stage.errors),
+                    warnings=list(stage.warnings),
+                    metadata={**stage.metadata, "windows": 1},
+                    cpu_seconds=stage.cpu_seconds
+                )
+                continue
+            
+            current.duration_seconds = max(current.duration_seconds, stage.duration_seconds)
+            current.confidence = min(current.confidence, stage.confidence)
+            current.errors.extend(stage.errors)
+            current.warnings.extend(stage.warnings)
+            current.metadata["windows"] += 1
+            if current.cpu_seconds is not None and stage.cpu_seconds is not None:
+                current.cpu_seconds += stage.cpu_seconds
+    
+    return [merged[stage_id] for stage_id in sorted(merged)]
+
+
+def _merge_documents(documents: List[Dict[str, Any]], windows: List[PageWindow],
+                     filename: str) -> Dict[str, Any]:
+    """Concatenate Docling document exports, rebasing page numbers and item references"""
+    merged = dict(documents[0])
+    merged["name"] = Path(filename).stem
+    merged["body"] = dict(documents[0].get("body", {}), children=[])
+    merged["furniture"] = dict(documents[0].get("furniture", {}), children=[])
+    merged["pages"] = {}
+    for name in _ITEM_LISTS:
+        merged[name] = []
+    
+    for document, window in zip(documents, windows):
+        # Items of this window are appended after those of earlier windows
+        ref_offsets = {name: len(merged[name]) for name in _ITEM_LISTS}
+        document = _rebase(document, ref_offsets, window.page_offset)
+        
+        for name in _ITEM_LISTS:
+            merged[name].extend(document.get(name, []))
+        for page in document.get("pages", {}).values():
+            merged["pages"][str(page["page_no"])] = page
+        merged["body"]["children"].extend(document.get("body", {}).get("children", []))
+        merged["furniture"]["children"].extend(document.get("furniture", {}).get("children", []))
+    
+    return merged
+
+
+def _rebase(node: Any, ref_offsets: Dict[str, int], page_offset: int) -> Any:
+    """Copy of an exported Docling node with shifted item references and page numbers"""
+    if isinstance(node, list):
+        return [_rebase(item, ref_offsets, page_offset) for item in node]
+    
+    if not isinstance(node, dict):
+        return node
+    
+    rebased = {}
+    for key, value in node.items():
+        if key in ("self_ref", "$ref", "cref") and isinstance(value, str):
+            match = _REF_PATTERN.match(value)
+            if match and match.group(1) in ref_offsets:
+                value = f"#/{match.group(1)}/{int(match.group(2)) + ref_offsets[match.group(1)]}"
+            rebased[key] = value
+        elif key == "page_no" and isinstance(value, int):
+            rebased[key] = value + page_offset
+        else:
+            rebased[key] = _rebase(value, ref_offsets, page_offset)
+    
+    return rebased
+
+
+def _score_to_grade(score: float, settings: Settings) -> str:
+    """Quality grade for a score, using the configured thresholds"""
+    if score >= settings.quality_threshold_excellent:
+        return "EXCELLENT"
+    elif score >= settings.quality_threshold_good:
+        return "GOOD"
+    elif score >= settings.quality_threshold_fair:
+        return "FAIR"
+    else:
+        return "POOR"
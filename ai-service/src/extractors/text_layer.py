@@ -0,0 +1,111 @@
+"""
+Text-layer inspection for PDFs
+Decides per page whether the embedded text can be used as is or the page needs OCR
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# A page has a usable text layer with at least this many characters...
+MIN_TEXT_CHARS_PER_PAGE = 32
+
+# ...unless images cover most of it and the text is short: scanned pages of
+# signed editais often carry a digital signature stamp as their only text
+SCANNED_IMAGE_COVERAGE = 0.6
+DENSE_TEXT_CHARS = 500
+
+# Text layers with more undecodable characters than this are treated as missing
+MAX_GARBLED_RATIO = 0.1
+
+
+@dataclass
+class TextLayerCoverage:
+    """Which pages of a PDF carry a usable text layer"""
+    pages: int
+    text_pages: List[bool] = field(default_factory=list)  # per page, True = no OCR needed
+    
+    @property
+    def ratio(self) -> float:
+        return sum(self.text_pages) / self.pages if self.pages else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "text_pages": sum(self.text_pages),
+            "ratio": round(self.ratio, 4)
+        }
+
+
+def page_text_chars(pdf: pdfium.PdfDocument, index: int) -> int:
+    """Number of characters in a page's text layer"""
+    page = pdf[index]
+    textpage = page.get_textpage()
+    try:
+        return textpage.count_chars()
+    finally:
+        textpage.close()
+        page.close()
+
+
+def _page_has_text_layer(page: pdfium.PdfPage) -> bool:
+    textpage = page.get_textpage()
+    try:
+        chars = textpage.count_chars()
+        if chars < MIN_TEXT_CHARS_PER_PAGE:
+            return False
+        
+        text = textpage.get_text_range()
+        garbled = sum(1 for char in text if char == "\ufffd" or (char < " " and char not in "\r\n\t"))
+        if garbled > MAX_GARBLED_RATIO * len(text):
+            return False
+    finally:
+        textpage.close()
+    
+    if chars >= DENSE_TEXT_CHARS:
+        return True
+    
+    width, height = page.get_size()
+    page_area = width * height
+    if page_area <= 0:
+        return True
+    
+    image_area = 0.0
+    for image in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]):
+        left, bottom, right, top = image.get_bounds()
+        image_area += max(0.0, right - left) * max(0.0, top - bottom)
+    return image_area / page_area < SCANNED_IMAGE_COVERAGE
+
+
+def measure_text_layer(file_path: Path) -> TextLayerCoverage:
+    """
+    Inspect every page's text layer (blocking, run in a thread)
+    
+    pdfium only reads the content streams, so this takes a few milliseconds
+    per page. A PDF pdfium cannot open is reported as having no text layer.
+    """
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+    except Exception as e:
+        logger.warning(f"Cannot inspect text layer of {file_path.name}: {e}")
+        return TextLayerCoverage(pages=0)
+    
+    try:
+        text_pages = []
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                text_pages.append(_page_has_text_layer(page))
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+    
+    return TextLayerCoverage(pages=len(text_pages), text_pages=text_pages)
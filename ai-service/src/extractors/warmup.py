@@ -0,0 +1,86 @@
+"""
+Built-in warm-up document for the Docling pipeline
+One page with text, a ruled table and an image region, so layout, table structure and OCR all run
+"""
+
+from typing import List
+
+# Cell texts of the ruled table, one row per line
+_TABLE = [
+    ["Item", "Descricao", "Quantidade"],
+    ["1", "Papel A4 75g", "500"],
+    ["2", "Caneta esferografica azul", "1200"],
+    ["3", "Grampeador de mesa", "40"],
+]
+
+_IMAGE_SIZE = 32
+
+
+def _content_stream() -> bytes:
+    lines = [
+        "BT /F1 16 Tf 72 770 Td (Pregao Eletronico 90001/2025) Tj ET",
+        "BT /F1 10 Tf 72 745 Td (Objeto: aquisicao de material de expediente conforme o Termo de Referencia.) Tj ET",
+        "BT /F1 10 Tf 72 731 Td (Prazo de entrega de 30 dias apos a emissao da nota de empenho.) Tj ET",
+    ]
+    
+    # Table grid: 4 rows x 3 columns below the paragraph
+    left, top, row_height, widths = 72, 700, 22, [60, 250, 120]
+    right = left + sum(widths)
+    bottom = top - row_height * len(_TABLE)
+    lines.append("0.5 w")
+    for row in range(len(_TABLE) + 1):
+        y = top - row * row_height
+        lines.append(f"{left} {y} m {right} {y} l S")
+    x = left
+    for width in [0] + widths:
+        x += width
+        lines.append(f"{x} {top} m {x} {bottom} l S")
+    for row, cells in enumerate(_TABLE):
+        x = left
+        for width, text in zip(widths, cells):
+            y = top - (row + 1) * row_height + 7
+            lines.append(f"BT /F1 9 Tf {x + 4} {y} Td ({text}) Tj ET")
+            x += width
+    
+    # Image region (a scanned stamp, as far as the OCR stage can tell)
+    lines.append("q 220 0 0 160 72 380 cm /Im1 Do Q")
+    return "\n".join(lines).encode("latin-1")
+
+
+def _image_data() -> bytes:
+    """Grayscale stripes, enough for the OCR detector to look at"""
+    return bytes(
+        255 if (row // 4 + col // 8) % 2 else 32
+        for row in range(_IMAGE_SIZE)
+        for col in range(_IMAGE_SIZE)
+    )
+
+
+def warmup_pdf() -> bytes:
+    """The warm-up document as PDF bytes"""
+    content = _content_stream()
+    image = _image_data()
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 5 0 R "
+        b"/Resources << /Font << /F1 4 0 R >> /XObject << /Im1 6 0 R >> >> >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+        b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (_IMAGE_SIZE, _IMAGE_SIZE, len(image))
+        + image + b"\nendstream",
+    ]
+    
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
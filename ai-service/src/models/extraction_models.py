@@ -28,6 +28,14 @@ class QualityScores:
             },
             "quality_grade": self.quality_grade
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QualityScores":
+        return cls(
+            overall_score=data["overall_score"],
+            quality_grade=data["quality_grade"],
+            **data["component_scores"]
+        )
 
 
 @dataclass
@@ -41,6 +49,7 @@ class ProcessingStage:
     errors: List[str] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    cpu_seconds: Optional[float] = None  # CPU time consumed, when measurable
 
 
 @dataclass
@@ -68,6 +77,10 @@ class TableData:
             "confidence": self.confidence,
             "table_type": self.table_type
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TableData":
+        return cls(**data)
 
 
 @dataclass
@@ -99,6 +112,7 @@ class ExtractionResult:
                     "duration_seconds": stage.duration_seconds,
                     "status": stage.status,
                     "confidence": stage.confidence,
+                    "cpu_seconds": stage.cpu_seconds,
                     "errors": stage.errors,
                     "warnings": stage.warnings,
                     "metadata": stage.metadata
@@ -108,6 +122,21 @@ class ExtractionResult:
             "total_processing_time": self.total_processing_time,
             "confidence_score": self.confidence_score
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExtractionResult":
+        """Rebuild a result saved with to_dict (spacy_doc is not persisted)"""
+        return cls(
+            filename=data["filename"],
+            markdown_content=data["markdown_content"],
+            text_content=data["text_content"],
+            json_content=data["json_content"],
+            tables=[TableData.from_dict(table) for table in data["tables"]],
+            quality_scores=QualityScores.from_dict(data["quality_scores"]),
+            processing_stages=[ProcessingStage(**stage) for stage in data["processing_stages"]],
+            total_processing_time=data["total_processing_time"],
+            confidence_score=data["confidence_score"]
+        )
 
 
 @dataclass
@@ -135,6 +164,10 @@ class RiskItem:
             "source_page": self.source_page,
             "source_text": self.source_text
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RiskItem":
+        return cls(**data)
 
 
 @dataclass
@@ -162,6 +195,10 @@ class OpportunityItem:
             "source_page": self.source_page,
             "source_text": self.source_text
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OpportunityItem":
+        return cls(**data)
 
 
 @dataclass
@@ -196,4 +233,8 @@ class StructuredData:
             "garantia_exigida": self.garantia_exigida,
             "certificacoes_exigidas": self.certificacoes_exigidas,
             "penalidades": self.penalidades
-        }
\ No newline at end of file
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StructuredData":
+        return cls(**data)
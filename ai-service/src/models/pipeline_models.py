@@ -2,10 +2,25 @@
 Pipeline data models for document processing workflow
 """
 
-from dataclasses import dataclass, field
+import hashlib
+import json
+from dataclasses import dataclass, field, fields
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from ..config.settings import Settings
+
+# Scheduling tenant for uploads without a tenant id or UASG
+DEFAULT_TENANT = "default"
+
+# Analysis stage outputs a pipeline profile can switch off (stages 5, 6 and 8)
+OPTIONAL_ANALYZERS = ("risks", "opportunities", "product_tables")
+
+# OCR modes: never, only where the text layer is missing (fast path and
+# adaptive OCR), or on every page
+OCR_MODES = ("none", "auto", "full")
+TABLE_MODES = ("fast", "accurate")
+
 
 @dataclass
 class ProcessingContext:
@@ -16,8 +31,26 @@ class ProcessingContext:
     uasg: Optional[str] = None
     numero_pregao: Optional[str] = None
     callback_url: Optional[str] = None
+    content_sha256: Optional[str] = None
+    batch_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+    profile: Optional[str] = None  # pipeline profile name, None = default profile
+    profile_fingerprint: Optional[str] = None  # PipelineProfile.fingerprint at admission
     created_at: float = field(default_factory=lambda: datetime.now().timestamp())
     
+    @property
+    def tenant(self) -> str:
+        """Fair-scheduling tenant: the explicit tenant id, else the UASG"""
+        return self.tenant_id or self.uasg or DEFAULT_TENANT
+    
+    @property
+    def result_key(self) -> str:
+        """
+        Deduplication key: the same bytes processed with another profile, or
+        after the profile or output settings changed, give another result
+        """
+        return f"{self.content_sha256}:{self.profile}:{self.profile_fingerprint}"
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "task_id": self.task_id,
@@ -26,8 +59,79 @@ class ProcessingContext:
             "uasg": self.uasg,
             "numero_pregao": self.numero_pregao,
             "callback_url": self.callback_url,
+            "content_sha256": self.content_sha256,
+            "batch_id": self.batch_id,
+            "tenant_id": self.tenant_id,
+            "profile": self.profile,
+            "profile_fingerprint": self.profile_fingerprint,
             "created_at": self.created_at
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProcessingContext":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+@dataclass
+class PipelineProfile:
+    """Named extraction and analysis settings, selected per request"""
+    name: str
+    ocr: str = "auto"  # see OCR_MODES
+    table_structure: bool = True
+    table_mode: str = "accurate"  # TableFormer mode, see TABLE_MODES
+    picture_images: bool = False  # embed picture crops in the Docling output
+    analyzers: List[str] = field(default_factory=lambda: list(OPTIONAL_ANALYZERS))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "ocr": self.ocr,
+            "table_structure": self.table_structure,
+            "table_mode": self.table_mode,
+            "picture_images": self.picture_images,
+            "analyzers": self.analyzers
+        }
+    
+    def fingerprint(self, settings: Settings) -> str:
+        """
+        Short hash of the profile and the output settings it runs with
+        
+        Unlike the extraction engine's pipeline fingerprint it needs no
+        models, so API instances can key duplicate detection on it.
+        """
+        config = {"profile": self.to_dict(), "settings": settings.extraction_output_settings()}
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+    
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "PipelineProfile":
+        """Build a profile from its PIPELINE_PROFILES entry, rejecting invalid options"""
+        known = {f.name for f in fields(cls)} - {"name"}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Pipeline profile '{name}' has unknown options: {sorted(unknown)}")
+        
+        profile = cls(name=name, **data)
+        if profile.ocr not in OCR_MODES:
+            raise ValueError(f"Pipeline profile '{name}': ocr must be one of {OCR_MODES}")
+        if profile.table_mode not in TABLE_MODES:
+            raise ValueError(f"Pipeline profile '{name}': table_mode must be one of {TABLE_MODES}")
+        invalid = set(profile.analyzers) - set(OPTIONAL_ANALYZERS)
+        if invalid:
+            raise ValueError(f"Pipeline profile '{name}': unknown analyzers {sorted(invalid)}")
+        return profile
+    
+    @classmethod
+    def from_settings(cls, settings: Settings) -> Dict[str, "PipelineProfile"]:
+        """All configured profiles by name; the default profile must be among them"""
+        profiles = {
+            name: cls.from_dict(name, options)
+            for name, options in settings.pipeline_profiles.items()
+        }
+        if settings.default_pipeline_profile not in profiles:
+            raise ValueError(f"DEFAULT_PIPELINE_PROFILE '{settings.default_pipeline_profile}' "
+                             f"is not defined in PIPELINE_PROFILES")
+        return profiles
 
 
 @dataclass
@@ -44,6 +148,10 @@ class TaskStatus:
     completed_at: Optional[float] = None
     error: Optional[str] = None
     result_path: Optional[str] = None
+    file_path: Optional[str] = None  # stored original, for page images
+    stage_timings: Dict[str, float] = field(default_factory=dict)  # wall seconds of finished stages
+    batch_id: Optional[str] = None
+    version: int = 0  # incremented by the task store on every update
     
     def update_progress(self):
         """Update progress percentage based on current stage"""
@@ -62,8 +170,17 @@ class TaskStatus:
             "started_at": self.started_at,
             "completed_at": self.completed_at,
             "error": self.error,
-            "result_path": self.result_path
+            "result_path": self.result_path,
+            "file_path": self.file_path,
+            "stage_timings": self.stage_timings,
+            "batch_id": self.batch_id,
+            "version": self.version
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TaskStatus":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
 
 
 @dataclass
@@ -53,6 +53,29 @@ class ProcessingResponse(BaseModel):
         }
 
 
+class BatchResponse(BaseModel):
+    """Response for batch processing initiation"""
+    batch_id: str = Field(..., description="Unique identifier for the batch")
+    status: ProcessingStatus = Field(..., description="Current batch status")
+    message: str = Field(..., description="Human-readable status message")
+    documents: List[Dict[str, str]] = Field(..., description="Child tasks (task_id, filename)")
+    skipped: List[Dict[str, str]] = Field(default_factory=list, description="Entries not processed (filename, reason)")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "batch_id": "0f8c2b1e-5d4a-4c1b-9e7f-2a3b4c5d6e7f",
+                "status": "pending",
+                "message": "2 documents queued for processing",
+                "documents": [
+                    {"task_id": "123e4567-e89b-12d3-a456-426614174000", "filename": "edital.pdf"},
+                    {"task_id": "223e4567-e89b-12d3-a456-426614174001", "filename": "termo_referencia.pdf"}
+                ],
+                "skipped": [{"filename": "planilha.xlsx", "reason": "Only PDF files are supported"}]
+            }
+        }
+
+
 class ComponentScores(BaseModel):
     """Individual component quality scores"""
     layout_score: float = Field(..., ge=0.0, le=1.0, description="Document layout recognition quality")
@@ -0,0 +1,346 @@
+"""
+Reliable delivery of task callbacks (webhooks)
+Shared connection pool, per-host concurrency limits, retries with backoff and a durable outbox
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..config.settings import Settings
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Responses worth retrying; other 4xx mean the receiver rejected the payload
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+# Delivery latencies kept for percentiles
+LATENCY_WINDOW = 1000
+
+
+@dataclass
+class CallbackDelivery:
+    """One callback notification waiting in the outbox"""
+    delivery_id: str
+    url: str
+    payload: Dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    last_error: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CallbackDelivery":
+        return cls(**data)
+
+
+class CallbackDispatcher:
+    """
+    Delivers callbacks at least once.
+    
+    Every callback is written to the outbox directory before it is sent and
+    removed once the receiver answers 2xx. Failures are retried with
+    exponential backoff and jitter up to max_attempts, then moved to
+    outbox/dead. All requests share one pooled HTTP client, and at most
+    max_per_host requests run against a receiver at a time.
+    
+    Outbox entries are leased by the process that wrote them: it touches
+    their files every lease / 3 seconds, and any process sharing the outbox
+    adopts entries left untouched for lease seconds (owner restarted or
+    crashed). Adoption renames the file, so only one process wins.
+    
+    With batch_window > 0, callbacks to the same URL within the window are
+    coalesced into one POST of {"events": [...]}; each event carries its
+    delivery_id. Single callbacks post the payload as is, with the id in the
+    X-Delivery-Id header, so receivers can drop duplicates.
+    """
+    
+    def __init__(self, outbox_dir: Path, timeout: float = 30.0, max_attempts: int = 8,
+                 retry_base: float = 1.0, max_backoff: float = 300.0, max_per_host: int = 4,
+                 batch_window: float = 0.0, batch_max: int = 100, lease: float = 60.0):
+        self.outbox_dir = outbox_dir
+        self.dead_dir = outbox_dir / "dead"
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+        self.max_per_host = max(1, max_per_host)
+        self.batch_window = batch_window
+        self.batch_max = max(1, batch_max)
+        self.lease = lease
+        
+        # Suffix of the outbox files this instance owns
+        self.owner = uuid.uuid4().hex[:12]
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, CallbackDelivery] = {}
+        self._batches: Dict[str, List[CallbackDelivery]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        
+        self._delivered = 0
+        self._failed_attempts = 0
+        self._dead = 0
+        self._adopted = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+    
+    async def initialize(self):
+        """Open the HTTP client and start watching the outbox"""
+        await asyncio.to_thread(self.dead_dir.mkdir, parents=True, exist_ok=True)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+    
+    async def close(self, timeout: float = 0.0):
+        """
+        Flush coalescing batches, wait up to timeout seconds for deliveries in
+        flight, then stop. Undelivered callbacks stay in the outbox.
+        """
+        for url in list(self._batches):
+            self._flush(url)
+        
+        if self._tasks and timeout > 0:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+        
+        tasks = list(self._tasks)
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        
+        if self._pending:
+            logger.info(f"{len(self._pending)} callbacks left in the outbox for the next start")
+    
+    async def send(self, url: str, payload: Dict[str, Any]) -> str:
+        """
+        Persist a callback and schedule its delivery
+        
+        Returns:
+            delivery_id of the callback
+        """
+        delivery = CallbackDelivery(delivery_id=uuid.uuid4().hex, url=url, payload=payload)
+        await asyncio.to_thread(self._write, delivery)
+        self._schedule(delivery)
+        return delivery.delivery_id
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Delivery counters and end-to-end latency (queued to delivered)
+        
+        delivered and dead count callbacks, failed_attempts counts POSTs;
+        success_rate is the share of finished callbacks that were delivered.
+        """
+        latencies = sorted(self._latencies)
+        
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+        
+        # Callbacks that reached a final outcome; a retried callback counts once
+        finished = self._delivered + self._dead
+        return {
+            "pending": len(self._pending),
+            "delivered": self._delivered,
+            "failed_attempts": self._failed_attempts,
+            "dead": self._dead,
+            "adopted": self._adopted,
+            "success_rate": round(self._delivered / finished, 4) if finished else None,
+            "latency_seconds": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 3) if latencies else None
+            }
+        }
+    
+    def _path(self, delivery_id: str) -> Path:
+        return self.outbox_dir / f"{delivery_id}.{self.owner}.json"
+    
+    def _write(self, delivery: CallbackDelivery):
+        path = self._path(delivery.delivery_id)
+        temp_path = path.with_suffix(".part")
+        temp_path.write_text(json.dumps(delivery.to_dict()), encoding="utf-8")
+        os.replace(temp_path, path)
+    
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def _schedule(self, delivery: CallbackDelivery):
+        self._pending[delivery.delivery_id] = delivery
+        
+        if self.batch_window <= 0:
+            self._spawn(self._deliver([delivery]))
+            return
+        
+        batch = self._batches.setdefault(delivery.url, [])
+        batch.append(delivery)
+        if len(batch) >= self.batch_max:
+            self._flush(delivery.url)
+        elif len(batch) == 1:
+            self._spawn(self._flush_later(delivery.url))
+    
+    async def _flush_later(self, url: str):
+        await asyncio.sleep(self.batch_window)
+        self._flush(url)
+    
+    def _flush(self, url: str):
+        batch = self._batches.pop(url, [])
+        for start in range(0, len(batch), self.batch_max):
+            self._spawn(self._deliver(batch[start:start + self.batch_max]))
+    
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.max_backoff, self.retry_base * 2 ** (attempts - 1))
+        return random.uniform(0, ceiling)
+    
+    async def _deliver(self, group: List[CallbackDelivery]):
+        """Post a callback (or a coalesced group) until it succeeds or gives up"""
+        url = group[0].url
+        host = urlsplit(url).netloc
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        
+        while True:
+            delay = max(delivery.next_attempt_at for delivery in group) - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            for delivery in group:
+                delivery.attempts += 1
+            
+            retryable = True
+            try:
+                async with slots:
+                    response = await self._post(url, group)
+                if response.is_success:
+                    await self._delivered_group(group)
+                    return
+                retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            
+            self._failed_attempts += 1
+            attempts = max(delivery.attempts for delivery in group)
+            if not retryable or attempts >= self.max_attempts:
+                logger.error(f"Giving up callback to {url} after {attempts} attempts: {error}")
+                await self._dead_group(group, error)
+                return
+            
+            next_attempt_at = time.time() + self._backoff(attempts)
+            for delivery in group:
+                delivery.next_attempt_at = next_attempt_at
+                delivery.last_error = error
+                await asyncio.to_thread(self._write, delivery)
+            logger.warning(f"Callback to {url} failed ({error}), attempt {attempts}/{self.max_attempts}")
+    
+    async def _post(self, url: str, group: List[CallbackDelivery]) -> httpx.Response:
+        if self.batch_window <= 0:
+            delivery = group[0]
+            return await self._client.post(
+                url, json=delivery.payload, headers={"X-Delivery-Id": delivery.delivery_id}
+            )
+        
+        events = [{"delivery_id": delivery.delivery_id, **delivery.payload} for delivery in group]
+        return await self._client.post(url, json={"events": events})
+    
+    async def _delivered_group(self, group: List[CallbackDelivery]):
+        now = time.time()
+        for delivery in group:
+            self._pending.pop(delivery.delivery_id, None)
+            self._latencies.append(now - delivery.created_at)
+            await asyncio.to_thread(self._path(delivery.delivery_id).unlink, True)
+        self._delivered += len(group)
+        logger.info(f"Callback sent successfully to {group[0].url} ({len(group)} events)")
+    
+    async def _dead_group(self, group: List[CallbackDelivery], error: str):
+        for delivery in group:
+            self._pending.pop(delivery.delivery_id, None)
+            delivery.last_error = error
+            await asyncio.to_thread(self._write, delivery)
+            await asyncio.to_thread(
+                os.replace, self._path(delivery.delivery_id),
+                self.dead_dir / f"{delivery.delivery_id}.json"
+            )
+        self._dead += len(group)
+    
+    async def _sweep_loop(self):
+        """Renew the lease on our outbox entries and adopt abandoned ones"""
+        while True:
+            try:
+                for delivery in await asyncio.to_thread(self._sweep, list(self._pending)):
+                    logger.info(f"Adopted callback {delivery.delivery_id} to {delivery.url} from the outbox")
+                    self._adopted += 1
+                    self._schedule(delivery)
+            except Exception as e:
+                logger.warning(f"Callback outbox sweep failed: {e}")
+            await asyncio.sleep(max(1.0, self.lease / 3))
+    
+    def _sweep(self, owned: List[str]) -> List[CallbackDelivery]:
+        now = time.time()
+        adopted = []
+        
+        for delivery_id in owned:
+            path = self._path(delivery_id)
+            if path.exists():
+                os.utime(path)
+        
+        for path in self.outbox_dir.glob("*.json"):
+            delivery_id, owner = path.name.split(".")[:2]
+            if owner == self.owner:
+                continue
+            try:
+                if path.stat().st_mtime > now - self.lease:
+                    continue
+                # Rename claims the entry; a concurrent sweeper gets FileNotFoundError
+                claimed = self._path(delivery_id)
+                os.replace(path, claimed)
+                os.utime(claimed)
+                delivery = CallbackDelivery.from_dict(json.loads(claimed.read_text(encoding="utf-8")))
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"Skipping unreadable callback outbox entry {path}: {e}")
+                continue
+            adopted.append(delivery)
+        
+        return adopted
+
+
+def create_callback_dispatcher(settings: Settings) -> CallbackDispatcher:
+    """Build the callback dispatcher with its outbox under STORAGE_ROOT_PATH/outbox"""
+    return CallbackDispatcher(
+        Path(settings.storage_root_path) / "outbox",
+        timeout=settings.callback_timeout,
+        max_attempts=settings.callback_max_attempts,
+        retry_base=settings.callback_retry_base,
+        max_backoff=settings.callback_max_backoff,
+        max_per_host=settings.callback_max_per_host,
+        batch_window=settings.callback_batch_window,
+        batch_max=settings.callback_batch_max,
+        lease=settings.callback_outbox_lease
+    )
@@ -4,34 +4,74 @@ Implements the complete pipeline as described in cotaipy.md
 """
 
 import asyncio
-import json
 import logging
+import math
 import time
 import uuid
-from pathlib import Path
-from typing import Dict, Any, Optional, List
+import zipfile
 from dataclasses import asdict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Any, Optional, List
 
 # Core dependencies
 from fastapi import UploadFile
 
 from ..config.settings import Settings
-from ..extractors.docling_extractor import DoclingExtractor
+from ..extractors.extraction_engine import ExtractionEngine
 from ..analyzers.llm_analyzer import LLMAnalyzer
 from ..analyzers.risk_analyzer import RiskAnalyzer
 from ..analyzers.opportunity_analyzer import OpportunityAnalyzer
 from ..analyzers.quality_analyzer import QualityAnalyzer
+from ..models.extraction_models import (
+    ExtractionResult,
+    OpportunityItem,
+    ProcessingStage,
+    RiskItem,
+    StructuredData
+)
 from ..models.pipeline_models import (
+    OPTIONAL_ANALYZERS,
+    PipelineProfile,
     ProcessingContext,
     PipelineResult,
-    ProcessingStage,
     TaskStatus
 )
-from ..storage.file_manager import FileManager
+from ..storage.artifact_cache import create_artifact_cache
+from ..storage.page_images import create_page_image_cache
+from ..storage.file_manager import FileManager, FileTooLargeError
+from ..storage.result_index import create_result_index
+from ..storage.task_journal import create_task_journal
+from ..storage.task_store import ACTIVE_STATUSES, TERMINAL_STATUSES, create_task_store
+from .callback_dispatcher import create_callback_dispatcher
+from .job_broker import RedisJobBroker, create_job_broker
+from .job_cost import estimate_job_cost
+from .job_queue import JobQueue, QueueFullError, ServiceDrainingError, TenantPolicy
+from .stage_graph import StageDefinition, StageScheduler
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Stage 4-9 outputs that are dataclasses, rebuilt when resuming from a checkpoint
+_OUTPUT_DECODERS = {
+    "structured_data": StructuredData.from_dict,
+    "risks": lambda items: [RiskItem.from_dict(item) for item in items],
+    "opportunities": lambda items: [OpportunityItem.from_dict(item) for item in items]
+}
+
+
+class TaskCancelledError(Exception):
+    """Raised at a stage boundary when the task was cancelled"""
+
+
+class _ZipEntryReader:
+    """Async read(size) over a ZIP member, decompressing in a worker thread"""
+    
+    def __init__(self, entry):
+        self.entry = entry
+    
+    async def read(self, size: int) -> bytes:
+        return await asyncio.to_thread(self.entry.read, size)
+
 
 class DocumentProcessor:
     """
@@ -42,35 +82,256 @@ class DocumentProcessor:
     Stages 7-9: Data Structuring & Quality Assessment
     """
     
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, role: Optional[str] = None):
+        """
+        Args:
+            settings: Service settings
+            role: "embedded" (API runs pipelines in-process), "producer" (API only
+                enqueues jobs for workers) or "worker" (runs jobs from the broker).
+                Defaults from EXECUTION_MODE.
+        """
         self.settings = settings
-        self.docling_extractor = DoclingExtractor(settings)
+        self.role = role or ("producer" if settings.execution_mode == "distributed" else "embedded")
+        
+        self.extraction_engine = ExtractionEngine(settings)
         self.llm_analyzer = LLMAnalyzer(settings)
         self.risk_analyzer = RiskAnalyzer(settings)
         self.opportunity_analyzer = OpportunityAnalyzer(settings)
         self.quality_analyzer = QualityAnalyzer(settings)
         self.file_manager = FileManager(settings)
+        self.stage_graph = self._build_stage_graph()
+        
+        # Named extraction and analysis settings selectable per upload
+        self.profiles = PipelineProfile.from_settings(settings)
+        self.profile_fingerprints = {
+            name: profile.fingerprint(settings) for name, profile in self.profiles.items()
+        }
+        
+        # Task registry (in-memory LRU or Redis, shared across API workers)
+        self.task_store = create_task_store(settings)
+        
+        # Content hash -> completed result, plus single-flight claims for duplicates
+        self.result_index = create_result_index(settings)
         
-        # Active tasks tracking
-        self.active_tasks: Dict[str, TaskStatus] = {}
+        # Stage 1-3 artifacts by content hash and converter fingerprint (None if disabled)
+        self.artifact_cache = create_artifact_cache(settings)
+        
+        # Page PNGs rendered on demand from stored originals
+        self.page_images = create_page_image_cache(settings)
+        
+        # Stage checkpoints, plus a journal of queued tasks to resume after a restart
+        self.journal = create_task_journal(settings)
+        
+        # Callback outbox with retries, shared by every task of this process
+        self.callbacks = create_callback_dispatcher(settings)
+        
+        # Admission control: bounded backlog in front of a fixed number of pipelines
+        self.job_queue = JobQueue(
+            max_concurrent=settings.max_concurrent_jobs,
+            max_depth=settings.max_queue_depth,
+            initial_job_seconds=settings.estimated_job_seconds,
+            small_job_cost=settings.small_job_cost,
+            small_lane_slots=settings.small_lane_slots,
+            cost_weight_seconds=settings.job_cost_weight_seconds,
+            tenant_policy=TenantPolicy.from_settings(settings)
+        )
+        
+        # Durable queue towards the worker tier; workers use it to requeue
+        # duplicates whose leader ended without a result
+        self.job_broker: Optional[RedisJobBroker] = None
+        if self.role != "embedded":
+            self.job_broker = create_job_broker(settings)
+        
+        # Extraction models load after storage (always ready for the producer role)
+        self.models_ready = False
+        self.startup_error: Optional[str] = None
+        self._models_task: Optional[asyncio.Task] = None
+        
+        # Graceful shutdown: set once drain() starts, admission stops for good
+        self.draining = False
+        self._drain_started_at: Optional[float] = None
+        self._drain_task: Optional[asyncio.Task] = None
     
-    async def initialize(self):
-        """Initialize all pipeline components"""
-        logger.info("Initializing document processor pipeline")
+    async def initialize(self, load_models_in_background: bool = False):
+        """
+        Initialize all pipeline components
+        
+        Storage, stores and queues come up first. With load_models_in_background
+        the extraction workers and analyzers are then loaded in a task: uploads
+        are accepted and queued meanwhile, and models_ready tells when jobs start
+        running.
+        """
+        logger.info(f"Initializing document processor pipeline (role: {self.role})")
+        
+        if self.role != "embedded" and self.settings.task_store_backend != "redis":
+            raise ValueError("Distributed execution requires TASK_STORE_BACKEND=redis")
         
-        await self.docling_extractor.initialize()
-        await self.llm_analyzer.initialize()
-        await self.risk_analyzer.initialize()
-        await self.opportunity_analyzer.initialize()
-        await self.quality_analyzer.initialize()
         await self.file_manager.initialize()
+        await self.task_store.initialize()
+        await self.callbacks.initialize()
+        await self.result_index.initialize()
+        await self.page_images.initialize()
+        if self.job_broker is not None:
+            await self.job_broker.initialize()
+        
+        if self.role == "producer":
+            # Thin producer: no models are loaded in the API process
+            self.models_ready = True
+            logger.info("Document processor pipeline initialized")
+            return
+        
+        if self.artifact_cache is not None:
+            await self.artifact_cache.initialize()
+        if self.journal is not None:
+            await self.journal.initialize()
+        
+        self._models_task = asyncio.create_task(self._load_models())
+        if not load_models_in_background:
+            await self._models_task
+    
+    async def _load_models(self):
+        """Start the extraction workers and analyzers, then start running jobs"""
+        start_time = time.time()
+        try:
+            await self.extraction_engine.initialize()
+            await self.llm_analyzer.initialize()
+            await self.risk_analyzer.initialize()
+            await self.opportunity_analyzer.initialize()
+            await self.quality_analyzer.initialize()
+        except Exception as e:
+            self.startup_error = f"{type(e).__name__}: {e}"
+            logger.error(f"Loading extraction models failed: {e}")
+            raise
+        
+        self.models_ready = True
+        
+        # A drain that started during loading has already stopped the queue
+        if self.role == "embedded" and not self.draining:
+            await self.job_queue.start()
+            if self.journal is not None:
+                await self._resume_unfinished()
         
-        logger.info("Document processor pipeline initialized")
+        logger.info(f"Document processor pipeline initialized in {time.time() - start_time:.1f}s")
+    
+    async def readiness(self) -> Dict[str, Any]:
+        """
+        Whether this instance should receive uploads: models loaded and warm,
+        not draining and the processing queue not full
+        """
+        if self.startup_error:
+            status = "failed"
+        elif self.draining:
+            status = "draining"
+        elif not self.models_ready:
+            status = "starting"
+        else:
+            try:
+                await self._check_capacity()
+                status = "ready"
+            except QueueFullError:
+                status = "saturated"
+        
+        return {
+            "ready": status == "ready",
+            "status": status,
+            "role": self.role,
+            "models": {
+                "ready": self.models_ready,
+                "warmup": self.extraction_engine.warmup,
+                "error": self.startup_error
+            }
+        }
     
     async def cleanup(self):
-        """Cleanup resources"""
+        """Drain running work, then release resources"""
         logger.info("Cleaning up document processor")
-        # Add cleanup logic for components
+        if self._models_task is not None:
+            self._models_task.cancel()
+            await asyncio.gather(self._models_task, return_exceptions=True)
+        await self.drain()
+        await self.job_queue.stop()
+        await self.callbacks.close(timeout=self.settings.callback_timeout)
+        if self.job_broker is not None:
+            await self.job_broker.close()
+        await self.result_index.close()
+        await self.task_store.close()
+        await self.extraction_engine.shutdown()
+    
+    def start_drain(self) -> asyncio.Task:
+        """
+        Begin a graceful shutdown without waiting for it
+        
+        Uploads are rejected from now on, waiting jobs are no longer started
+        and running pipelines get SHUTDOWN_GRACE_PERIOD seconds to finish.
+        Calling it again returns the drain already in progress.
+        """
+        if self._drain_task is None:
+            self.draining = True
+            self._drain_started_at = time.time()
+            self._drain_task = asyncio.create_task(self._drain())
+        return self._drain_task
+    
+    async def drain(self):
+        """Graceful shutdown: start draining if needed and wait until it is done"""
+        await self.start_drain()
+    
+    async def _drain(self):
+        """
+        Wait for running pipelines up to the grace period, then interrupt the rest
+        
+        Interrupted and waiting tasks keep their journal and resume on the next
+        start. Without checkpoints they cannot be resumed, so they are cancelled
+        and their clients notified instead of polling a task nobody runs.
+        """
+        grace = self.settings.shutdown_grace_period
+        
+        if self.role != "embedded":
+            # Producers run nothing; workers drain their broker jobs themselves
+            logger.info("Admission stopped for shutdown")
+            return
+        
+        self.job_queue.pause()
+        stats = self.job_queue.stats()
+        logger.info(f"Draining: {stats['running']} running, {stats['waiting']} waiting, "
+                    f"grace period {grace}s")
+        
+        if not await self.job_queue.wait_idle(grace):
+            logger.warning(f"Grace period over, interrupting {self.job_queue.stats()['running']} "
+                           f"running jobs")
+        await self.job_queue.stop()
+        
+        for job in self.job_queue.take_waiting():
+            if self.journal is not None:
+                await self.task_store.update(
+                    job.job_id, expected_status=ACTIVE_STATUSES,
+                    stage_name="Queued, resumes on restart"
+                )
+                continue
+            
+            await self.task_store.update(
+                job.job_id, expected_status=ACTIVE_STATUSES, status="cancelled",
+                error="Service shut down before the task started", completed_at=time.time()
+            )
+            if job.on_cancel is not None:
+                await job.on_cancel()
+        
+        logger.info(f"Drain finished in {time.time() - self._drain_started_at:.1f}s")
+    
+    def drain_status(self) -> Dict[str, Any]:
+        """Drain progress for the health endpoint"""
+        if not self.draining:
+            return {"draining": False}
+        
+        stats = self.job_queue.stats()
+        elapsed = time.time() - self._drain_started_at
+        return {
+            "draining": True,
+            "done": self._drain_task.done(),
+            "running": stats["running"],
+            "waiting": stats["waiting"],
+            "elapsed_seconds": round(elapsed, 1),
+            "grace_remaining_seconds": round(max(0.0, self.settings.shutdown_grace_period - elapsed), 1)
+        }
     
     async def process_document(self, file: UploadFile, context: Dict[str, Any]) -> str:
         """
@@ -78,95 +339,522 @@ class DocumentProcessor:
         
         Args:
             file: Uploaded document file
-            context: Processing context (ano, uasg, numero_pregao, callback_url)
+            context: Processing context (ano, uasg, numero_pregao, callback_url, tenant_id, profile)
         
         Returns:
             task_id: Unique identifier for tracking processing
+        
+        Raises:
+            QueueFullError: when the processing backlog is full
+            ServiceDrainingError: when the service is shutting down
+            FileTooLargeError: when the upload exceeds max_file_size
+            ValueError: when the context names an unknown pipeline profile
+        """
+        profile = self._resolve_profile(context.get("profile"))
+        
+        # Reject before buffering the upload when there is no room
+        await self._check_capacity()
+        
+        return await self._admit_document(file, file.filename, {**context, "profile": profile.name})
+    
+    async def process_batch(self, files: List[UploadFile], context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Start one pipeline per document of a batch
+        
+        Each file may be a PDF or a ZIP archive of PDFs. Archive entries are
+        streamed into storage one at a time, never extracted in memory. The
+        batch is admitted as a whole, so its children may exceed the queue
+        depth; they run as workers become free.
+        
+        Args:
+            files: Uploaded PDFs and/or ZIP archives
+            context: Processing context shared by every document
+        
+        Returns:
+            Batch record with batch_id, child task ids and skipped entries
+        
+        Raises:
+            QueueFullError: when the processing backlog is full
+            ServiceDrainingError: when the service is shutting down
+            ValueError: when the batch holds no PDF or too many documents, or
+                names an unknown pipeline profile
+        """
+        profile = self._resolve_profile(context.get("profile"))
+        context = {**context, "profile": profile.name}
+        
+        await self._check_capacity()
+        
+        batch_id = str(uuid.uuid4())
+        documents: List[Dict[str, str]] = []
+        skipped: List[Dict[str, str]] = []
+        
+        # List every PDF first (ZIPs only by their central directory), so a
+        # batch over the limit is rejected before any child is admitted
+        planned = []  # (file or archive, archive member or None, filename, label)
+        archives: List[zipfile.ZipFile] = []
+        try:
+            for file in files:
+                name = file.filename or ""
+                if name.lower().endswith(".pdf"):
+                    planned.append((file, None, name, name))
+                elif name.lower().endswith(".zip"):
+                    try:
+                        archive = await asyncio.to_thread(zipfile.ZipFile, file.file)
+                    except zipfile.BadZipFile:
+                        skipped.append({"filename": name, "reason": "Invalid ZIP archive"})
+                        continue
+                    archives.append(archive)
+                    
+                    for info in archive.infolist():
+                        entry_name = Path(info.filename).name
+                        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                            continue
+                        if not entry_name.lower().endswith(".pdf"):
+                            skipped.append({"filename": f"{name}/{info.filename}",
+                                            "reason": "Only PDF files are supported"})
+                            continue
+                        planned.append((archive, info, entry_name, f"{name}/{info.filename}"))
+                else:
+                    skipped.append({"filename": name, "reason": "Only PDF and ZIP files are supported"})
+            
+            if len(planned) > self.settings.max_batch_documents:
+                raise ValueError(
+                    f"Batch exceeds the maximum of {self.settings.max_batch_documents} documents"
+                )
+            
+            try:
+                for source, info, filename, label in planned:
+                    try:
+                        if info is None:
+                            task_id = await self._admit_document(
+                                source, filename, context, batch_id=batch_id
+                            )
+                        else:
+                            with source.open(info) as entry:
+                                task_id = await self._admit_document(
+                                    _ZipEntryReader(entry), filename, context, batch_id=batch_id
+                                )
+                    except FileTooLargeError as e:
+                        skipped.append({"filename": label, "reason": str(e)})
+                        continue
+                    documents.append({"task_id": task_id, "filename": filename})
+            except BaseException:
+                # The client never learns these task ids, so nothing may keep running
+                for document in documents:
+                    try:
+                        await self.cancel_task(document["task_id"])
+                    except Exception as e:
+                        logger.warning(f"Failed to cancel batch child {document['task_id']}: {e}")
+                raise
+        finally:
+            for archive in archives:
+                archive.close()
+        
+        if not documents:
+            raise ValueError("Batch contains no PDF documents")
+        
+        batch = {
+            "batch_id": batch_id,
+            "created_at": time.time(),
+            "documents": documents,
+            "skipped": skipped
+        }
+        await self.task_store.create_batch(batch)
+        
+        logger.info(f"Batch {batch_id} admitted: {len(documents)} documents, {len(skipped)} skipped")
+        return batch
+    
+    async def _admit_document(self, source, filename: str, context: Dict[str, Any],
+                              batch_id: Optional[str] = None) -> str:
+        """
+        Spool one document, register its task and queue its pipeline
+        
+        Args:
+            source: Object with an async read(size) method
+            filename: Original filename
+            context: Processing context (ano, uasg, numero_pregao, callback_url, tenant_id)
+            batch_id: Parent batch; batch children skip the queue depth check
+        
+        Returns:
+            task_id of the new task
         """
         task_id = str(uuid.uuid4())
         
         # Create processing context
         processing_context = ProcessingContext(
             task_id=task_id,
-            filename=file.filename,
+            filename=filename,
             ano=context.get("ano"),
             uasg=context.get("uasg"),
             numero_pregao=context.get("numero_pregao"),
-            callback_url=context.get("callback_url")
+            callback_url=context.get("callback_url"),
+            batch_id=batch_id,
+            tenant_id=context.get("tenant_id"),
+            profile=context.get("profile"),
+            profile_fingerprint=self.profile_fingerprints.get(context.get("profile"))
         )
         
+        # Stream the upload to storage now: FastAPI closes it once the response
+        # is sent, and workers read the original from shared storage
+        upload = await self.file_manager.spool_upload(
+            source, processing_context.filename, processing_context
+        )
+        processing_context.content_sha256 = upload.sha256
+        file_path = upload.path
+        
         # Initialize task status
-        self.active_tasks[task_id] = TaskStatus(
+        await self.task_store.create(TaskStatus(
             task_id=task_id,
-            status="processing",
-            current_stage=1,
+            status="pending",
+            current_stage=0,
             total_stages=9,
-            created_at=time.time()
-        )
+            created_at=time.time(),
+            file_path=str(file_path),
+            batch_id=batch_id
+        ))
         
-        # Start processing in background
-        asyncio.create_task(self._process_pipeline(file, processing_context))
+        # Identical document already processed or in flight: no new pipeline
+        if self.settings.enable_deduplication and await self._deduplicate(processing_context):
+            return task_id
+        
+        # Queue the pipeline; raises QueueFullError if the backlog filled up meanwhile
+        try:
+            await self._queue_pipeline(
+                processing_context, file_path, upload.size, check_depth=batch_id is None
+            )
+        except QueueFullError:
+            await self.task_store.delete(task_id)
+            if self.settings.enable_deduplication:
+                await self._hand_over_claim(processing_context)
+            raise
         
         return task_id
     
-    async def _process_pipeline(self, file: UploadFile, context: ProcessingContext):
-        """Execute the complete 9-stage processing pipeline"""
+    async def _queue_pipeline(self, context: ProcessingContext, file_path: Path, size: int,
+                              check_depth: bool = True):
+        """
+        Queue the pipeline of a registered task, on the broker or in-process
+        
+        Raises:
+            QueueFullError: when check_depth is set and the local backlog is full
+        """
         task_id = context.task_id
-        stages = []
+        
+        # Page count and text layer decide where the job goes in the queue
+        job_cost = await asyncio.to_thread(
+            estimate_job_cost, file_path, size, self._profile_of(context).ocr != "none"
+        )
+        logger.info(f"Task {task_id}: {job_cost.pages} pages, "
+                    f"text layer {job_cost.text_layer_ratio:.0%}, cost {job_cost.cost:.1f}")
+        
+        if self.job_broker is not None:
+            await self.job_broker.enqueue(task_id, {
+                "file_path": str(file_path),
+                "context": context.to_dict(),
+                "cost": job_cost.cost
+            }, cost=job_cost.cost, tenant=context.tenant)
+            return
+        
+        if self.journal is not None:
+            await self.journal.open(task_id, file_path, context, job_cost.cost)
         
         try:
-            # Read file content
-            file_content = await file.read()
-            
-            # Save original file
-            file_path = await self.file_manager.save_original_file(
-                file_content, context.filename, context
+            self.job_queue.submit(
+                task_id,
+                lambda: self._process_pipeline(file_path, context),
+                check_depth=check_depth,
+                cost=job_cost.cost,
+                tenant=context.tenant,
+                on_cancel=lambda: self._finish_cancelled(context)
             )
+        except QueueFullError:
+            await self._close_journal(task_id)
+            raise
+    
+    async def _deduplicate(self, context: ProcessingContext) -> bool:
+        """
+        Serve an upload from the result index when its content was seen before
+        
+        A completed result is linked to the task right away. If another task is
+        already processing the same content, this task becomes its follower and
+        completes when the leader does. Otherwise this task claims the content
+        and runs the pipeline itself. Content is keyed by hash and pipeline
+        profile, so another profile never reuses a result.
+        
+        Returns:
+            True if no pipeline needs to run for this task
+        """
+        key = context.result_key
+        
+        entry = await self.result_index.get(key)
+        if entry and Path(entry["result_path"]).exists():
+            logger.info(f"Task {context.task_id} reuses result of task {entry['task_id']}")
+            await self._complete_from_result(context, entry)
+            return True
+        
+        leader = await self.result_index.claim(key, context.task_id)
+        if leader is None:
+            return False
+        
+        logger.info(f"Task {context.task_id} follows in-flight task {leader}")
+        await self.task_store.update(context.task_id, stage_name=f"Waiting for task {leader}")
+        await self.result_index.add_follower(key, context.to_dict())
+        
+        # The leader may have finished between the claim and add_follower
+        entry = await self.result_index.get(key)
+        if entry:
+            await self._complete_followers(key, entry)
+            return True
+        
+        # Leader gave up without a result: process this upload ourselves
+        if await self.result_index.claim(key, context.task_id) is None:
+            return False
+        
+        return True
+    
+    async def _complete_from_result(self, context: ProcessingContext, entry: Dict[str, Any]):
+        """Complete a task by linking an existing result with its own context"""
+        result_path = await self.file_manager.link_result(
+            Path(entry["result_path"]), entry["task_id"], context
+        )
+        
+        completed = await self.task_store.update(
+            context.task_id,
+            expected_status=ACTIVE_STATUSES,
+            status="completed",
+            current_stage=9,
+            progress_percentage=100.0,
+            result_path=str(result_path),
+            completed_at=time.time()
+        )
+        
+        if completed is not None and context.callback_url:
+            await self._send_callback(context.callback_url, {
+                "task_id": context.task_id,
+                "status": "completed",
+                "result_path": str(result_path)
+            })
+    
+    async def _complete_followers(self, key: str, entry: Dict[str, Any]):
+        """Link the leader's result to every task waiting on the same content"""
+        for follower in await self.result_index.pop_followers(key):
+            context = ProcessingContext.from_dict(follower)
+            if context.task_id == entry["task_id"]:
+                continue
             
-            logger.info(f"Starting 9-stage pipeline for task {task_id}")
+            try:
+                await self._complete_from_result(context, entry)
+            except Exception as e:
+                logger.error(f"Failed to link result for follower {context.task_id}: {e}")
+                await self.task_store.update(
+                    context.task_id, status="failed", error=str(e), completed_at=time.time()
+                )
+    
+    async def _hand_over_claim(self, context: ProcessingContext):
+        """
+        Drop the leader claim of a task that ends without a result
+        
+        The tasks waiting on it belong to other uploads and were not cancelled,
+        so the oldest one still active claims the content and runs its own
+        pipeline; the others follow it. Without a journal or broker, a drain
+        cancels them like the waiting jobs, since nothing would run them.
+        """
+        key = context.result_key
+        await self.result_index.release(key, context.task_id)
+        
+        successor = None
+        for follower in await self.result_index.pop_followers(key):
+            follower_context = ProcessingContext.from_dict(follower)
+            if follower_context.task_id == context.task_id:
+                continue
+            task = await self.task_store.get(follower_context.task_id)
+            if task is None or task.status not in ACTIVE_STATUSES:
+                continue
             
-            # === STAGES 1-3: DOCUMENT PARSING & EXTRACTION ===
-            extraction_result = await self._execute_stages_1_3(
-                file_content, context.filename, task_id
-            )
-            stages.extend(extraction_result.processing_stages)
+            if self.draining and self.job_broker is None and self.journal is None:
+                await self._cancel_follower(follower_context, "Service shut down before the task started")
+                continue
             
-            # === STAGES 4-6: AI ANALYSIS ===
-            analysis_result = await self._execute_stages_4_6(
-                extraction_result, context, task_id
-            )
-            stages.extend(analysis_result["stages"])
+            if successor is None and await self.result_index.claim(key, follower_context.task_id) is None:
+                try:
+                    await self.task_store.update(
+                        follower_context.task_id, expected_status=ACTIVE_STATUSES, stage_name=""
+                    )
+                    await self._queue_pipeline(
+                        follower_context, Path(task.file_path), Path(task.file_path).stat().st_size,
+                        check_depth=False
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to queue follower {follower_context.task_id}: {e}")
+                    await self.result_index.release(key, follower_context.task_id)
+                    await self._fail_follower(follower_context, str(e))
+                    continue
+                
+                successor = follower_context
+                logger.info(f"Task {follower_context.task_id} takes over from task {context.task_id}")
+                continue
             
-            # === STAGES 7-9: DATA STRUCTURING ===
-            final_result = await self._execute_stages_7_9(
-                extraction_result, analysis_result, context, task_id
+            await self.result_index.add_follower(key, follower)
+        
+        # Another upload may have claimed and finished the content meanwhile
+        entry = await self.result_index.get(key)
+        if entry:
+            await self._complete_followers(key, entry)
+    
+    async def _fail_follower(self, context: ProcessingContext, error: str):
+        """Fail a waiting duplicate that cannot be processed"""
+        failed = await self.task_store.update(
+            context.task_id, expected_status=ACTIVE_STATUSES,
+            status="failed", error=error, completed_at=time.time()
+        )
+        if failed is not None and context.callback_url:
+            await self._send_callback(context.callback_url, {
+                "task_id": context.task_id,
+                "status": "failed",
+                "error": error
+            })
+    
+    async def _cancel_follower(self, context: ProcessingContext, error: str):
+        """Cancel a waiting duplicate that will not run before shutdown"""
+        cancelled = await self.task_store.update(
+            context.task_id, expected_status=ACTIVE_STATUSES,
+            status="cancelled", error=error, completed_at=time.time()
+        )
+        if cancelled is not None and context.callback_url:
+            await self._send_callback(context.callback_url, {
+                "task_id": context.task_id,
+                "status": "cancelled"
+            })
+    
+    async def _check_capacity(self):
+        """Raise QueueFullError when the local queue or the broker backlog is full"""
+        if self.draining:
+            raise ServiceDrainingError(
+                "Service is shutting down",
+                retry_after=max(1, math.ceil(self.settings.shutdown_grace_period))
             )
-            stages.extend(final_result["stages"])
-            
-            # Compile final result
-            pipeline_result = PipelineResult(
-                task_id=task_id,
-                file_path=str(file_path),
-                structured_data=final_result["structured_data"],
-                tables=extraction_result.tables,
-                product_tables=final_result["product_tables"],
-                risks=analysis_result["risks"],
-                opportunities=analysis_result["opportunities"],
-                quality_score=final_result["quality_score"],
-                processing_times={f"stage_{s.stage_id}": s.duration_seconds for s in stages},
-                errors=final_result.get("errors", []),
-                warnings=final_result.get("warnings", []),
-                analysis=final_result.get("analysis", {}),
-                timestamp=time.time()
+        
+        if self.role != "producer":
+            self.job_queue.check_capacity()
+            return
+        
+        stats = await self.job_broker.stats()
+        if stats["pending"] >= self.settings.max_queue_depth:
+            rounds = (stats["pending"] + 1) / max(1, self.settings.max_concurrent_jobs)
+            raise QueueFullError(
+                f"Processing queue is full ({stats['pending']} jobs waiting)",
+                retry_after=max(1, math.ceil(rounds * self.settings.estimated_job_seconds))
             )
+    
+    def _resolve_profile(self, name: Optional[str]) -> PipelineProfile:
+        """Pipeline profile requested for an upload; None selects the default"""
+        if not name:
+            return self.profiles[self.settings.default_pipeline_profile]
+        if name not in self.profiles:
+            raise ValueError(f"Unknown pipeline profile '{name}', "
+                             f"available: {', '.join(sorted(self.profiles))}")
+        return self.profiles[name]
+    
+    def _profile_of(self, context: ProcessingContext) -> PipelineProfile:
+        """Profile of an admitted task; the default if it was removed since"""
+        return self.profiles.get(context.profile) or self.profiles[self.settings.default_pipeline_profile]
+    
+    async def run_job(self, payload: Dict[str, Any], final_attempt: bool = True):
+        """
+        Run the pipeline for a job taken from the broker (worker role)
+        
+        Raises:
+            Exception: the pipeline error when attempts remain, so the job is retried
+        """
+        context = ProcessingContext.from_dict(payload["context"])
+        await self._process_pipeline(Path(payload["file_path"]), context, final_attempt)
+    
+    async def _process_pipeline(self, file_path: Path, context: ProcessingContext,
+                                final_attempt: bool = True):
+        """
+        Execute the complete 9-stage processing pipeline
+        
+        Failures are recorded on the task; when final_attempt is False the task
+        goes back to pending and the error is re-raised for the caller to retry.
+        """
+        task_id = context.task_id
+        stages = []
+        
+        started = await self.task_store.update(
+            task_id, expected_status=ACTIVE_STATUSES, status="processing", started_at=time.time()
+        )
+        if started is None:
+            logger.info(f"Task {task_id} was cancelled before it started")
+            await self._finish_cancelled(context)
+            return
+        
+        # Deadline for the whole attempt; expiry cancels the running stage and
+        # kills its extraction worker process
+        deadline = self.settings.max_processing_time or None
+        
+        # Duplicates wait on this task's claim; keep it from expiring mid-conversion
+        claim_keeper = None
+        if self.settings.enable_deduplication and context.content_sha256:
+            claim_keeper = asyncio.create_task(self._keep_claim(context))
+        
+        try:
+            async with asyncio.timeout(deadline):
+                logger.info(f"Starting 9-stage pipeline for task {task_id}")
+                
+                # === STAGES 1-3: DOCUMENT PARSING & EXTRACTION ===
+                extraction_result = await self._execute_stages_1_3(file_path, context)
+                stages.extend(extraction_result.processing_stages)
+                
+                # === STAGES 4-9: ANALYSIS & DATA STRUCTURING (dependency graph) ===
+                analysis_state = await self._execute_stages_4_9(
+                    extraction_result, task_id, self._profile_of(context)
+                )
+                stages.extend(analysis_state["stages"])
+                validation_result = analysis_state["validation"]
+                
+                # Compile final result
+                pipeline_result = PipelineResult(
+                    task_id=task_id,
+                    file_path=str(file_path),
+                    structured_data=analysis_state["structured_data"],
+                    tables=extraction_result.tables,
+                    product_tables=analysis_state["product_tables"],
+                    risks=analysis_state["risks"],
+                    opportunities=analysis_state["opportunities"],
+                    quality_score=analysis_state["quality_score"],
+                    processing_times={f"stage_{s.stage_id}": s.duration_seconds for s in stages},
+                    errors=validation_result.get("errors", []),
+                    warnings=validation_result.get("warnings", []),
+                    analysis={
+                        "validation": validation_result,
+                        "extraction_metadata": extraction_result.json_content,
+                        "stage_timings": {
+                            f"stage_{s.stage_id}": {
+                                "wall_seconds": s.duration_seconds,
+                                "cpu_seconds": s.cpu_seconds,
+                                **s.metadata
+                            }
+                            for s in stages
+                        }
+                    },
+                    timestamp=time.time()
+                )
+                
+                # Save result
+                result_path = await self.file_manager.save_result(pipeline_result, context)
             
-            # Save result
-            result_path = await self.file_manager.save_result(pipeline_result, context)
-            
-            # Update task status
-            self.active_tasks[task_id].status = "completed"
-            self.active_tasks[task_id].result_path = str(result_path)
-            self.active_tasks[task_id].completed_at = time.time()
+            # Update task status unless it was cancelled meanwhile
+            completed = await self.task_store.update(
+                task_id,
+                expected_status=ACTIVE_STATUSES,
+                status="completed",
+                current_stage=9,
+                progress_percentage=100.0,
+                result_path=str(result_path),
+                completed_at=time.time()
+            )
+            if completed is None:
+                raise TaskCancelledError(f"Task {task_id} was cancelled")
             
             # Send callback if provided
             if context.callback_url:
@@ -176,192 +864,407 @@ class DocumentProcessor:
                     "result_path": str(result_path)
                 })
             
-            logger.info(f"Pipeline completed successfully for task {task_id}")
+            # Publish the result for later duplicates and complete waiting ones
+            if self.settings.enable_deduplication and context.content_sha256:
+                entry = {"task_id": task_id, "result_path": str(result_path)}
+                await self.result_index.put(context.result_key, entry)
+                await self.result_index.release(context.result_key, task_id)
+                await self._complete_followers(context.result_key, entry)
             
+            await self._close_journal(task_id)
+            logger.info(f"Pipeline completed successfully for task {task_id}")
+        
+        except TaskCancelledError:
+            logger.info(f"Pipeline stopped for cancelled task {task_id}")
+            await self._finish_cancelled(context)
+        
+        except asyncio.CancelledError:
+            task = await self.task_store.get(task_id)
+            resumable = self.journal is not None or self.role == "worker"
+            if resumable and task is not None and task.status != "cancelled":
+                # Service shutdown: the journal (or the broker, for workers)
+                # lets the task run again
+                logger.info(f"Pipeline interrupted for task {task_id}, resumes on restart")
+                await self.task_store.update(
+                    task_id, expected_status=ACTIVE_STATUSES,
+                    status="pending", stage_name="Interrupted, resumes on restart"
+                )
+            else:
+                logger.info(f"Pipeline cancelled for task {task_id}")
+                await self._finish_cancelled(context)
+            raise
+        
+        except TimeoutError:
+            # Retrying would most likely hit the same deadline, so this is final
+            await self._fail_task(
+                context, f"Pipeline for task {task_id} exceeded the processing time limit "
+                         f"of {self.settings.max_processing_time}s"
+            )
+        
         except Exception as e:
             error_msg = f"Pipeline failed for task {task_id}: {str(e)}"
-            logger.error(error_msg)
             
-            # Update task status
-            self.active_tasks[task_id].status = "failed"
-            self.active_tasks[task_id].error = error_msg
-            self.active_tasks[task_id].completed_at = time.time()
+            if not final_attempt:
+                logger.error(error_msg)
+                await self.task_store.update(
+                    task_id, expected_status=ACTIVE_STATUSES, status="pending", error=error_msg
+                )
+                raise
             
-            # Send callback if provided
-            if context.callback_url:
-                await self._send_callback(context.callback_url, {
-                    "task_id": task_id,
-                    "status": "failed",
-                    "error": error_msg
-                })
+            await self._fail_task(context, error_msg)
+        
+        finally:
+            if claim_keeper is not None:
+                claim_keeper.cancel()
     
-    async def _execute_stages_1_3(self, file_content: bytes, filename: str, task_id: str):
-        """Execute Stages 1-3: Document Parsing & Extraction using Docling"""
-        logger.info(f"Executing stages 1-3 for task {task_id}")
+    async def _keep_claim(self, context: ProcessingContext):
+        """Refresh the leader claim of a running pipeline at the job lease heartbeat"""
+        interval = max(1, self.settings.job_visibility_timeout // 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.result_index.refresh(context.result_key, context.task_id):
+                    logger.warning(f"Task {context.task_id} lost its claim on {context.result_key}")
+                    return
+            except Exception as e:
+                logger.warning(f"Claim refresh failed for task {context.task_id}: {e}")
+    
+    async def _fail_task(self, context: ProcessingContext, error_msg: str):
+        """Record a final pipeline failure, notify the client and hand waiting duplicates over"""
+        logger.error(error_msg)
         
         # Update task status
-        self.active_tasks[task_id].current_stage = 1
-        self.active_tasks[task_id].stage_name = "Document Parsing & Extraction"
+        failed = await self.task_store.update(
+            context.task_id, expected_status=ACTIVE_STATUSES,
+            status="failed", error=error_msg, completed_at=time.time()
+        )
         
-        # Execute Docling extraction
-        result = await self.docling_extractor.extract_document(file_content, filename)
+        # Send callback if provided
+        if failed is not None and context.callback_url:
+            await self._send_callback(context.callback_url, {
+                "task_id": context.task_id,
+                "status": "failed",
+                "error": error_msg
+            })
         
-        # Update task status
-        self.active_tasks[task_id].current_stage = 3
+        if self.settings.enable_deduplication and context.content_sha256:
+            await self._hand_over_claim(context)
         
-        return result
+        await self._close_journal(context.task_id)
     
-    async def _execute_stages_4_6(self, extraction_result, context: ProcessingContext, task_id: str):
-        """Execute Stages 4-6: AI Analysis using LLM"""
-        logger.info(f"Executing stages 4-6 for task {task_id}")
-        
-        # Stage 4: Content Classification
-        self.active_tasks[task_id].current_stage = 4
-        self.active_tasks[task_id].stage_name = "Content Classification"
+    async def _finish_cancelled(self, context: ProcessingContext):
+        """Release what a cancelled task held and notify its client"""
+        task_id = context.task_id
         
-        stage4_start = time.time()
-        classification_result = await self.llm_analyzer.classify_content(
-            extraction_result.markdown_content,
-            extraction_result.tables
+        # Usually already set by cancel_task; covers shutdown cancellation
+        await self.task_store.update(
+            task_id, expected_status=ACTIVE_STATUSES,
+            status="cancelled", error="Task cancelled", completed_at=time.time()
         )
-        stage4_time = time.time() - stage4_start
         
-        # Stage 5: Risk Analysis
-        self.active_tasks[task_id].current_stage = 5
-        self.active_tasks[task_id].stage_name = "Risk Analysis"
+        if self.settings.enable_deduplication and context.content_sha256:
+            await self._hand_over_claim(context)
         
-        stage5_start = time.time()
-        risks = await self.risk_analyzer.analyze_risks(
-            extraction_result.markdown_content,
-            classification_result["structured_data"]
-        )
-        stage5_time = time.time() - stage5_start
+        if context.callback_url:
+            await self._send_callback(context.callback_url, {
+                "task_id": task_id,
+                "status": "cancelled"
+            })
         
-        # Stage 6: Opportunity Identification
-        self.active_tasks[task_id].current_stage = 6
-        self.active_tasks[task_id].stage_name = "Opportunity Identification"
-        
-        stage6_start = time.time()
-        opportunities = await self.opportunity_analyzer.identify_opportunities(
-            extraction_result.markdown_content,
-            classification_result["structured_data"],
-            extraction_result.tables
-        )
-        stage6_time = time.time() - stage6_start
+        await self._close_journal(task_id)
+    
+    async def _close_journal(self, task_id: str):
+        """Drop the journal and checkpoints of a task that reached a final status"""
+        if self.journal is not None:
+            await self.journal.close(task_id)
+    
+    async def _checkpoint(self, task_id: str, name: str, data: Dict[str, Any]):
+        """Checkpoint a stage result; failures only cost the ability to resume"""
+        if self.journal is None:
+            return
         
-        # Prepare stages
-        stages = [
-            ProcessingStage(
-                stage_id=4,
-                stage_name="Content Classification",
-                duration_seconds=stage4_time,
-                status="completed",
-                confidence=0.85
-            ),
-            ProcessingStage(
-                stage_id=5,
-                stage_name="Risk Analysis",
-                duration_seconds=stage5_time,
-                status="completed",
-                confidence=0.80
-            ),
-            ProcessingStage(
-                stage_id=6,
-                stage_name="Opportunity Identification",
-                duration_seconds=stage6_time,
-                status="completed",
-                confidence=0.75
+        try:
+            await self.journal.checkpoint(task_id, name, data)
+        except Exception as e:
+            logger.warning(f"Failed to checkpoint {name} for task {task_id}: {e}")
+    
+    async def _resume_unfinished(self):
+        """Queue again the tasks that were queued or running when the process stopped"""
+        resumed = 0
+        for entry in await self.journal.unfinished():
+            context = ProcessingContext.from_dict(entry["context"])
+            task_id = context.task_id
+            file_path = Path(entry["file_path"])
+            
+            task = await self.task_store.get(task_id)
+            if task is not None and task.status in TERMINAL_STATUSES:
+                await self.journal.close(task_id)
+                continue
+            
+            if not file_path.exists():
+                logger.warning(f"Cannot resume task {task_id}: {file_path} is gone")
+                await self.journal.close(task_id)
+                if task is not None:
+                    await self.task_store.update(
+                        task_id, status="failed", error="Original file lost during restart",
+                        completed_at=time.time()
+                    )
+                continue
+            
+            # The in-memory store starts empty after a restart
+            if task is None:
+                await self.task_store.create(TaskStatus(
+                    task_id=task_id,
+                    status="pending",
+                    current_stage=0,
+                    total_stages=9,
+                    created_at=context.created_at,
+                    file_path=str(file_path),
+                    batch_id=context.batch_id
+                ))
+            await self.task_store.update(task_id, status="pending", stage_name="Resuming after restart")
+            
+            if self.settings.enable_deduplication and context.content_sha256:
+                await self.result_index.claim(context.result_key, task_id)
+            
+            self.job_queue.submit(
+                task_id,
+                lambda file_path=file_path, context=context: self._process_pipeline(file_path, context),
+                check_depth=False,
+                cost=entry["cost"],
+                tenant=context.tenant,
+                on_cancel=lambda context=context: self._finish_cancelled(context)
             )
-        ]
+            resumed += 1
         
-        return {
-            "structured_data": classification_result["structured_data"],
-            "risks": risks,
-            "opportunities": opportunities,
-            "stages": stages
-        }
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished tasks from the journal")
     
-    async def _execute_stages_7_9(self, extraction_result, analysis_result, 
-                                 context: ProcessingContext, task_id: str):
-        """Execute Stages 7-9: Data Structuring & Quality Assessment"""
-        logger.info(f"Executing stages 7-9 for task {task_id}")
-        
-        # Stage 7: Data Validation
-        self.active_tasks[task_id].current_stage = 7
-        self.active_tasks[task_id].stage_name = "Data Validation"
-        
-        stage7_start = time.time()
-        validation_result = await self.quality_analyzer.validate_data(
-            analysis_result["structured_data"],
-            extraction_result.tables,
-            analysis_result["risks"]
-        )
-        stage7_time = time.time() - stage7_start
+    async def _execute_stages_1_3(self, file_path: Path, context: ProcessingContext):
+        """Execute Stages 1-3: Document Parsing & Extraction using Docling"""
+        task_id = context.task_id
+        logger.info(f"Executing stages 1-3 for task {task_id}")
         
-        # Stage 8: Structured Output
-        self.active_tasks[task_id].current_stage = 8
-        self.active_tasks[task_id].stage_name = "Structured Output"
+        # Update task status
+        await self._set_stage(task_id, 1, "Document Parsing & Extraction")
         
-        stage8_start = time.time()
+        # Resumed task that finished extraction before the restart
+        if self.journal is not None:
+            saved = await self.journal.load(task_id, "extraction")
+            if saved is not None:
+                logger.info(f"Task {task_id} resumes after stage 3 from its checkpoint")
+                result = ExtractionResult.from_dict(saved)
+                await self._set_stage(task_id, 3, "Table & Structure Extraction",
+                                      stage_timings=self._stage_timings(result.processing_stages))
+                return result
         
-        # Process product tables
-        product_tables = await self._classify_product_tables(extraction_result.tables)
+        # Reuse artifacts of an earlier extraction of the same bytes and converter setup
+        profile = self._profile_of(context)
+        sha256 = context.content_sha256
+        fingerprint = self.extraction_engine.fingerprints.get(profile.name)
+        if self.artifact_cache is not None and sha256 and fingerprint:
+            load_start = time.time()
+            result = await self.artifact_cache.get(sha256, fingerprint)
+            if result is not None:
+                logger.info(f"Artifact cache hit for task {task_id}")
+                self._mark_cached_stages(result, time.time() - load_start)
+                await self._set_stage(task_id, 3, "Table & Structure Extraction",
+                                      stage_timings=self._stage_timings(result.processing_stages))
+                return result
         
-        stage8_time = time.time() - stage8_start
+        # Execute Docling extraction in a worker process
+        result = await self.extraction_engine.extract(file_path, context.filename, profile)
         
-        # Stage 9: Result Compilation
-        self.active_tasks[task_id].current_stage = 9
-        self.active_tasks[task_id].stage_name = "Result Compilation"
+        if self.artifact_cache is not None and sha256 and fingerprint:
+            try:
+                await self.artifact_cache.put(sha256, fingerprint, result)
+            except Exception as e:
+                logger.warning(f"Failed to cache extraction artifacts for task {task_id}: {e}")
         
-        stage9_start = time.time()
+        await self._checkpoint(task_id, "extraction", result.to_dict())
         
-        # Calculate final quality score
-        quality_score = await self.quality_analyzer.calculate_final_quality(
-            extraction_result.quality_scores,
-            validation_result,
-            len(analysis_result["risks"]),
-            len(analysis_result["opportunities"])
-        )
+        # Update task status
+        await self._set_stage(task_id, 3, "Table & Structure Extraction",
+                              stage_timings=self._stage_timings(result.processing_stages))
         
-        stage9_time = time.time() - stage9_start
+        return result
+    
+    @staticmethod
+    def _mark_cached_stages(result, load_seconds: float):
+        """Report stages 1-3 as served from cache, keeping the original timings as metadata"""
+        for stage in result.processing_stages:
+            stage.metadata.update({
+                "cache_hit": True,
+                "original_duration_seconds": stage.duration_seconds,
+                "original_cpu_seconds": stage.cpu_seconds
+            })
+            stage.duration_seconds = load_seconds if stage.stage_id == 1 else 0.0
+            stage.cpu_seconds = None
+        result.total_processing_time = load_seconds
+    
+    def _build_stage_graph(self) -> StageScheduler:
+        """
+        Declare stages 4-9 with their inputs and outputs.
         
-        # Prepare stages
+        Risk analysis, opportunity identification and product table
+        classification only depend on extraction output and stage 4, so the
+        scheduler runs them concurrently.
+        """
         stages = [
-            ProcessingStage(
+            StageDefinition(
+                stage_id=4,
+                stage_name="Content Classification",
+                inputs=("markdown_content", "tables"),
+                outputs=("structured_data",),
+                run=self._stage_classify_content,
+                confidence=0.85
+            ),
+            StageDefinition(
+                stage_id=5,
+                stage_name="Risk Analysis",
+                inputs=("markdown_content", "structured_data"),
+                outputs=("risks",),
+                run=self._stage_analyze_risks,
+                confidence=0.80
+            ),
+            StageDefinition(
+                stage_id=6,
+                stage_name="Opportunity Identification",
+                inputs=("markdown_content", "structured_data", "tables"),
+                outputs=("opportunities",),
+                run=self._stage_identify_opportunities,
+                confidence=0.75
+            ),
+            StageDefinition(
                 stage_id=7,
                 stage_name="Data Validation",
-                duration_seconds=stage7_time,
-                status="completed",
+                inputs=("structured_data", "tables", "risks"),
+                outputs=("validation",),
+                run=self._stage_validate_data,
                 confidence=0.90
             ),
-            ProcessingStage(
+            StageDefinition(
                 stage_id=8,
                 stage_name="Structured Output",
-                duration_seconds=stage8_time,
-                status="completed",
+                inputs=("tables",),
+                outputs=("product_tables",),
+                run=self._stage_structure_output,
                 confidence=0.95
             ),
-            ProcessingStage(
+            StageDefinition(
                 stage_id=9,
                 stage_name="Result Compilation",
-                duration_seconds=stage9_time,
-                status="completed",
+                inputs=("quality_scores", "validation", "risks", "opportunities"),
+                outputs=("quality_score",),
+                run=self._stage_compile_result,
                 confidence=0.95
             )
         ]
+        return StageScheduler(stages, initial_keys=("markdown_content", "tables", "quality_scores"))
+    
+    async def _execute_stages_4_9(self, extraction_result, task_id: str,
+                                  profile: PipelineProfile) -> Dict[str, Any]:
+        """Execute Stages 4-9: AI analysis, data structuring and quality assessment"""
+        logger.info(f"Executing stages 4-9 for task {task_id}")
         
-        return {
-            "structured_data": analysis_result["structured_data"],
-            "product_tables": product_tables,
-            "quality_score": quality_score,
-            "errors": validation_result.get("errors", []),
-            "warnings": validation_result.get("warnings", []),
-            "analysis": {
-                "validation": validation_result,
-                "extraction_metadata": extraction_result.json_content
-            },
-            "stages": stages
+        state = {
+            "markdown_content": extraction_result.markdown_content,
+            "tables": extraction_result.tables,
+            "quality_scores": extraction_result.quality_scores
         }
+        
+        # Stages checkpointed before a restart are not run again
+        completed = {}
+        if self.journal is not None:
+            for stage in self.stage_graph.stages:
+                saved = await self.journal.load(task_id, f"stage_{stage.stage_id}")
+                if saved is not None:
+                    state.update({
+                        key: _OUTPUT_DECODERS.get(key, lambda value: value)(value)
+                        for key, value in saved["outputs"].items()
+                    })
+                    completed[stage.stage_id] = ProcessingStage(**saved["record"])
+            if completed:
+                logger.info(f"Task {task_id} resumes with stages {sorted(completed)} checkpointed")
+        
+        # Analyzers the profile switches off produce empty outputs without running
+        for stage in self.stage_graph.stages:
+            if stage.stage_id in completed:
+                continue
+            if any(key in OPTIONAL_ANALYZERS and key not in profile.analyzers for key in stage.outputs):
+                state.update({key: [] for key in stage.outputs})
+                completed[stage.stage_id] = ProcessingStage(
+                    stage_id=stage.stage_id,
+                    stage_name=stage.stage_name,
+                    duration_seconds=0.0,
+                    status="skipped",
+                    confidence=0.0,
+                    metadata={"profile": profile.name}
+                )
+        
+        highest_started = 0
+        timings = self._stage_timings(extraction_result.processing_stages + list(completed.values()))
+        
+        async def on_stage_start(stage: StageDefinition):
+            nonlocal highest_started
+            if stage.stage_id > highest_started:
+                highest_started = stage.stage_id
+                await self._set_stage(task_id, stage.stage_id, stage.stage_name)
+        
+        async def on_stage_complete(stage: StageDefinition, record: ProcessingStage):
+            timings[f"stage_{record.stage_id}"] = record.duration_seconds
+            updated = await self.task_store.update(
+                task_id, expected_status=ACTIVE_STATUSES, stage_timings=dict(timings)
+            )
+            if updated is None:
+                raise TaskCancelledError(f"Task {task_id} was cancelled")
+            
+            await self._checkpoint(task_id, f"stage_{record.stage_id}", {
+                "outputs": {key: state[key] for key in stage.outputs},
+                "record": asdict(record)
+            })
+        
+        state["stages"] = await self.stage_graph.run(
+            state, on_stage_start=on_stage_start, on_stage_complete=on_stage_complete,
+            completed=completed
+        )
+        
+        return state
+    
+    async def _stage_classify_content(self, markdown_content: str, tables: List) -> Dict[str, Any]:
+        """Stage 4: Content Classification"""
+        classification_result = await self.llm_analyzer.classify_content(markdown_content, tables)
+        return {"structured_data": classification_result["structured_data"]}
+    
+    async def _stage_analyze_risks(self, markdown_content: str, structured_data) -> Dict[str, Any]:
+        """Stage 5: Risk Analysis"""
+        risks = await self.risk_analyzer.analyze_risks(markdown_content, structured_data)
+        return {"risks": risks}
+    
+    async def _stage_identify_opportunities(self, markdown_content: str, structured_data,
+                                            tables: List) -> Dict[str, Any]:
+        """Stage 6: Opportunity Identification"""
+        opportunities = await self.opportunity_analyzer.identify_opportunities(
+            markdown_content, structured_data, tables
+        )
+        return {"opportunities": opportunities}
+    
+    async def _stage_validate_data(self, structured_data, tables: List, risks: List) -> Dict[str, Any]:
+        """Stage 7: Data Validation"""
+        validation_result = await self.quality_analyzer.validate_data(structured_data, tables, risks)
+        return {"validation": validation_result}
+    
+    async def _stage_structure_output(self, tables: List) -> Dict[str, Any]:
+        """Stage 8: Structured Output (product tables)"""
+        return {"product_tables": await self._classify_product_tables(tables)}
+    
+    async def _stage_compile_result(self, quality_scores, validation: Dict[str, Any],
+                                    risks: List, opportunities: List) -> Dict[str, Any]:
+        """Stage 9: Result Compilation (final quality score)"""
+        quality_score = await self.quality_analyzer.calculate_final_quality(
+            quality_scores, validation, len(risks), len(opportunities)
+        )
+        return {"quality_score": quality_score}
     
     async def _classify_product_tables(self, tables: List) -> List[Dict]:
         """Classify and structure product tables"""
@@ -378,41 +1281,188 @@ class DocumentProcessor:
         return product_tables
     
     async def _send_callback(self, callback_url: str, data: Dict[str, Any]):
-        """Send callback notification"""
+        """Queue a callback notification; the dispatcher retries until it is delivered"""
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.post(callback_url, json=data, timeout=30)
-                response.raise_for_status()
-                logger.info(f"Callback sent successfully to {callback_url}")
+            await self.callbacks.send(callback_url, data)
         except Exception as e:
-            logger.error(f"Failed to send callback to {callback_url}: {e}")
+            logger.error(f"Failed to queue callback to {callback_url}: {e}")
+    
+    async def _set_stage(self, task_id: str, stage_id: int, stage_name: str, **changes: Any):
+        """
+        Record the stage a task is currently executing
+        
+        This is the pipeline's cancellation checkpoint: the update only applies
+        while the task is active.
+        
+        Raises:
+            TaskCancelledError: if the task was cancelled
+        """
+        updated = await self.task_store.update(
+            task_id,
+            expected_status=ACTIVE_STATUSES,
+            current_stage=stage_id,
+            stage_name=stage_name,
+            progress_percentage=(stage_id / 9) * 100,
+            **changes
+        )
+        if updated is None:
+            raise TaskCancelledError(f"Task {task_id} was cancelled")
     
-    async def get_task_status(self, task_id: str) -> Dict[str, Any]:
-        """Get current processing status for a task"""
-        if task_id not in self.active_tasks:
+    @staticmethod
+    def _stage_timings(stages: List[ProcessingStage]) -> Dict[str, float]:
+        """Wall seconds per finished stage, as published on the task"""
+        return {f"stage_{stage.stage_id}": stage.duration_seconds for stage in stages}
+    
+    async def _get_task(self, task_id: str) -> TaskStatus:
+        """Look up a task or raise ValueError"""
+        task = await self.task_store.get(task_id)
+        if task is None:
             raise ValueError(f"Task {task_id} not found")
+        return task
+    
+    async def get_task_status(self, task_id: str, wait: float = 0,
+                              since_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Get current processing status for a task
+        
+        Args:
+            task_id: Task identifier
+            wait: seconds to hold the request until the task changes (long-poll)
+            since_version: version the client already has; defaults to the current one
+        """
+        task = await self._get_task(task_id)
+        
+        if wait > 0 and task.status not in TERMINAL_STATUSES:
+            if since_version is None:
+                since_version = task.version
+            if task.version <= since_version:
+                task = await self._wait_for_change(task_id, since_version, wait) or task
+        
+        status = task.to_dict()
+        status["queue_position"] = await self.queue_position(task_id)
+        return status
+    
+    async def _wait_for_change(self, task_id: str, since_version: int,
+                               wait: float) -> Optional[TaskStatus]:
+        """First snapshot newer than since_version, or None if wait elapses first"""
+        events = self.task_store.watch(task_id, heartbeat=wait)
+        try:
+            async for task in events:
+                if task is None:
+                    return None
+                if task.version > since_version or task.status in TERMINAL_STATUSES:
+                    return task
+        finally:
+            await events.aclose()
+        return None
+    
+    async def get_batch_status(self, batch_id: str) -> Dict[str, Any]:
+        """Aggregate status and progress of the tasks of a batch"""
+        batch = await self.task_store.get_batch(batch_id)
+        if batch is None:
+            raise ValueError(f"Batch {batch_id} not found")
+        
+        tasks = await asyncio.gather(*[
+            self.task_store.get(document["task_id"]) for document in batch["documents"]
+        ])
         
-        task = self.active_tasks[task_id]
-        return asdict(task)
+        counts: Dict[str, int] = {}
+        documents = []
+        progress = 0.0
+        for document, task in zip(batch["documents"], tasks):
+            task_status = task.status if task else "expired"
+            counts[task_status] = counts.get(task_status, 0) + 1
+            # Finished children count as fully progressed, whatever the outcome
+            finished = task is None or task.status in TERMINAL_STATUSES
+            progress += 100.0 if finished else task.progress_percentage
+            documents.append({
+                **document,
+                "status": task_status,
+                "current_stage": task.current_stage if task else None,
+                "progress_percentage": task.progress_percentage if task else None,
+                "result_path": task.result_path if task else None,
+                "error": task.error if task else None
+            })
+        
+        total = len(documents)
+        finished = sum(count for status, count in counts.items()
+                       if status in TERMINAL_STATUSES or status == "expired")
+        if finished < total:
+            status = "processing" if counts.get("pending", 0) < total else "pending"
+        elif counts.get("completed", 0) == total:
+            status = "completed"
+        elif counts.get("completed", 0) == 0:
+            status = "failed"
+        else:
+            status = "completed_with_errors"
+        
+        return {
+            "batch_id": batch_id,
+            "status": status,
+            "total_documents": total,
+            "status_counts": counts,
+            "progress_percentage": progress / total if total else 100.0,
+            "created_at": batch["created_at"],
+            "documents": documents,
+            "skipped": batch["skipped"]
+        }
+    
+    async def cancel_task(self, task_id: str) -> bool:
+        """
+        Cancel a queued or running task
+        
+        Queued jobs are withdrawn; running pipelines stop at once (the
+        extraction worker process is killed) or at the next stage boundary.
+        
+        Returns:
+            False if the task had already finished
+        
+        Raises:
+            ValueError: if the task is unknown
+        """
+        await self._get_task(task_id)
+        cancelled = await self.task_store.update(
+            task_id, expected_status=ACTIVE_STATUSES,
+            status="cancelled", error="Cancelled by client", completed_at=time.time()
+        )
+        if cancelled is None:
+            return False
+        
+        logger.info(f"Task {task_id} cancelled by client")
+        
+        if self.job_broker is not None:
+            payload = await self.job_broker.cancel(task_id)
+            if payload is not None:
+                await self._finish_cancelled(ProcessingContext.from_dict(payload["context"]))
+            return True
+        
+        job = self.job_queue.cancel(task_id)
+        if job is not None and job.started_at is None and job.on_cancel is not None:
+            await job.on_cancel()
+        return True
+    
+    def watch_task(self, task_id: str, heartbeat: float) -> AsyncIterator[Optional[TaskStatus]]:
+        """Stream task snapshots as the pipeline moves through its stages"""
+        return self.task_store.watch(task_id, heartbeat)
+    
+    async def queue_position(self, task_id: str) -> Optional[int]:
+        """Position of a task in the local queue or the broker"""
+        if self.job_broker is not None:
+            return await self.job_broker.position(task_id)
+        return self.job_queue.position(task_id)
     
     async def get_quality_scores(self, task_id: str) -> Dict[str, Any]:
         """Get quality scores for a completed task"""
-        if task_id not in self.active_tasks:
-            raise ValueError(f"Task {task_id} not found")
-        
-        task = self.active_tasks[task_id]
+        task = await self._get_task(task_id)
         if task.status != "completed":
             raise ValueError(f"Task {task_id} is not completed")
         
         # Load and return quality data from result file
-        result_path = Path(task.result_path)
-        if not result_path.exists():
+        try:
+            result_data = await self.file_manager.read_result(Path(task.result_path))
+        except FileNotFoundError:
             raise ValueError(f"Result file not found for task {task_id}")
         
-        with open(result_path, 'r', encoding='utf-8') as f:
-            result_data = json.load(f)
-        
         return {
             "task_id": task_id,
             "quality_score": result_data["quality_score"],
@@ -423,18 +1473,42 @@ class DocumentProcessor:
     
     async def get_processing_result(self, task_id: str) -> Dict[str, Any]:
         """Get complete processing result"""
-        if task_id not in self.active_tasks:
-            raise ValueError(f"Task {task_id} not found")
-        
-        task = self.active_tasks[task_id]
+        task = await self._get_task(task_id)
         if task.status != "completed":
             raise ValueError(f"Task {task_id} is not completed")
         
-        # Load result from file
-        result_path = Path(task.result_path)
-        with open(result_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        # Parsed result, cached in memory after the first read
+        return await self.file_manager.read_result(Path(task.result_path))
+    
+    async def get_page_image(self, task_id: str, page_number: int, dpi: int) -> bytes:
+        """Render (or fetch from cache) one page of a task's original as PNG"""
+        task = await self._get_task(task_id)
+        if not task.file_path:
+            raise ValueError(f"Original document of task {task_id} is not available")
+        
+        try:
+            return await self.page_images.get(Path(task.file_path), page_number, dpi)
+        except FileNotFoundError:
+            raise ValueError(f"Original document of task {task_id} is no longer stored")
+    
+    async def get_queue_stats(self) -> Dict[str, Any]:
+        """Queue depth and per-tenant scheduling metrics (local queue or broker)"""
+        if self.job_broker is not None:
+            return await self.job_broker.stats()
+        return self.job_queue.stats()
+    
+    def get_callback_stats(self) -> Dict[str, Any]:
+        """Callback delivery counters and latency of this process"""
+        return self.callbacks.stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Artifact, result and page image cache counters of this process"""
+        results = self.file_manager.result_cache.stats()
+        pages = self.page_images.stats()
+        if self.artifact_cache is None:
+            return {"enabled": False, "results": results, "pages": pages}
+        return {"enabled": True, **self.artifact_cache.stats(), "results": results, "pages": pages}
     
     async def download_models(self):
         """Download required models"""
-        await self.docling_extractor.download_models()
\ No newline at end of file
+        await self.extraction_engine.download_models()
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""
+Durable Redis job queue between the API tier and OCR workers
+Reliable-queue pattern: per-tenant priority-ordered pending sets, processing list with leases,
+dead-letter list
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from ..config.settings import Settings
+from ..utils.logger import setup_logger
+from ..models.pipeline_models import DEFAULT_TENANT
+from .job_queue import TenantPolicy, job_priority
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class BrokerJob:
+    """Job reserved by a worker"""
+    job_id: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+# Add a job to its tenant's pending set. A tenant that becomes active starts
+# at the lowest weighted service among active tenants, so idle time is not
+# banked as credit.
+# KEYS: tenant pending, tenants, served, payloads, costs, priorities, job tenants
+# ARGV: job_id, tenant, payload, cost, priority, weights (JSON), default_weight
+_ENQUEUE_SCRIPT = """
+local weights = cjson.decode(ARGV[6])
+local function weight(tenant)
+    return math.max(tonumber(weights[tenant] or ARGV[7]), 1e-6)
+end
+if redis.call('SISMEMBER', KEYS[2], ARGV[2]) == 0 then
+    local floor = nil
+    for _, tenant in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+        local service = tonumber(redis.call('HGET', KEYS[3], tenant) or '0') / weight(tenant)
+        if floor == nil or service < floor then
+            floor = service
+        end
+    end
+    if floor ~= nil then
+        local lifted = floor * weight(ARGV[2])
+        if lifted > tonumber(redis.call('HGET', KEYS[3], ARGV[2]) or '0') then
+            redis.call('HSET', KEYS[3], ARGV[2], lifted)
+        end
+    end
+    redis.call('SADD', KEYS[2], ARGV[2])
+end
+redis.call('HSET', KEYS[4], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[5], ARGV[1], ARGV[4])
+redis.call('HSET', KEYS[6], ARGV[1], ARGV[5])
+redis.call('HSET', KEYS[7], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[1], tonumber(ARGV[5]), ARGV[1])
+return redis.call('ZRANK', KEYS[1], ARGV[1])
+"""
+
+# Take the next job, move it to the processing list and lease it in one step.
+# Among tenants below their concurrency cap, the one with the least weighted
+# service (cost started / weight) wins; within a tenant, the highest-priority
+# job, optionally only among jobs up to max_cost (fast-lane slots).
+# KEYS: tenants, served, running, processing, leases, attempts, costs, job tenants
+# ARGV: now, visibility_timeout, max_cost ('' = any), scan_limit, pending prefix,
+#       weights (JSON), default_weight, concurrency limits (JSON), default_max_concurrent
+_RESERVE_SCRIPT = """
+local weights = cjson.decode(ARGV[6])
+local limits = cjson.decode(ARGV[8])
+local best_tenant, best_job, best_service, best_priority
+for _, tenant in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local pending = ARGV[5] .. tenant
+    if redis.call('ZCARD', pending) == 0 then
+        redis.call('SREM', KEYS[1], tenant)
+    else
+        local cap = tonumber(limits[tenant] or ARGV[9])
+        local running = tonumber(redis.call('HGET', KEYS[3], tenant) or '0')
+        if cap <= 0 or running < cap then
+            local service = tonumber(redis.call('HGET', KEYS[2], tenant) or '0')
+                / math.max(tonumber(weights[tenant] or ARGV[7]), 1e-6)
+            local entries = redis.call('ZRANGE', pending, 0, tonumber(ARGV[4]) - 1, 'WITHSCORES')
+            for i = 1, #entries, 2 do
+                local cost = tonumber(redis.call('HGET', KEYS[7], entries[i]) or '0')
+                if ARGV[3] == '' or cost <= tonumber(ARGV[3]) then
+                    local priority = tonumber(entries[i + 1])
+                    if best_job == nil or service < best_service
+                            or (service == best_service and priority < best_priority) then
+                        best_tenant, best_job = tenant, entries[i]
+                        best_service, best_priority = service, priority
+                    end
+                    break
+                end
+            end
+        end
+    end
+end
+if best_job == nil then
+    return false
+end
+local pending = ARGV[5] .. best_tenant
+redis.call('ZREM', pending, best_job)
+if redis.call('ZCARD', pending) == 0 then
+    redis.call('SREM', KEYS[1], best_tenant)
+end
+redis.call('HINCRBYFLOAT', KEYS[2], best_tenant, redis.call('HGET', KEYS[7], best_job) or '1')
+redis.call('HINCRBY', KEYS[3], best_tenant, 1)
+redis.call('LPUSH', KEYS[4], best_job)
+redis.call('ZADD', KEYS[5], tonumber(ARGV[1]) + tonumber(ARGV[2]), best_job)
+local attempts = redis.call('HINCRBY', KEYS[6], best_job, 1)
+return {best_job, attempts}
+"""
+
+# Take a job off the processing list when it is acked, retried or
+# dead-lettered, releasing its tenant's running slot exactly once. Retries
+# go back to the tenant's pending set.
+# KEYS: processing, leases, running, job tenants, tenants, dead
+# ARGV: job_id, action (ack, retry, dead), pending prefix, priority
+_FINISH_SCRIPT = """
+local tenant = redis.call('HGET', KEYS[4], ARGV[1]) or '""" + DEFAULT_TENANT + """'
+redis.call('ZREM', KEYS[2], ARGV[1])
+if redis.call('LREM', KEYS[1], 0, ARGV[1]) > 0 then
+    if redis.call('HINCRBY', KEYS[3], tenant, -1) <= 0 then
+        redis.call('HDEL', KEYS[3], tenant)
+    end
+end
+if ARGV[2] == 'dead' then
+    redis.call('LPUSH', KEYS[6], ARGV[1])
+elseif ARGV[2] == 'retry' then
+    redis.call('ZADD', ARGV[3] .. tenant, tonumber(ARGV[4]), ARGV[1])
+    redis.call('SADD', KEYS[5], tenant)
+end
+return 1
+"""
+
+# Requeue jobs whose lease expired (worker crashed or stalled) and dead-letter
+# the ones that already used all their attempts. Requeued jobs keep their
+# original priority. Jobs found in the processing list without a lease get one.
+# KEYS: leases, processing, tenants, dead, attempts, priorities, running, job tenants
+# ARGV: now, max_attempts, visibility_timeout, pending prefix
+_REAP_SCRIPT = """
+local now = tonumber(ARGV[1])
+for _, job_id in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    if not redis.call('ZSCORE', KEYS[1], job_id) then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), job_id)
+    end
+end
+local dead = {}
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now)) do
+    local tenant = redis.call('HGET', KEYS[8], job_id) or '""" + DEFAULT_TENANT + """'
+    redis.call('ZREM', KEYS[1], job_id)
+    if redis.call('LREM', KEYS[2], 0, job_id) > 0 then
+        if redis.call('HINCRBY', KEYS[7], tenant, -1) <= 0 then
+            redis.call('HDEL', KEYS[7], tenant)
+        end
+    end
+    local attempts = tonumber(redis.call('HGET', KEYS[5], job_id) or '0')
+    if attempts >= tonumber(ARGV[2]) then
+        redis.call('LPUSH', KEYS[4], job_id)
+        table.insert(dead, job_id)
+    else
+        local priority = tonumber(redis.call('HGET', KEYS[6], job_id) or ARGV[1])
+        redis.call('ZADD', ARGV[4] .. tenant, priority, job_id)
+        redis.call('SADD', KEYS[3], tenant)
+    end
+end
+return dead
+"""
+
+# Pending jobs inspected when a fast-lane slot looks for a small job
+RESERVE_SCAN_LIMIT = 50
+
+
+class RedisJobBroker:
+    """
+    Redis-backed job queue with visibility timeout, ack and dead-lettering.
+    
+    Producers add job ids to their tenant's pending sorted set scored by
+    job_priority (shortest job first with aging); workers atomically move the
+    best job of the least-served tenant to the processing list and hold a
+    lease that must be extended while the job runs. Expired leases are
+    requeued until max_attempts is reached, after which the job moves to the
+    dead-letter list.
+    
+    The scripts address per-tenant keys computed at run time, so the broker
+    needs a standalone (non-cluster) Redis.
+    """
+    
+    def __init__(self, redis_url: str, key_prefix: str = "cotai:",
+                 visibility_timeout: int = 300, max_attempts: int = 3,
+                 cost_weight_seconds: float = 1.0, poll_interval: float = 0.5,
+                 tenant_policy: Optional[TenantPolicy] = None):
+        self.redis_url = redis_url
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.cost_weight_seconds = cost_weight_seconds
+        self.poll_interval = poll_interval
+        self.tenant_policy = tenant_policy or TenantPolicy()
+        self.redis: Optional[aioredis.Redis] = None
+        self._enqueue_script = None
+        self._reserve_script = None
+        self._finish_script = None
+        self._reap_script = None
+        
+        # One sorted set per tenant: {pending_prefix}{tenant}
+        self.pending_prefix = f"{key_prefix}jobs:scheduled:"
+        self.tenants_key = f"{key_prefix}jobs:tenants"  # tenants with pending jobs
+        self.job_tenants_key = f"{key_prefix}jobs:tenant"
+        self.served_key = f"{key_prefix}tenants:served"
+        self.running_key = f"{key_prefix}tenants:running"
+        self.cancel_channel = f"{key_prefix}jobs:cancel"  # job ids to stop on workers
+        self.processing_key = f"{key_prefix}jobs:processing"
+        self.leases_key = f"{key_prefix}jobs:leases"
+        self.dead_key = f"{key_prefix}jobs:dead"
+        self.payloads_key = f"{key_prefix}jobs:payloads"
+        self.attempts_key = f"{key_prefix}jobs:attempts"
+        self.errors_key = f"{key_prefix}jobs:errors"
+        self.costs_key = f"{key_prefix}jobs:costs"
+        self.priorities_key = f"{key_prefix}jobs:priorities"
+    
+    async def initialize(self):
+        self.redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        await self.redis.ping()
+        self._enqueue_script = self.redis.register_script(_ENQUEUE_SCRIPT)
+        self._reserve_script = self.redis.register_script(_RESERVE_SCRIPT)
+        self._finish_script = self.redis.register_script(_FINISH_SCRIPT)
+        self._reap_script = self.redis.register_script(_REAP_SCRIPT)
+        logger.info(f"Job broker connected: {self.redis_url}")
+    
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+    
+    async def enqueue(self, job_id: str, payload: Dict[str, Any], cost: float = 1.0,
+                      tenant: str = DEFAULT_TENANT):
+        """Persist the payload and add the job to its tenant's pending set"""
+        priority = job_priority(time.time(), cost, self.cost_weight_seconds)
+        await self._enqueue_script(
+            keys=[self.pending_prefix + tenant, self.tenants_key, self.served_key,
+                  self.payloads_key, self.costs_key, self.priorities_key, self.job_tenants_key],
+            args=[job_id, tenant, json.dumps(payload), cost, priority,
+                  json.dumps(self.tenant_policy.weights), self.tenant_policy.default_weight]
+        )
+    
+    async def reserve(self, timeout: float = 5.0, max_cost: Optional[float] = None) -> Optional[BrokerJob]:
+        """
+        Wait up to timeout seconds for a job and take a lease on it
+        
+        Args:
+            timeout: Seconds to wait for a job
+            max_cost: Only consider jobs up to this cost (fast-lane slot)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            reserved = await self._reserve_script(
+                keys=[self.tenants_key, self.served_key, self.running_key, self.processing_key,
+                      self.leases_key, self.attempts_key, self.costs_key, self.job_tenants_key],
+                args=[time.time(), self.visibility_timeout,
+                      "" if max_cost is None else max_cost, RESERVE_SCAN_LIMIT,
+                      self.pending_prefix, json.dumps(self.tenant_policy.weights),
+                      self.tenant_policy.default_weight,
+                      json.dumps(self.tenant_policy.concurrency_limits),
+                      self.tenant_policy.default_max_concurrent]
+            )
+            if reserved:
+                break
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+        
+        job_id, attempts = reserved[0], int(reserved[1])
+        payload = await self.redis.hget(self.payloads_key, job_id)
+        
+        if payload is None:
+            logger.warning(f"Job {job_id} has no payload, discarding")
+            await self.ack(job_id)
+            return None
+        
+        return BrokerJob(job_id=job_id, payload=json.loads(payload), attempts=attempts)
+    
+    async def extend(self, job_ids: List[str]):
+        """Push the lease deadline of running jobs forward (worker heartbeat)"""
+        if not job_ids:
+            return
+        
+        deadline = time.time() + self.visibility_timeout
+        await self.redis.zadd(self.leases_key, {job_id: deadline for job_id in job_ids}, xx=True)
+    
+    async def ack(self, job_id: str):
+        """Mark a job as done and drop its bookkeeping"""
+        await self._finish(job_id, "ack")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.payloads_key, job_id)
+            pipe.hdel(self.attempts_key, job_id)
+            pipe.hdel(self.errors_key, job_id)
+            pipe.hdel(self.costs_key, job_id)
+            pipe.hdel(self.priorities_key, job_id)
+            pipe.hdel(self.job_tenants_key, job_id)
+            await pipe.execute()
+    
+    async def _finish(self, job_id: str, action: str, priority: float = 0.0):
+        """Remove a job from the processing list: ack, retry or dead"""
+        await self._finish_script(
+            keys=[self.processing_key, self.leases_key, self.running_key,
+                  self.job_tenants_key, self.tenants_key, self.dead_key],
+            args=[job_id, action, self.pending_prefix, priority]
+        )
+    
+    async def nack(self, job_id: str, attempts: int, error: str) -> bool:
+        """
+        Return a failed job to the queue, or dead-letter it after max_attempts
+        
+        Returns:
+            True if the job was dead-lettered
+        """
+        dead = attempts >= self.max_attempts
+        
+        # Retries go to the back of the queue, scored as a new arrival
+        cost = float(await self.redis.hget(self.costs_key, job_id) or 1.0)
+        priority = job_priority(time.time(), cost, self.cost_weight_seconds)
+        
+        await self.redis.hset(self.errors_key, job_id, error)
+        await self._finish(job_id, "dead" if dead else "retry", priority)
+        
+        if dead:
+            logger.error(f"Job {job_id} moved to dead-letter queue after {attempts} attempts")
+        return dead
+    
+    async def release(self, job_id: str):
+        """
+        Return a job interrupted by a worker shutdown to the queue
+        
+        The job keeps its original priority and the attempt is not counted,
+        so draining workers never push a job towards the dead-letter queue.
+        """
+        priority = float(await self.redis.hget(self.priorities_key, job_id) or time.time())
+        await self.redis.hincrby(self.attempts_key, job_id, -1)
+        await self._finish(job_id, "retry", priority)
+    
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Withdraw a pending job, or ask workers to stop it if it already runs
+        
+        Returns:
+            Payload of the withdrawn job, None if it was not pending
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self.job_tenants_key, job_id)
+            pipe.hget(self.payloads_key, job_id)
+            tenant, payload = await pipe.execute()
+        
+        if tenant is not None and await self.redis.zrem(self.pending_prefix + tenant, job_id):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for key in (self.payloads_key, self.attempts_key, self.errors_key, self.costs_key,
+                            self.priorities_key, self.job_tenants_key):
+                    pipe.hdel(key, job_id)
+                await pipe.execute()
+            return json.loads(payload) if payload else None
+        
+        await self.redis.publish(self.cancel_channel, job_id)
+        return None
+    
+    async def cancellations(self) -> AsyncIterator[str]:
+        """Ids of running jobs whose cancellation was requested"""
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.cancel_channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+    
+    async def requeue_expired(self) -> List[str]:
+        """
+        Requeue jobs with expired leases
+        
+        Returns:
+            Ids of jobs that were dead-lettered
+        """
+        return await self._reap_script(
+            keys=[self.leases_key, self.processing_key, self.tenants_key, self.dead_key,
+                  self.attempts_key, self.priorities_key, self.running_key, self.job_tenants_key],
+            args=[time.time(), self.max_attempts, self.visibility_timeout, self.pending_prefix]
+        )
+    
+    async def position(self, job_id: str) -> Optional[int]:
+        """
+        1-based position in the tenant's pending set, 0 if running, None if unknown
+        """
+        if await self.redis.zscore(self.leases_key, job_id) is not None:
+            return 0
+        
+        tenant = await self.redis.hget(self.job_tenants_key, job_id)
+        if tenant is None:
+            return None
+        
+        index = await self.redis.zrank(self.pending_prefix + tenant, job_id)
+        return None if index is None else index + 1
+    
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth metrics, overall and per tenant"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.smembers(self.tenants_key)
+            pipe.hgetall(self.running_key)
+            pipe.hgetall(self.served_key)
+            pipe.llen(self.processing_key)
+            pipe.llen(self.dead_key)
+            active, running, served, processing, dead = await pipe.execute()
+        
+        names = sorted(set(active) | set(running))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tenant in names:
+                pipe.zcard(self.pending_prefix + tenant)
+            waiting = await pipe.execute()
+        
+        tenants = {
+            tenant: {
+                "waiting": count,
+                "running": int(running.get(tenant, 0)),
+                "served_cost": round(float(served.get(tenant, 0)), 2),
+                "weight": self.tenant_policy.weight(tenant),
+                "max_concurrent": self.tenant_policy.max_concurrent(tenant)
+            }
+            for tenant, count in zip(names, waiting)
+        }
+        
+        return {
+            "pending": sum(waiting),
+            "processing": processing,
+            "dead_letter": dead,
+            "tenants": tenants
+        }
+
+
+def create_job_broker(settings: Settings) -> RedisJobBroker:
+    """Build the job broker from settings"""
+    return RedisJobBroker(
+        settings.redis_url,
+        key_prefix=settings.redis_key_prefix,
+        visibility_timeout=settings.job_visibility_timeout,
+        max_attempts=settings.job_max_attempts,
+        cost_weight_seconds=settings.job_cost_weight_seconds,
+        tenant_policy=TenantPolicy.from_settings(settings)
+    )
@@ -0,0 +1,78 @@
+"""
+Up-front cost estimate for document processing jobs
+Inspects page count and text layer with pypdfium2 so the scheduler can favour short jobs
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+import pypdfium2 as pdfium
+
+from ..extractors.text_layer import MIN_TEXT_CHARS_PER_PAGE, page_text_chars
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Relative conversion cost of one page: scanned pages go through full OCR,
+# pages with a text layer mostly through layout and table models
+SCANNED_PAGE_COST = 1.0
+TEXT_PAGE_COST = 0.25
+
+# Pages sampled for a text layer, spread evenly over the document
+TEXT_LAYER_SAMPLE_PAGES = 8
+
+# Fallback for files pypdfium2 cannot open
+BYTES_PER_PAGE_ESTIMATE = 100 * 1024
+
+
+@dataclass
+class JobCost:
+    """Estimated processing cost, in scanned-page equivalents"""
+    pages: int
+    text_layer_ratio: float  # share of sampled pages with extractable text
+    size_bytes: int
+    cost: float
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "text_layer_ratio": self.text_layer_ratio,
+            "size_bytes": self.size_bytes,
+            "cost": self.cost
+        }
+
+
+def estimate_job_cost(file_path: Path, size_bytes: int, ocr: bool = True) -> JobCost:
+    """
+    Estimate how expensive a document is to convert (blocking, run in a thread)
+    
+    Only a few pages are inspected, so this takes milliseconds even for
+    1000-page documents. With ocr False (pipeline profile without OCR) every
+    page costs as a text page.
+    """
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+    except Exception as e:
+        logger.warning(f"Cost estimate falling back to file size for {file_path.name}: {e}")
+        pages = max(1, size_bytes // BYTES_PER_PAGE_ESTIMATE)
+        return JobCost(pages=pages, text_layer_ratio=0.0, size_bytes=size_bytes,
+                       cost=pages * SCANNED_PAGE_COST)
+    
+    try:
+        pages = len(pdf)
+        step = max(1, pages // TEXT_LAYER_SAMPLE_PAGES)
+        sampled = list(range(0, pages, step))[:TEXT_LAYER_SAMPLE_PAGES]
+        
+        with_text = sum(
+            1 for index in sampled if page_text_chars(pdf, index) >= MIN_TEXT_CHARS_PER_PAGE
+        )
+    finally:
+        pdf.close()
+    
+    ratio = with_text / len(sampled) if sampled else 0.0
+    if ocr:
+        cost = pages * (ratio * TEXT_PAGE_COST + (1 - ratio) * SCANNED_PAGE_COST)
+    else:
+        cost = pages * TEXT_PAGE_COST
+    return JobCost(pages=pages, text_layer_ratio=ratio, size_bytes=size_bytes, cost=cost)
@@ -0,0 +1,382 @@
+"""
+Bounded admission queue for document processing jobs
+Caps concurrent pipelines, shares them fairly between tenants, favours short jobs
+and rejects uploads once the backlog is full
+"""
+
+import asyncio
+import bisect
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..config.settings import Settings
+from ..models.pipeline_models import DEFAULT_TENANT
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue cannot accept more jobs"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ServiceDrainingError(QueueFullError):
+    """Raised when the service is shutting down and admits no new jobs"""
+
+
+def job_priority(enqueued_at: float, cost: float, cost_weight_seconds: float) -> float:
+    """
+    Virtual start time used to order jobs: arrival time pushed back by the
+    job's cost. Short jobs overtake long ones, but a long job is overtaken only
+    by jobs that arrive less than cost * cost_weight_seconds after it, so it
+    cannot starve.
+    """
+    return enqueued_at + cost * cost_weight_seconds
+
+
+@dataclass
+class TenantPolicy:
+    """Per-tenant scheduling weights and concurrency caps"""
+    weights: Dict[str, float] = field(default_factory=dict)
+    default_weight: float = 1.0
+    concurrency_limits: Dict[str, int] = field(default_factory=dict)
+    default_max_concurrent: int = 0  # 0 = no per-tenant cap
+    
+    def weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, self.default_weight), 1e-6)
+    
+    def max_concurrent(self, tenant: str) -> int:
+        return self.concurrency_limits.get(tenant, self.default_max_concurrent)
+    
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "TenantPolicy":
+        return cls(
+            weights=settings.tenant_weights,
+            default_weight=settings.default_tenant_weight,
+            concurrency_limits=settings.tenant_concurrency_limits,
+            default_max_concurrent=settings.tenant_max_concurrent
+        )
+
+
+@dataclass
+class Job:
+    """Queued unit of work"""
+    job_id: str
+    run: Callable[[], Awaitable[None]]
+    cost: float = 1.0  # scanned-page equivalents, see job_cost
+    tenant: str = DEFAULT_TENANT
+    on_cancel: Optional[Callable[[], Awaitable[None]]] = None  # cleanup when cancelled before starting
+    priority: float = 0.0
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+
+
+class JobQueue:
+    """
+    Cost-aware, tenant-fair job queue with a fixed number of concurrent runners.
+    
+    Every tenant has its own queue ordered by job_priority (shortest job first
+    with aging). Runners pick the tenant with the least weighted service
+    (cost started / weight) among those below their concurrency cap, so a
+    tenant bulk-uploading hundreds of files only gets its share of runners.
+    Jobs up to small_job_cost form a fast lane: small_lane_slots runners never
+    take larger jobs, so short documents start promptly while big ones run.
+    Once max_depth jobs are waiting, submit() raises QueueFullError with a
+    Retry-After estimate computed from the backlog and the average job duration.
+    """
+    
+    def __init__(self, max_concurrent: int, max_depth: int,
+                 initial_job_seconds: float = 120.0, small_job_cost: float = 20.0,
+                 small_lane_slots: int = 1, cost_weight_seconds: float = 1.0,
+                 tenant_policy: Optional[TenantPolicy] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_depth = max(0, max_depth)
+        self.small_job_cost = small_job_cost
+        self.cost_weight_seconds = cost_weight_seconds
+        self.tenant_policy = tenant_policy or TenantPolicy()
+        
+        # With a single runner there is nothing to reserve
+        reserved = min(max(0, small_lane_slots), self.max_concurrent - 1)
+        self.max_large_running = self.max_concurrent - reserved
+        
+        self._queues: Dict[str, List[Job]] = {}  # per tenant, sorted by priority
+        self._served: Dict[str, float] = {}  # cost started per tenant
+        self._running: Dict[str, Job] = {}
+        self._wakeup = asyncio.Event()
+        self._runners: List[asyncio.Task] = []
+        self._paused = False
+        
+        # Exponential moving average of job duration, used for Retry-After
+        self._avg_job_seconds = initial_job_seconds
+        self._completed_jobs = 0
+    
+    async def start(self):
+        """Start runner tasks"""
+        if self._runners:
+            return
+        
+        self._runners = [
+            asyncio.create_task(self._runner(i))
+            for i in range(self.max_concurrent)
+        ]
+        logger.info(f"Job queue started with {self.max_concurrent} runners, "
+                    f"max depth {self.max_depth}")
+    
+    async def stop(self):
+        """Cancel runner tasks and the jobs they are running"""
+        jobs = [job.task for job in self._running.values() if job.task is not None]
+        for task in jobs:
+            task.cancel()
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        
+        # Let cancelled jobs record their final status before stores close
+        await asyncio.gather(*jobs, return_exceptions=True)
+    
+    def pause(self):
+        """Stop starting waiting jobs; running jobs carry on"""
+        self._paused = True
+    
+    async def wait_idle(self, timeout: Optional[float]) -> bool:
+        """
+        Wait until no job is running
+        
+        Returns:
+            False if jobs were still running after timeout seconds
+        """
+        tasks = [job.task for job in self._running.values() if job.task is not None]
+        if not tasks:
+            return True
+        
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return not pending
+    
+    def take_waiting(self) -> List[Job]:
+        """Remove and return every waiting job, oldest first"""
+        jobs = sorted((job for queue in self._queues.values() for job in queue),
+                      key=lambda job: job.enqueued_at)
+        self._queues.clear()
+        return jobs
+    
+    def check_capacity(self):
+        """
+        Raise QueueFullError if a new job would be rejected, so callers can
+        refuse an upload before reading it
+        """
+        waiting = self._waiting_count()
+        if waiting >= self.max_depth:
+            raise QueueFullError(
+                f"Processing queue is full ({waiting} jobs waiting)",
+                retry_after=self.estimate_wait_seconds()
+            )
+    
+    def submit(self, job_id: str, run: Callable[[], Awaitable[None]], check_depth: bool = True,
+               cost: float = 1.0, tenant: str = DEFAULT_TENANT,
+               on_cancel: Optional[Callable[[], Awaitable[None]]] = None) -> int:
+        """
+        Enqueue a job
+        
+        Args:
+            job_id: Job identifier
+            run: Coroutine factory executing the job
+            check_depth: False for jobs of a batch that was admitted as a whole
+            cost: Estimated job cost in scanned-page equivalents
+            tenant: Tenant (UASG or explicit tenant id) the job is accounted to
+            on_cancel: Coroutine factory run when the job is cancelled while waiting
+        
+        Returns:
+            1-based position of the new job in its tenant's queue
+        
+        Raises:
+            QueueFullError: when max_depth jobs are already waiting
+        """
+        if check_depth:
+            self.check_capacity()
+        
+        job = Job(job_id=job_id, run=run, cost=cost, tenant=tenant, on_cancel=on_cancel)
+        job.priority = job_priority(job.enqueued_at, cost, self.cost_weight_seconds)
+        
+        queue = self._queues.get(tenant)
+        if not queue:
+            queue = self._queues[tenant] = []
+            self._activate(tenant)
+        
+        index = bisect.bisect_right([waiting.priority for waiting in queue], job.priority)
+        queue.insert(index, job)
+        self._wakeup.set()
+        return index + 1
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Drop a waiting job or cancel a running one
+        
+        A running job is cancelled through its asyncio task, so its runner is
+        free as soon as the job has unwound.
+        
+        Returns:
+            The cancelled job (started_at is None if it never ran), or None if
+            the queue does not know the job
+        """
+        job = self._running.get(job_id)
+        if job is not None:
+            job.task.cancel()
+            return job
+        
+        for tenant, queue in self._queues.items():
+            for index, job in enumerate(queue):
+                if job.job_id == job_id:
+                    del queue[index]
+                    if not queue:
+                        del self._queues[tenant]
+                    return job
+        
+        return None
+    
+    def position(self, job_id: str) -> Optional[int]:
+        """
+        Queue position of a job: 1-based within its tenant's queue while
+        waiting, 0 while running, None if the queue does not know the job
+        """
+        if job_id in self._running:
+            return 0
+        
+        for queue in self._queues.values():
+            for index, job in enumerate(queue):
+                if job.job_id == job_id:
+                    return index + 1
+        
+        return None
+    
+    def estimate_wait_seconds(self) -> int:
+        """Seconds until a newly submitted job would likely start"""
+        backlog = self._waiting_count() + len(self._running)
+        rounds = (backlog + 1) / self.max_concurrent
+        return max(1, math.ceil(rounds * self._avg_job_seconds))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue metrics for monitoring"""
+        tenants = {}
+        for tenant in set(self._queues) | {job.tenant for job in self._running.values()}:
+            queue = self._queues.get(tenant, [])
+            tenants[tenant] = {
+                "waiting": len(queue),
+                "waiting_small": sum(1 for job in queue if self._is_small(job)),
+                "running": self._running_for(tenant),
+                "served_cost": round(self._served.get(tenant, 0.0), 2),
+                "weight": self.tenant_policy.weight(tenant),
+                "max_concurrent": self.tenant_policy.max_concurrent(tenant)
+            }
+        
+        return {
+            "waiting": self._waiting_count(),
+            "running": len(self._running),
+            "running_large": self._running_large(),
+            "max_concurrent": self.max_concurrent,
+            "max_depth": self.max_depth,
+            "avg_job_seconds": round(self._avg_job_seconds, 2),
+            "completed_jobs": self._completed_jobs,
+            "paused": self._paused,
+            "tenants": tenants
+        }
+    
+    def _waiting_count(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+    
+    def _running_for(self, tenant: str) -> int:
+        return sum(1 for job in self._running.values() if job.tenant == tenant)
+    
+    def _normalized_service(self, tenant: str) -> float:
+        return self._served.get(tenant, 0.0) / self.tenant_policy.weight(tenant)
+    
+    def _activate(self, tenant: str):
+        """
+        Start a newly active tenant at the lowest weighted service among the
+        other active tenants, so idle time is not banked as credit
+        """
+        others = [self._normalized_service(t) for t, queue in self._queues.items()
+                  if queue and t != tenant]
+        if others:
+            floor = min(others) * self.tenant_policy.weight(tenant)
+            self._served[tenant] = max(self._served.get(tenant, 0.0), floor)
+    
+    def _is_small(self, job: Job) -> bool:
+        return job.cost <= self.small_job_cost
+    
+    def _running_large(self) -> int:
+        return sum(1 for job in self._running.values() if not self._is_small(job))
+    
+    def _take_next(self) -> Optional[Job]:
+        """
+        Next job to start: from the least-served tenant under its cap, the
+        highest-priority job allowed by the fast-lane reservation
+        """
+        if self._paused:
+            return None
+        
+        large_allowed = self._running_large() < self.max_large_running
+        best = None
+        
+        for tenant, queue in self._queues.items():
+            cap = self.tenant_policy.max_concurrent(tenant)
+            if cap > 0 and self._running_for(tenant) >= cap:
+                continue
+            
+            for index, job in enumerate(queue):
+                if large_allowed or self._is_small(job):
+                    key = (self._normalized_service(tenant), job.priority)
+                    if best is None or key < best[0]:
+                        best = (key, tenant, index)
+                    break
+        
+        if best is None:
+            return None
+        
+        _, tenant, index = best
+        job = self._queues[tenant].pop(index)
+        if not self._queues[tenant]:
+            del self._queues[tenant]
+        self._served[tenant] = self._served.get(tenant, 0.0) + job.cost
+        return job
+    
+    async def _runner(self, runner_id: int):
+        """Pull jobs from the queue until cancelled"""
+        while True:
+            job = self._take_next()
+            while job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                job = self._take_next()
+            
+            job.started_at = time.time()
+            job.task = asyncio.create_task(job.run())
+            self._running[job.job_id] = job
+            
+            try:
+                # Wait without propagating the job's own cancellation to the runner
+                await asyncio.wait([job.task])
+                if job.task.cancelled():
+                    logger.info(f"Job {job.job_id} cancelled in runner {runner_id}")
+                else:
+                    if job.task.exception() is not None:
+                        logger.error(f"Job {job.job_id} failed in runner {runner_id}: "
+                                     f"{job.task.exception()}")
+                    self._record_duration(time.time() - job.started_at)
+            finally:
+                job.task.cancel()
+                self._running.pop(job.job_id, None)
+                # A finished job may unblock jobs held back by a lane or tenant cap
+                self._wakeup.set()
+    
+    def _record_duration(self, duration: float):
+        """Update the moving average of job durations"""
+        self._completed_jobs += 1
+        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * duration
@@ -0,0 +1,59 @@
+"""
+Persistent cache of Docling extraction artifacts (stages 1-3)
+Keyed by document content hash and extraction pipeline fingerprint
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config.settings import Settings
+from ..models.extraction_models import ExtractionResult
+from .disk_lru import DiskLRU
+
+
+class ArtifactCache:
+    """
+    Size-bounded on-disk LRU of ExtractionResult JSON files.
+    
+    An entry is only reused when both the document bytes (sha256) and the
+    pipeline fingerprint (Docling version, PdfPipelineOptions, OCR engine)
+    match, so re-running stages 4-9 never re-OCRs while a converter change
+    invalidates old entries. Storage, recency and eviction are DiskLRU's.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.entries = DiskLRU(cache_dir, max_bytes, suffix=".json", name="Artifact cache")
+    
+    async def initialize(self):
+        await self.entries.initialize()
+    
+    def _entry_path(self, sha256: str, fingerprint: str) -> Path:
+        return self.entries.cache_dir / fingerprint[:16] / sha256[:2] / f"{sha256}.json"
+    
+    async def get(self, sha256: str, fingerprint: str) -> Optional[ExtractionResult]:
+        """Return the cached extraction for a document, or None"""
+        return await self.entries.get(
+            self._entry_path(sha256, fingerprint),
+            decode=lambda data: ExtractionResult.from_dict(json.loads(data))
+        )
+    
+    async def put(self, sha256: str, fingerprint: str, result: ExtractionResult):
+        """Store an extraction and evict old entries when over budget"""
+        payload = json.dumps(result.to_dict(), ensure_ascii=False, separators=(",", ":"))
+        await self.entries.put(self._entry_path(sha256, fingerprint), payload.encode("utf-8"))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        return self.entries.stats()
+
+
+def create_artifact_cache(settings: Settings) -> Optional[ArtifactCache]:
+    """Build the artifact cache, or None when ARTIFACT_CACHE_ENABLED is off"""
+    if not settings.artifact_cache_enabled:
+        return None
+    
+    return ArtifactCache(
+        Path(settings.storage_root_path) / "artifacts",
+        max_bytes=settings.artifact_cache_max_bytes
+    )
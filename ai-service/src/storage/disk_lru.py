@@ -0,0 +1,124 @@
+"""
+Size-bounded on-disk LRU shared by the artifact and page image caches
+File mtimes record recency; the least recently used files go first once over budget
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DiskLRU:
+    """
+    Directory of cache files holding at most max_bytes.
+    
+    Callers choose the entry paths; every file ending in suffix under
+    cache_dir counts towards the budget. Entries are written to a temp file
+    and renamed so readers never see a partial entry, and a hit touches the
+    file's mtime so eviction removes the least recently used files first.
+    
+    Hit/miss counters are kept per process.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int, suffix: str, name: str):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes = 0
+        self._lock = asyncio.Lock()
+    
+    async def initialize(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in await asyncio.to_thread(self._scan))
+        logger.info(f"{self.name} at {self.cache_dir}: {self._total_bytes} bytes in use")
+    
+    async def get(self, path: Path, decode: Optional[Callable[[bytes], Any]] = None) -> Optional[Any]:
+        """
+        Return an entry's bytes (or decode(bytes)), or None on a miss
+        
+        An entry decode() rejects is deleted and counted as a miss.
+        """
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            value = decode(data) if decode is not None else data
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return value
+    
+    async def put(self, path: Path, data: bytes):
+        """Store an entry and evict old entries when over budget"""
+        if len(data) > self.max_bytes:
+            return
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        temp_path = path.with_suffix(f".{os.getpid()}.part")
+        await asyncio.to_thread(temp_path.write_bytes, data)
+        
+        previous_size = path.stat().st_size if path.exists() else 0
+        os.replace(temp_path, path)
+        
+        async with self._lock:
+            self._total_bytes += len(data) - previous_size
+            if self._total_bytes > self.max_bytes:
+                await asyncio.to_thread(self._evict)
+    
+    def _scan(self):
+        """List (path, size, mtime) of every entry"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+    
+    def _evict(self):
+        """Delete least recently used entries until under max_bytes"""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+        
+        self._total_bytes = total
+        logger.info(f"{self.name} evicted down to {total} bytes")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes
+        }
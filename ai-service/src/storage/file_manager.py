@@ -7,18 +7,39 @@ import asyncio
 import json
 import logging
 import os
+import hashlib
 import shutil
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import aiofiles
 
 from ..config.settings import Settings
 from ..models.pipeline_models import ProcessingContext, PipelineResult
 from ..utils.logger import setup_logger
+from .result_cache import ResultCache
 
 logger = setup_logger(__name__)
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the configured max_file_size"""
+    
+    def __init__(self, message: str, max_size: int):
+        super().__init__(message)
+        self.max_size = max_size
+
+
+@dataclass
+class SpooledUpload:
+    """Upload written to storage, with its size and content hash"""
+    path: Path
+    size: int
+    sha256: str
+
 
 class FileManager:
     """Manages file storage, organization, and persistence for document processing"""
@@ -29,6 +50,9 @@ class FileManager:
         self.temp_dir = Path(settings.temp_directory_path)
         self.results_dir = Path(settings.results_directory_path)
         
+        # Parsed results for the result and quality endpoints
+        self.result_cache = ResultCache(settings.result_cache_max_bytes)
+        
         # Storage structure: /storage/year/uasg/pregao/
         # Example: /storage/2024/986531/PE-001-2024/
         
@@ -70,9 +94,8 @@ class FileManager:
             # Create organized directory structure
             storage_path = await self._create_storage_path(context)
             
-            # Clean filename and ensure it's unique
-            clean_filename = self._clean_filename(filename)
-            file_path = storage_path / "original" / clean_filename
+            # Clean filename; each task gets its own directory
+            file_path = self._original_path(storage_path, filename, context)
             
             # Create directory if it doesn't exist
             file_path.parent.mkdir(parents=True, exist_ok=True)
@@ -82,7 +105,9 @@ class FileManager:
                 await f.write(file_content)
             
             # Save metadata
-            await self._save_file_metadata(file_path, context, file_content)
+            await self._save_file_metadata(
+                file_path, context, len(file_content), hashlib.sha256(file_content).hexdigest()
+            )
             
             logger.info(f"Original file saved: {file_path}")
             return file_path
@@ -91,6 +116,62 @@ class FileManager:
             logger.error(f"Failed to save original file: {str(e)}")
             raise
     
+    async def spool_upload(self, upload, filename: str, context: ProcessingContext) -> SpooledUpload:
+        """
+        Stream an upload to its storage path in chunks
+        
+        The SHA-256 and byte count are computed while copying, and the copy is
+        aborted as soon as max_file_size is exceeded, so memory use stays at one
+        chunk regardless of the document size.
+        
+        Args:
+            upload: Object with an async read(size) method (e.g. FastAPI UploadFile)
+            filename: Original filename
+            context: Processing context with metadata
+        
+        Returns:
+            SpooledUpload with path, size and sha256
+        
+        Raises:
+            FileTooLargeError: when the upload is larger than max_file_size
+        """
+        storage_path = await self._create_storage_path(context)
+        file_path = self._original_path(storage_path, filename, context)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = file_path.with_name(f".{file_path.name}.{context.task_id}.part")
+        
+        max_size = self.settings.max_file_size
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            async with aiofiles.open(partial_path, 'wb') as f:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(
+                            f"File exceeds maximum size of {max_size} bytes", max_size
+                        )
+                    
+                    digest.update(chunk)
+                    await f.write(chunk)
+            
+            os.replace(partial_path, file_path)
+        
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+        
+        sha256 = digest.hexdigest()
+        await self._save_file_metadata(file_path, context, size, sha256)
+        
+        logger.info(f"Upload spooled: {file_path} ({size} bytes, sha256 {sha256[:12]})")
+        return SpooledUpload(path=file_path, size=size, sha256=sha256)
+    
     async def save_result(self, result: PipelineResult, context: ProcessingContext) -> Path:
         """
         Save processing result with complete metadata
@@ -123,7 +204,8 @@ class FileManager:
                     "total_processing_time": sum(result.processing_times.values()),
                     "ano": context.ano,
                     "uasg": context.uasg,
-                    "numero_pregao": context.numero_pregao
+                    "numero_pregao": context.numero_pregao,
+                    "profile": context.profile
                 },
                 "structured_data": result.structured_data,
                 "tables": [table.to_dict() if hasattr(table, 'to_dict') else table for table in result.tables],
@@ -139,8 +221,10 @@ class FileManager:
             }
             
             # Save result file asynchronously
+            content = json.dumps(result_data, indent=2, ensure_ascii=False)
             async with aiofiles.open(result_file_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(result_data, indent=2, ensure_ascii=False))
+                await f.write(content)
+            self.result_cache.put(result_file_path, result_data, len(content.encode('utf-8')))
             
             # Create a summary file for quick access
             await self._save_result_summary(storage_path, result_data)
@@ -155,6 +239,48 @@ class FileManager:
             logger.error(f"Failed to save processing result: {str(e)}")
             raise
     
+    async def link_result(self, source_result_path: Path, source_task_id: str,
+                          context: ProcessingContext) -> Path:
+        """
+        Create the result of a duplicate upload from an existing result
+        
+        Only the per-request context (task id, filename, ano, uasg, numero_pregao)
+        is re-applied; the analysis itself is reused as is.
+        
+        Returns:
+            Path to the new result file
+        """
+        async with aiofiles.open(source_result_path, 'r', encoding='utf-8') as f:
+            result_data = json.loads(await f.read())
+        
+        result_data["task_id"] = context.task_id
+        result_data["processing_metadata"].update({
+            "filename": context.filename,
+            "task_id": context.task_id,
+            "processing_completed_at": datetime.now().isoformat(),
+            "ano": context.ano,
+            "uasg": context.uasg,
+            "numero_pregao": context.numero_pregao,
+            "deduplicated_from": source_task_id
+        })
+        
+        storage_path = await self._create_storage_path(context)
+        results_path = storage_path / "results"
+        results_path.mkdir(parents=True, exist_ok=True)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_file_path = results_path / f"result_{context.task_id}_{timestamp}.json"
+        
+        content = json.dumps(result_data, indent=2, ensure_ascii=False)
+        async with aiofiles.open(result_file_path, 'w', encoding='utf-8') as f:
+            await f.write(content)
+        self.result_cache.put(result_file_path, result_data, len(content.encode('utf-8')))
+        
+        await self._save_result_summary(storage_path, result_data)
+        
+        logger.info(f"Result linked from task {source_task_id}: {result_file_path}")
+        return result_file_path
+    
     async def save_intermediate_result(self, task_id: str, stage_name: str, 
                                      data: Dict[str, Any], context: ProcessingContext) -> Path:
         """Save intermediate processing results for debugging/audit"""
@@ -214,6 +340,16 @@ class FileManager:
         
         return storage_path
     
+    def _original_path(self, storage_path: Path, filename: str, context: ProcessingContext) -> Path:
+        """
+        Path of a task's original upload
+        
+        Uploads of one uasg/pregao often share a filename (edital.pdf), so
+        every task stores its original under its own task_id directory and
+        never replaces another task's file.
+        """
+        return storage_path / "original" / context.task_id / self._clean_filename(filename)
+    
     def _clean_filename(self, filename: str) -> str:
         """Clean filename for filesystem compatibility"""
         # Remove or replace problematic characters
@@ -232,13 +368,14 @@ class FileManager:
         return clean_name
     
     async def _save_file_metadata(self, file_path: Path, context: ProcessingContext, 
-                                file_content: bytes):
+                                file_size: int, sha256: str):
         """Save file metadata alongside the original file"""
         try:
             metadata = {
                 "filename": context.filename,
                 "task_id": context.task_id,
-                "file_size": len(file_content),
+                "file_size": file_size,
+                "sha256": sha256,
                 "upload_timestamp": datetime.now().isoformat(),
                 "ano": context.ano,
                 "uasg": context.uasg,
@@ -326,6 +463,26 @@ class FileManager:
         except Exception as e:
             logger.warning(f"Failed to save audit trail: {str(e)}")
     
+    async def read_result(self, result_path: Path) -> Dict[str, Any]:
+        """
+        Parsed result file, from the in-memory cache when possible
+        
+        Raises:
+            FileNotFoundError: when the result file does not exist
+        """
+        result_data = self.result_cache.get(result_path)
+        if result_data is not None:
+            return result_data
+        
+        result_data, size = await asyncio.to_thread(self._parse_result, result_path)
+        self.result_cache.put(result_path, result_data, size)
+        return result_data
+    
+    @staticmethod
+    def _parse_result(result_path: Path):
+        content = result_path.read_bytes()
+        return json.loads(content), len(content)
+    
     async def load_result(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Load processing result by task ID"""
         try:
@@ -0,0 +1,128 @@
+"""
+On-demand page images rendered from stored originals
+Pages are rasterized with pdfium when requested and kept in a size-bounded disk cache
+"""
+
+import asyncio
+import hashlib
+import io
+from pathlib import Path
+from typing import Any, Dict
+
+import pypdfium2 as pdfium
+
+from ..config.settings import Settings
+from .disk_lru import DiskLRU
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Smallest resolution served; the upper bound is PAGE_IMAGE_MAX_DPI
+MIN_DPI = 36
+
+# Refuse renders above this many pixels (an A0 sheet at 300 DPI is ~140M)
+MAX_RENDER_PIXELS = 40_000_000
+
+# Renders are CPU bound; keep them from starving the API event loop's threads
+RENDER_CONCURRENCY = 2
+
+
+class PageRenderError(ValueError):
+    """Requested resolution is out of bounds or the render would be too large"""
+
+
+def render_page_png(file_path: Path, page_number: int, dpi: int) -> bytes:
+    """
+    Render one page (1-based) of a PDF to PNG bytes (blocking, run in a thread)
+    
+    Raises:
+        ValueError: page out of range
+        PageRenderError: render too large
+    """
+    pdf = pdfium.PdfDocument(str(file_path))
+    try:
+        if not 1 <= page_number <= len(pdf):
+            raise ValueError(f"Page {page_number} not found, document has {len(pdf)} pages")
+        
+        page = pdf[page_number - 1]
+        try:
+            scale = dpi / 72
+            width, height = page.get_size()
+            if width * scale * height * scale > MAX_RENDER_PIXELS:
+                raise PageRenderError(f"Page {page_number} is too large to render at {dpi} DPI")
+            
+            bitmap = page.render(scale=scale)
+            try:
+                buffer = io.BytesIO()
+                bitmap.to_pil().save(buffer, format="PNG")
+                return buffer.getvalue()
+            finally:
+                bitmap.close()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+
+class PageImageCache:
+    """
+    Size-bounded on-disk LRU of rendered page PNGs.
+    
+    Docling runs without generate_page_images, so conversion no longer holds
+    a bitmap of every page; clients that want to look at a page fetch it here
+    instead. Entries are keyed by the original's path, size and mtime, so a
+    re-uploaded file under the same name never serves stale pages. Storage,
+    recency and eviction are DiskLRU's.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int, max_dpi: int = 300):
+        self.entries = DiskLRU(cache_dir, max_bytes, suffix=".png", name="Page image cache")
+        self.max_dpi = max_dpi
+        self._renders = asyncio.Semaphore(RENDER_CONCURRENCY)
+    
+    async def initialize(self):
+        await self.entries.initialize()
+    
+    def _entry_path(self, file_path: Path, page_number: int, dpi: int) -> Path:
+        stat = file_path.stat()
+        key = hashlib.sha256(f"{file_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+        return self.entries.cache_dir / key[:2] / key / f"{page_number}_{dpi}.png"
+    
+    async def get(self, file_path: Path, page_number: int, dpi: int) -> bytes:
+        """
+        Return a page of the original as PNG, rendering it on a miss
+        
+        Raises:
+            FileNotFoundError: the original is no longer in storage
+            ValueError: page out of range
+            PageRenderError: dpi out of bounds or render too large
+        """
+        if not MIN_DPI <= dpi <= self.max_dpi:
+            raise PageRenderError(f"dpi must be between {MIN_DPI} and {self.max_dpi}")
+        
+        path = await asyncio.to_thread(self._entry_path, file_path, page_number, dpi)
+        data = await self.entries.get(path)
+        if data is not None:
+            return data
+        
+        async with self._renders:
+            data = await asyncio.to_thread(render_page_png, file_path, page_number, dpi)
+        
+        try:
+            await self.entries.put(path, data)
+        except OSError as e:
+            logger.warning(f"Cannot cache page image {path}: {e}")
+        return data
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        return self.entries.stats()
+
+
+def create_page_image_cache(settings: Settings) -> PageImageCache:
+    """Build the page image cache under STORAGE_ROOT_PATH/pages"""
+    return PageImageCache(
+        Path(settings.storage_root_path) / "pages",
+        max_bytes=settings.page_image_cache_max_bytes,
+        max_dpi=settings.page_image_max_dpi
+    )
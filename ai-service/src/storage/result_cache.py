@@ -0,0 +1,72 @@
+"""
+In-memory cache of parsed result documents
+Serves repeated result and quality requests without re-reading the result file
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """
+    LRU of parsed result files, bounded by their serialized size in bytes.
+    
+    Result files are written once under a unique name and never modified, so
+    entries are keyed by path and need no invalidation. The bound counts
+    UTF-8 encoded JSON bytes, i.e. result file sizes; the parsed objects take
+    a small multiple of that in memory. Cached dicts are shared between
+    callers and must not be mutated.
+    
+    Hit/miss counters are kept per process.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._total_bytes = 0
+    
+    def get(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Return the parsed result stored at path, or None"""
+        entry = self._entries.get(str(path))
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(str(path))
+        self.hits += 1
+        return entry[0]
+    
+    def put(self, path: Path, data: Dict[str, Any], size: int):
+        """Cache a parsed result; size is the length of its UTF-8 encoded JSON"""
+        if size > self.max_bytes:
+            return
+        
+        key = str(path)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous[1]
+        
+        self._entries[key] = (data, size)
+        self._total_bytes += size
+        
+        while self._total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,209 @@
+"""
+Content-addressed index of processing results
+Maps the SHA-256 of an uploaded document to its completed result and
+coalesces concurrent uploads of the same document onto one in-flight job
+"""
+
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiofiles
+import redis.asyncio as aioredis
+
+from ..config.settings import Settings
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Extend or drop a claim only while it is still held by the given task
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ResultIndex(ABC):
+    """
+    Result lookup by content hash plus single-flight claims.
+    
+    The first upload of a document claims its hash and becomes the leader;
+    later uploads of the same hash register as followers and are completed
+    from the leader's result.
+    """
+    
+    async def initialize(self):
+        """Open connections"""
+    
+    async def close(self):
+        """Release connections"""
+    
+    @abstractmethod
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Completed result entry ({task_id, result_path}) for a hash"""
+    
+    @abstractmethod
+    async def put(self, sha256: str, entry: Dict[str, Any]):
+        """Record the completed result for a hash"""
+    
+    @abstractmethod
+    async def claim(self, sha256: str, task_id: str) -> Optional[str]:
+        """
+        Try to become the in-flight leader for a hash
+        
+        Returns:
+            None if the claim succeeded, otherwise the current leader task id
+        """
+    
+    @abstractmethod
+    async def refresh(self, sha256: str, task_id: str) -> bool:
+        """
+        Extend the leader claim held by task_id while its pipeline runs
+        
+        Returns:
+            False if task_id no longer holds the claim
+        """
+    
+    @abstractmethod
+    async def release(self, sha256: str, task_id: str):
+        """Drop the leader claim held by task_id"""
+    
+    @abstractmethod
+    async def add_follower(self, sha256: str, context: Dict[str, Any]):
+        """Register a task waiting for the leader's result"""
+    
+    @abstractmethod
+    async def pop_followers(self, sha256: str) -> List[Dict[str, Any]]:
+        """Atomically take all followers registered for a hash"""
+
+
+class LocalResultIndex(ResultIndex):
+    """
+    Single-process index: completed entries are JSON files under
+    storage_root/index (so they survive restarts), claims and followers
+    live in memory.
+    """
+    
+    def __init__(self, index_dir: Path):
+        self.index_dir = index_dir
+        self._leaders: Dict[str, str] = {}
+        self._followers: Dict[str, List[Dict[str, Any]]] = {}
+    
+    async def initialize(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _entry_path(self, sha256: str) -> Path:
+        return self.index_dir / sha256[:2] / f"{sha256}.json"
+    
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(sha256)
+        if not path.exists():
+            return None
+        
+        async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+            return json.loads(await f.read())
+    
+    async def put(self, sha256: str, entry: Dict[str, Any]):
+        path = self._entry_path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(path, 'w', encoding='utf-8') as f:
+            await f.write(json.dumps(entry))
+    
+    async def claim(self, sha256: str, task_id: str) -> Optional[str]:
+        leader = self._leaders.setdefault(sha256, task_id)
+        return None if leader == task_id else leader
+    
+    async def refresh(self, sha256: str, task_id: str) -> bool:
+        # In-memory claims do not expire
+        return self._leaders.get(sha256) == task_id
+    
+    async def release(self, sha256: str, task_id: str):
+        if self._leaders.get(sha256) == task_id:
+            del self._leaders[sha256]
+    
+    async def add_follower(self, sha256: str, context: Dict[str, Any]):
+        self._followers.setdefault(sha256, []).append(context)
+    
+    async def pop_followers(self, sha256: str) -> List[Dict[str, Any]]:
+        return self._followers.pop(sha256, [])
+
+
+class RedisResultIndex(ResultIndex):
+    """
+    Index shared by API and worker processes through Redis.
+    
+    Claims expire after claim_ttl so a crashed leader cannot block a hash
+    forever; the running pipeline refreshes its claim, so only queued jobs
+    and dead leaders depend on the expiry.
+    """
+    
+    def __init__(self, redis_url: str, key_prefix: str, claim_ttl: int):
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.claim_ttl = claim_ttl
+        self.redis: Optional[aioredis.Redis] = None
+        self._refresh_script = None
+        self._release_script = None
+    
+    async def initialize(self):
+        self.redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        await self.redis.ping()
+        self._refresh_script = self.redis.register_script(_REFRESH_SCRIPT)
+        self._release_script = self.redis.register_script(_RELEASE_SCRIPT)
+    
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+    
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        entry = await self.redis.hget(f"{self.key_prefix}results", sha256)
+        return json.loads(entry) if entry else None
+    
+    async def put(self, sha256: str, entry: Dict[str, Any]):
+        await self.redis.hset(f"{self.key_prefix}results", sha256, json.dumps(entry))
+    
+    async def claim(self, sha256: str, task_id: str) -> Optional[str]:
+        key = f"{self.key_prefix}inflight:{sha256}"
+        if await self.redis.set(key, task_id, nx=True, ex=self.claim_ttl):
+            return None
+        return await self.redis.get(key) or None
+    
+    async def refresh(self, sha256: str, task_id: str) -> bool:
+        key = f"{self.key_prefix}inflight:{sha256}"
+        return bool(await self._refresh_script(keys=[key], args=[task_id, self.claim_ttl]))
+    
+    async def release(self, sha256: str, task_id: str):
+        key = f"{self.key_prefix}inflight:{sha256}"
+        await self._release_script(keys=[key], args=[task_id])
+    
+    async def add_follower(self, sha256: str, context: Dict[str, Any]):
+        await self.redis.rpush(f"{self.key_prefix}followers:{sha256}", json.dumps(context))
+    
+    async def pop_followers(self, sha256: str) -> List[Dict[str, Any]]:
+        key = f"{self.key_prefix}followers:{sha256}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            followers, _ = await pipe.execute()
+        return [json.loads(item) for item in followers]
+
+
+def create_result_index(settings: Settings) -> ResultIndex:
+    """Build the result index matching the task store backend"""
+    if settings.task_store_backend == "redis":
+        # Claims outlive a crashed leader for at most the full retry window
+        claim_ttl = settings.job_visibility_timeout * (settings.job_max_attempts + 1)
+        return RedisResultIndex(settings.redis_url, settings.redis_key_prefix, claim_ttl)
+    
+    return LocalResultIndex(Path(settings.storage_root_path) / "index")
@@ -0,0 +1,121 @@
+"""
+Task journal and stage checkpoints for crash recovery
+Lets a restarted processor find unfinished tasks and resume them after their last completed stage
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config.settings import Settings
+from ..models.pipeline_models import ProcessingContext
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOURNAL_FILE = "journal.json"
+CHECKPOINT_SUFFIX = ".json.gz"
+
+
+class TaskJournal:
+    """
+    One directory per task under journal_dir.
+    
+    journal.json records what is needed to run the task again (original file,
+    processing context, job cost) and is written when the task is queued.
+    Each finished stage adds a gzip-compressed JSON checkpoint next to it;
+    checkpoints are written to a temp file and renamed, so a crash never
+    leaves a partial one behind. The directory is removed once the task
+    reaches a final status.
+    """
+    
+    def __init__(self, journal_dir: Path):
+        self.journal_dir = journal_dir
+    
+    async def initialize(self):
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _task_dir(self, task_id: str) -> Path:
+        return self.journal_dir / task_id
+    
+    async def open(self, task_id: str, file_path: Path, context: ProcessingContext, cost: float):
+        """Record a queued task so it can be resumed after a restart"""
+        entry = {
+            "task_id": task_id,
+            "file_path": str(file_path),
+            "context": context.to_dict(),
+            "cost": cost
+        }
+        await asyncio.to_thread(self._write, task_id, JOURNAL_FILE,
+                                json.dumps(entry).encode("utf-8"))
+    
+    async def checkpoint(self, task_id: str, name: str, data: Dict[str, Any]):
+        """Persist the output of a finished stage"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_encode)
+        compressed = await asyncio.to_thread(gzip.compress, payload.encode("utf-8"), 6)
+        await asyncio.to_thread(self._write, task_id, name + CHECKPOINT_SUFFIX, compressed)
+    
+    async def load(self, task_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Return a stage checkpoint, or None if the stage has not been checkpointed"""
+        path = self._task_dir(task_id) / (name + CHECKPOINT_SUFFIX)
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            return json.loads(await asyncio.to_thread(gzip.decompress, data))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable checkpoint {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+    
+    async def close(self, task_id: str):
+        """Drop the journal and checkpoints of a finished task"""
+        await asyncio.to_thread(shutil.rmtree, self._task_dir(task_id), True)
+    
+    async def unfinished(self) -> List[Dict[str, Any]]:
+        """Journal entries of queued or running tasks, oldest first"""
+        return await asyncio.to_thread(self._scan)
+    
+    def _write(self, task_id: str, name: str, data: bytes):
+        task_dir = self._task_dir(task_id)
+        task_dir.mkdir(parents=True, exist_ok=True)
+        path = task_dir / name
+        temp_path = task_dir / f".{name}.{os.getpid()}.part"
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    
+    def _scan(self) -> List[Dict[str, Any]]:
+        entries = []
+        if not self.journal_dir.exists():
+            return entries
+        
+        for task_dir in self.journal_dir.iterdir():
+            path = task_dir / JOURNAL_FILE
+            if not path.exists():
+                # Checkpoints of a distributed job; the broker owns its recovery
+                continue
+            try:
+                entries.append(json.loads(path.read_text(encoding="utf-8")))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable task journal {path}: {e}")
+        
+        return sorted(entries, key=lambda entry: entry["context"].get("created_at", 0))
+
+
+def _encode(value: Any) -> Any:
+    """JSON fallback for dataclass stage outputs"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"Cannot checkpoint value of type {type(value).__name__}")
+
+
+def create_task_journal(settings: Settings) -> Optional[TaskJournal]:
+    """Build the task journal, or None when ENABLE_CHECKPOINTS is off"""
+    if not settings.enable_checkpoints:
+        return None
+    
+    return TaskJournal(Path(settings.storage_root_path) / "journal")
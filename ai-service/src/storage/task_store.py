@@ -0,0 +1,370 @@
+"""
+Task status registry shared by API workers
+Provides an in-memory LRU store and a Redis-backed store with the same interface
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import redis.asyncio as aioredis
+
+from ..config.settings import Settings
+from ..models.pipeline_models import TaskStatus
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Statuses a task can still leave; pipeline updates are conditioned on them so
+# they never overwrite a cancellation
+ACTIVE_STATUSES = ("pending", "processing")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Batch records only list their children, so they are kept well past the tasks
+BATCH_TTL_SECONDS = 7 * 24 * 3600
+
+
+class TaskStore(ABC):
+    """Registry of TaskStatus records keyed by task id"""
+    
+    async def initialize(self):
+        """Open connections"""
+    
+    async def close(self):
+        """Release connections"""
+    
+    @abstractmethod
+    async def create(self, task: TaskStatus):
+        """Register a new task"""
+    
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[TaskStatus]:
+        """Return a snapshot of the task, or None if unknown or expired"""
+    
+    @abstractmethod
+    async def update(self, task_id: str, expected_status: Optional[Sequence[str]] = None,
+                     **changes: Any) -> Optional[TaskStatus]:
+        """
+        Atomically apply field changes and bump the task version
+        
+        Args:
+            task_id: Task identifier
+            expected_status: only apply if the current status is one of these
+            **changes: TaskStatus fields to set
+        
+        Returns:
+            Updated snapshot, or None if the task is unknown or the
+            expected_status check failed
+        """
+    
+    @abstractmethod
+    async def delete(self, task_id: str):
+        """Remove a task"""
+    
+    @abstractmethod
+    async def create_batch(self, batch: Dict[str, Any]):
+        """Register a batch record ({batch_id, created_at, documents, skipped})"""
+    
+    @abstractmethod
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Return a batch record, or None if unknown or expired"""
+    
+    @abstractmethod
+    def watch(self, task_id: str, heartbeat: float) -> AsyncIterator[Optional[TaskStatus]]:
+        """
+        Stream snapshots of a task as it changes
+        
+        Yields the current snapshot first, then one snapshot per observed
+        change (intermediate versions may be coalesced), and None after
+        heartbeat seconds without changes. Ends after a terminal status or
+        when the task disappears.
+        """
+
+
+class InMemoryTaskStore(TaskStore):
+    """
+    Process-local store bounded by max_entries.
+    
+    Least recently used terminal tasks are evicted first and terminal tasks
+    expire after terminal_ttl seconds; tasks still in flight are never evicted.
+    """
+    
+    def __init__(self, max_entries: int, terminal_ttl: int):
+        self.max_entries = max_entries
+        self.terminal_ttl = terminal_ttl
+        self._tasks: "OrderedDict[str, TaskStatus]" = OrderedDict()
+        self._watchers: Dict[str, List[asyncio.Queue]] = {}
+        self._batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    async def create(self, task: TaskStatus):
+        self._tasks[task.task_id] = replace(task)
+        self._tasks.move_to_end(task.task_id)
+        self._evict()
+    
+    async def get(self, task_id: str) -> Optional[TaskStatus]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        
+        if self._is_expired(task):
+            del self._tasks[task_id]
+            return None
+        
+        self._tasks.move_to_end(task_id)
+        return replace(task)
+    
+    async def update(self, task_id: str, expected_status: Optional[Sequence[str]] = None,
+                     **changes: Any) -> Optional[TaskStatus]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        if expected_status is not None and task.status not in expected_status:
+            return None
+        
+        for key, value in changes.items():
+            setattr(task, key, value)
+        task.version += 1
+        
+        self._tasks.move_to_end(task_id)
+        for changes in self._watchers.get(task_id, []):
+            changes.put_nowait(task.version)
+        return replace(task)
+    
+    async def delete(self, task_id: str):
+        self._tasks.pop(task_id, None)
+        for changes in self._watchers.get(task_id, []):
+            changes.put_nowait(None)
+    
+    async def create_batch(self, batch: Dict[str, Any]):
+        self._batches[batch["batch_id"]] = batch
+        while len(self._batches) > self.max_entries:
+            self._batches.popitem(last=False)
+    
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        batch = self._batches.get(batch_id)
+        if batch is None or time.time() - batch["created_at"] > BATCH_TTL_SECONDS:
+            return None
+        return batch
+    
+    async def watch(self, task_id: str, heartbeat: float) -> AsyncIterator[Optional[TaskStatus]]:
+        changes: asyncio.Queue = asyncio.Queue()
+        self._watchers.setdefault(task_id, []).append(changes)
+        try:
+            last_version = -1
+            task = await self.get(task_id)
+            while task is not None:
+                if task.version > last_version:
+                    last_version = task.version
+                    yield task
+                if task.status in TERMINAL_STATUSES:
+                    return
+                
+                try:
+                    await asyncio.wait_for(changes.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                
+                # Coalesce updates that piled up into the latest snapshot
+                while not changes.empty():
+                    changes.get_nowait()
+                task = await self.get(task_id)
+        finally:
+            self._watchers[task_id].remove(changes)
+            if not self._watchers[task_id]:
+                del self._watchers[task_id]
+    
+    def _is_expired(self, task: TaskStatus) -> bool:
+        return (
+            task.status in TERMINAL_STATUSES
+            and task.completed_at is not None
+            and time.time() - task.completed_at > self.terminal_ttl
+        )
+    
+    def _evict(self):
+        """Drop least recently used terminal tasks while over capacity"""
+        if len(self._tasks) <= self.max_entries:
+            return
+        
+        for task_id in list(self._tasks):
+            if len(self._tasks) <= self.max_entries:
+                break
+            if self._tasks[task_id].status in TERMINAL_STATUSES:
+                del self._tasks[task_id]
+
+
+# Atomic compare-and-set: check the expected status, write fields, bump the
+# version, start the TTL clock once the task reaches a terminal status, notify
+# watchers on the task's channel and return the updated hash. Returns -1 for unknown tasks and 0 when the
+# expected status does not match. Field values are JSON-encoded, so statuses
+# are compared in encoded form.
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+if ARGV[2] ~= '' then
+    local current = redis.call('HGET', KEYS[1], 'status')
+    local allowed = false
+    for _, status in ipairs(cjson.decode(ARGV[2])) do
+        if cjson.encode(status) == current then
+            allowed = true
+        end
+    end
+    if not allowed then
+        return 0
+    end
+end
+if #ARGV > 2 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+end
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('PUBLISH', KEYS[2], version)
+local status = cjson.decode(redis.call('HGET', KEYS[1], 'status'))
+if status == 'completed' or status == 'failed' or status == 'cancelled' then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+class RedisTaskStore(TaskStore):
+    """
+    Redis store: one hash per task, shared by every API and worker process.
+    
+    Lookups are a single HGETALL; updates run as a Lua script so stage
+    transitions are atomic across processes.
+    """
+    
+    def __init__(self, redis_url: str, terminal_ttl: int, key_prefix: str = "cotai:"):
+        self.redis_url = redis_url
+        self.terminal_ttl = terminal_ttl
+        self.key_prefix = key_prefix
+        self.redis: Optional[aioredis.Redis] = None
+        self._update_script = None
+    
+    async def initialize(self):
+        self.redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        await self.redis.ping()
+        self._update_script = self.redis.register_script(_UPDATE_SCRIPT)
+        logger.info(f"Redis task store connected: {self.redis_url}")
+    
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+    
+    def _key(self, task_id: str) -> str:
+        return f"{self.key_prefix}task:{task_id}"
+    
+    def _channel(self, task_id: str) -> str:
+        return f"{self.key_prefix}task-events:{task_id}"
+    
+    @staticmethod
+    def _encode(data: Dict[str, Any]) -> Dict[str, str]:
+        return {key: json.dumps(value) for key, value in data.items()}
+    
+    @staticmethod
+    def _decode(data: Dict[str, str]) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in data.items()}
+    
+    async def create(self, task: TaskStatus):
+        key = self._key(task.task_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=self._encode(task.to_dict()))
+            if task.status in TERMINAL_STATUSES:
+                pipe.expire(key, self.terminal_ttl)
+            await pipe.execute()
+    
+    async def get(self, task_id: str) -> Optional[TaskStatus]:
+        data = await self.redis.hgetall(self._key(task_id))
+        if not data:
+            return None
+        return TaskStatus.from_dict(self._decode(data))
+    
+    async def update(self, task_id: str, expected_status: Optional[Sequence[str]] = None,
+                     **changes: Any) -> Optional[TaskStatus]:
+        args = [self.terminal_ttl, json.dumps(list(expected_status)) if expected_status else ""]
+        for key, value in self._encode(changes).items():
+            args.extend([key, value])
+        
+        result = await self._update_script(
+            keys=[self._key(task_id), self._channel(task_id)], args=args
+        )
+        if not isinstance(result, list):
+            return None
+        
+        data = dict(zip(result[::2], result[1::2]))
+        return TaskStatus.from_dict(self._decode(data))
+    
+    async def delete(self, task_id: str):
+        await self.redis.delete(self._key(task_id))
+        await self.redis.publish(self._channel(task_id), "deleted")
+    
+    async def create_batch(self, batch: Dict[str, Any]):
+        key = f"{self.key_prefix}batch:{batch['batch_id']}"
+        await self.redis.set(key, json.dumps(batch), ex=BATCH_TTL_SECONDS)
+    
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        batch = await self.redis.get(f"{self.key_prefix}batch:{batch_id}")
+        return json.loads(batch) if batch else None
+    
+    async def watch(self, task_id: str, heartbeat: float) -> AsyncIterator[Optional[TaskStatus]]:
+        pubsub = self.redis.pubsub()
+        # Subscribe before the first read so no update can slip in between
+        await pubsub.subscribe(self._channel(task_id))
+        try:
+            last_version = -1
+            task = await self.get(task_id)
+            while task is not None:
+                if task.version > last_version:
+                    last_version = task.version
+                    yield task
+                if task.status in TERMINAL_STATUSES:
+                    return
+                
+                message = await self._next_message(pubsub, heartbeat)
+                if message is None:
+                    yield None
+                # The message only signals a change; read the latest snapshot
+                task = await self.get(task_id)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+    
+    @staticmethod
+    async def _next_message(pubsub, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait up to timeout seconds for a change event
+        
+        get_message returns None as soon as it reads a subscribe confirmation,
+        so keep reading until a published message arrives or time runs out.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is not None:
+                return message
+
+
+def create_task_store(settings: Settings) -> TaskStore:
+    """Build the task store selected by TASK_STORE_BACKEND"""
+    if settings.task_store_backend == "redis":
+        return RedisTaskStore(
+            settings.redis_url,
+            terminal_ttl=settings.cache_ttl,
+            key_prefix=settings.redis_key_prefix
+        )
+    
+    if settings.task_store_backend != "memory":
+        raise ValueError(f"Unknown task store backend: {settings.task_store_backend}")
+    
+    return InMemoryTaskStore(
+        max_entries=settings.task_store_max_entries,
+        terminal_ttl=settings.cache_ttl
+    )
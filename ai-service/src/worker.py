@@ -0,0 +1,216 @@
+"""
+CotAi Edge AI Service - OCR worker entry point
+Pulls jobs from the Redis job broker and runs the 9-stage pipeline
+
+Usage:
+    EXECUTION_MODE=distributed TASK_STORE_BACKEND=redis python -m src.worker
+"""
+
+import asyncio
+import signal
+import time
+from typing import Dict, Set
+
+from .config.settings import Settings
+from .pipeline.document_processor import DocumentProcessor
+from .pipeline.job_broker import BrokerJob, create_job_broker
+from .utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Worker:
+    """
+    Runs up to MAX_CONCURRENT_JOBS pipelines at a time from the job broker,
+    extending leases while jobs run and requeueing jobs abandoned by crashed
+    workers. SMALL_LANE_SLOTS of those slots only take jobs up to
+    SMALL_JOB_COST. Jobs cancelled through the API are stopped as soon as the
+    cancellation is published. On stop(), running jobs get
+    SHUTDOWN_GRACE_PERIOD seconds to finish; the rest are interrupted and
+    released back to the broker without using up an attempt. Status is
+    published through the shared Redis task store.
+    """
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.processor = DocumentProcessor(settings, role="worker")
+        self.broker = create_job_broker(settings)
+        self.slots = asyncio.Semaphore(settings.max_concurrent_jobs)
+        self.running: Dict[str, asyncio.Task] = {}
+        self.running_costs: Dict[str, float] = {}
+        self.interrupted: Set[str] = set()  # jobs stopped by shutdown, not by the API
+        
+        reserved = min(max(0, settings.small_lane_slots), settings.max_concurrent_jobs - 1)
+        self.max_large_running = max(1, settings.max_concurrent_jobs - reserved)
+        self._stopping = asyncio.Event()
+    
+    async def run(self):
+        """Process jobs until stop() is called"""
+        await self.processor.initialize()
+        await self.broker.initialize()
+        
+        background = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reaper_loop()),
+            asyncio.create_task(self._cancel_loop())
+        ]
+        logger.info(f"Worker started with {self.settings.max_concurrent_jobs} slots")
+        
+        try:
+            while not self._stopping.is_set():
+                if not await self._acquire_slot():
+                    break
+                
+                # Keep the fast-lane slots free for small documents
+                large_running = sum(
+                    1 for cost in self.running_costs.values() if cost > self.settings.small_job_cost
+                )
+                max_cost = None
+                if large_running >= self.max_large_running:
+                    max_cost = self.settings.small_job_cost
+                
+                try:
+                    job = await self.broker.reserve(timeout=5, max_cost=max_cost)
+                except Exception as e:
+                    logger.error(f"Failed to reserve job: {e}")
+                    job = None
+                    await asyncio.sleep(1)
+                
+                if job is None:
+                    self.slots.release()
+                    continue
+                
+                self.running_costs[job.job_id] = job.payload.get("cost", 1.0)
+                self.running[job.job_id] = asyncio.create_task(self._handle(job))
+            
+            await self._drain()
+        finally:
+            for task in background:
+                task.cancel()
+            await self.broker.close()
+            await self.processor.cleanup()
+            logger.info("Worker stopped")
+    
+    def stop(self):
+        """Stop reserving new jobs"""
+        logger.info("Worker stop requested")
+        self._stopping.set()
+    
+    async def _acquire_slot(self) -> bool:
+        """Wait for a free slot; False when stop() is called first"""
+        acquire = asyncio.create_task(self.slots.acquire())
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        
+        if not acquire.done():
+            acquire.cancel()
+            await asyncio.gather(acquire, return_exceptions=True)
+        if acquire.cancelled():
+            return False
+        
+        # The slot may have been granted just as stop() was called
+        if self._stopping.is_set():
+            self.slots.release()
+            return False
+        return True
+    
+    async def _drain(self):
+        """Let in-flight jobs finish within the grace period, then requeue the rest"""
+        if not self.running:
+            return
+        
+        grace = self.settings.shutdown_grace_period
+        logger.info(f"Draining {len(self.running)} running jobs, grace period {grace}s")
+        _, pending = await asyncio.wait(list(self.running.values()), timeout=grace)
+        if not pending:
+            return
+        
+        logger.warning(f"Grace period over, requeueing {len(pending)} running jobs")
+        for job_id, task in list(self.running.items()):
+            if task in pending:
+                self.interrupted.add(job_id)
+                task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _handle(self, job: BrokerJob):
+        """Run one job and ack or nack it"""
+        final_attempt = job.attempts >= self.broker.max_attempts
+        start_time = time.time()
+        
+        try:
+            logger.info(f"Running job {job.job_id} (attempt {job.attempts})")
+            await self.processor.run_job(job.payload, final_attempt=final_attempt)
+            await self.broker.ack(job.job_id)
+            logger.info(f"Job {job.job_id} done in {time.time() - start_time:.2f}s")
+        except asyncio.CancelledError:
+            if job.job_id in self.interrupted:
+                # Worker shutdown; another worker picks the job up from its checkpoints
+                await self.broker.release(job.job_id)
+                logger.info(f"Job {job.job_id} interrupted by shutdown, released to the queue")
+            else:
+                # Cancelled through the API; the pipeline already marked the task
+                await self.broker.ack(job.job_id)
+                logger.info(f"Job {job.job_id} cancelled after {time.time() - start_time:.2f}s")
+        except Exception as e:
+            await self.broker.nack(job.job_id, job.attempts, str(e))
+        finally:
+            self.running.pop(job.job_id, None)
+            self.running_costs.pop(job.job_id, None)
+            self.interrupted.discard(job.job_id)
+            self.slots.release()
+    
+    async def _heartbeat_loop(self):
+        """Keep leases of running jobs alive"""
+        interval = max(1, self.broker.visibility_timeout // 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.broker.extend(list(self.running))
+            except Exception as e:
+                logger.warning(f"Lease heartbeat failed: {e}")
+    
+    async def _cancel_loop(self):
+        """Stop running jobs when the API publishes their cancellation"""
+        while True:
+            try:
+                async for job_id in self.broker.cancellations():
+                    task = self.running.get(job_id)
+                    if task is not None:
+                        logger.info(f"Cancelling job {job_id}")
+                        task.cancel()
+            except Exception as e:
+                logger.warning(f"Cancellation listener failed: {e}")
+                await asyncio.sleep(1)
+    
+    async def _reaper_loop(self):
+        """Requeue jobs whose worker died and fail dead-lettered tasks"""
+        interval = max(1, self.broker.visibility_timeout // 2)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for job_id in await self.broker.requeue_expired():
+                    await self.processor.task_store.update(
+                        job_id,
+                        status="failed",
+                        error="Job abandoned by workers too many times",
+                        completed_at=time.time()
+                    )
+                    if self.processor.journal is not None:
+                        await self.processor.journal.close(job_id)
+            except Exception as e:
+                logger.warning(f"Lease reaper failed: {e}")
+
+
+async def main():
+    worker = Worker(Settings())
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
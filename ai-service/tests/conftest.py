@@ -0,0 +1,90 @@
+"""
+Shared fixtures for the AI service tests
+Settings point at a temporary storage root; Redis backends run on fakeredis
+"""
+
+import ctypes
+import io
+from pathlib import Path
+from typing import List
+
+import fakeredis
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+import pytest
+
+from src.config.settings import Settings
+from src.extractors.warmup import warmup_pdf
+
+
+class FakeUpload:
+    """Stand-in for FastAPI's UploadFile: filename, file and async read(size)"""
+    
+    def __init__(self, filename: str, content: bytes):
+        self.filename = filename
+        self.file = io.BytesIO(content)
+    
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+
+def make_pdf(path: Path, pages: List[str]) -> Path:
+    """
+    Write a PDF with one A4 page per entry: "text" (a full text layer),
+    "scan" (a page-sized image, no text) or "scan+stamp" (a scan with a
+    short text stamp, like the header an e-procurement portal adds)
+    """
+    pdf = pdfium.PdfDocument.new()
+    for kind in pages:
+        page = pdf.new_page(595, 842)
+        if kind in ("text", "scan+stamp"):
+            chars = 2000 if kind == "text" else 60
+            text = ("Edital de pregao eletronico " * (chars // 28 + 1))[:chars]
+            buffer = ctypes.create_string_buffer((text + "\0").encode("utf-16-le"))
+            obj = pdfium_c.FPDFPageObj_NewTextObj(pdf, b"Helvetica", 10.0)
+            pdfium_c.FPDFText_SetText(obj, ctypes.cast(buffer, ctypes.POINTER(pdfium_c.FPDF_WCHAR)))
+            pdfium_c.FPDFPageObj_Transform(obj, 1, 0, 0, 1, 20, 800)
+            pdfium_c.FPDFPage_InsertObject(page.raw, obj)
+        if kind.startswith("scan"):
+            bitmap = pdfium.PdfBitmap.new_native(100, 140, pdfium_c.FPDFBitmap_BGR)
+            bitmap.fill_rect((255, 255, 255, 255), 0, 0, 100, 140)
+            image = pdfium.PdfImage.new(pdf)
+            image.set_bitmap(bitmap)
+            image.set_matrix(pdfium.PdfMatrix().scale(595, 842))
+            page.insert_obj(image)
+        page.gen_content()
+    pdf.save(str(path))
+    pdf.close()
+    return path
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:
+    return Settings(
+        supabase_url="http://supabase.test",
+        supabase_anon_key="anon",
+        supabase_service_role_key="service",
+        jwt_secret="secret",
+        storage_root_path=str(tmp_path / "storage"),
+        temp_directory_path=str(tmp_path / "temp"),
+        results_directory_path=str(tmp_path / "results"),
+        enable_checkpoints=False
+    )
+
+
+@pytest.fixture
+def pdf_bytes() -> bytes:
+    """A small valid one-page PDF"""
+    return warmup_pdf()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Route every redis.asyncio.from_url to one in-process fake server"""
+    server = fakeredis.FakeServer()
+    
+    def from_url(url, **kwargs):
+        return fakeredis.FakeAsyncRedis(server=server, **kwargs)
+    
+    monkeypatch.setattr("redis.asyncio.from_url", from_url)
+    return server
@@ -0,0 +1,110 @@
+"""
+Artifact cache: extractions are reused for the same bytes and converter setup only
+"""
+
+import pytest
+
+from src.models.extraction_models import ExtractionResult, ProcessingStage, QualityScores
+from src.models.pipeline_models import ProcessingContext, TaskStatus
+from src.pipeline.document_processor import DocumentProcessor
+from src.storage.artifact_cache import ArtifactCache
+
+SHA = "ab" * 32
+
+
+def extraction(text: str = "edital") -> ExtractionResult:
+    return ExtractionResult(
+        filename="edital.pdf",
+        markdown_content=f"# {text}",
+        text_content=text,
+        json_content={},
+        tables=[],
+        quality_scores=QualityScores(0.9, 0.9, 0.9, 0.9, 0.9, "EXCELLENT"),
+        processing_stages=[
+            ProcessingStage(stage_id=1, stage_name="Document Parsing", duration_seconds=12.0,
+                            status="completed", confidence=0.9, cpu_seconds=11.0)
+        ],
+        total_processing_time=12.0,
+        confidence_score=0.9
+    )
+
+
+@pytest.fixture
+async def cache(tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts", max_bytes=1024 * 1024)
+    await cache.initialize()
+    return cache
+
+
+async def test_hit_needs_same_bytes_and_fingerprint(cache):
+    await cache.put(SHA, "fingerprint-a", extraction())
+    
+    hit = await cache.get(SHA, "fingerprint-a")
+    assert hit.markdown_content == "# edital"
+    assert hit.processing_stages[0].cpu_seconds == 11.0
+    
+    assert await cache.get(SHA, "fingerprint-b") is None
+    assert await cache.get("cd" * 32, "fingerprint-a") is None
+    
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+async def test_unreadable_entry_is_discarded(cache):
+    await cache.put(SHA, "fingerprint-a", extraction())
+    path = cache._entry_path(SHA, "fingerprint-a")
+    path.write_text("{not json")
+    
+    assert await cache.get(SHA, "fingerprint-a") is None
+    assert not path.exists()
+
+
+async def test_oldest_entries_are_evicted_over_budget(tmp_path):
+    probe = ArtifactCache(tmp_path / "probe", max_bytes=1024 * 1024)
+    await probe.put(SHA, "fingerprint-a", extraction())
+    size = probe.stats()["size_bytes"]
+    
+    cache = ArtifactCache(tmp_path / "artifacts", max_bytes=size * 2)
+    await cache.initialize()
+    
+    for i in range(4):
+        await cache.put(f"{i:02d}" * 32, "fingerprint-a", extraction())
+    
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["size_bytes"] == size * 2
+    assert await cache.get("03" * 32, "fingerprint-a") is not None
+    assert await cache.get("00" * 32, "fingerprint-a") is None
+
+
+async def test_processor_skips_extraction_on_a_hit(settings, monkeypatch):
+    settings.artifact_cache_enabled = True
+    processor = DocumentProcessor(settings)
+    await processor.task_store.initialize()
+    await processor.artifact_cache.initialize()
+    
+    extractions = []
+    
+    async def extract(file_path, filename, profile):
+        extractions.append(filename)
+        return extraction()
+    
+    monkeypatch.setattr(processor.extraction_engine, "extract", extract)
+    processor.extraction_engine.fingerprints = {
+        name: "fingerprint-a" for name in processor.profiles
+    }
+    
+    first = ProcessingContext(task_id="task-1", filename="edital.pdf", content_sha256=SHA)
+    second = ProcessingContext(task_id="task-2", filename="copia.pdf", content_sha256=SHA)
+    for context in (first, second):
+        await processor.task_store.create(
+            TaskStatus(task_id=context.task_id, status="processing", current_stage=0, total_stages=9)
+        )
+    await processor._execute_stages_1_3("edital.pdf", first)
+    result = await processor._execute_stages_1_3("copia.pdf", second)
+    
+    assert extractions == ["edital.pdf"]
+    stage = result.processing_stages[0]
+    assert stage.metadata["cache_hit"]
+    assert stage.metadata["original_duration_seconds"] == 12.0
+    await processor.task_store.close()
@@ -0,0 +1,169 @@
+"""
+Callback delivery: retries with backoff, dead-lettering, coalescing and outbox adoption
+Receivers are httpx mock transports
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+from src.pipeline.callback_dispatcher import CallbackDelivery, CallbackDispatcher
+
+URL = "http://receiver.test/hook"
+
+
+class Receiver:
+    """Mock receiver answering with the given status codes in turn, then 200"""
+    
+    def __init__(self, *statuses: int):
+        self.statuses = list(statuses)
+        self.requests = []
+    
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status)
+
+
+@pytest.fixture
+async def dispatcher(tmp_path):
+    dispatchers = []
+    
+    async def start(receiver, **options) -> CallbackDispatcher:
+        options = {"retry_base": 0.01, "max_attempts": 3, **options}
+        dispatcher = CallbackDispatcher(tmp_path / "outbox", **options)
+        await dispatcher.initialize()
+        await dispatcher._client.aclose()
+        dispatcher._client = httpx.AsyncClient(transport=httpx.MockTransport(receiver))
+        dispatchers.append(dispatcher)
+        return dispatcher
+    
+    yield start
+    for dispatcher in dispatchers:
+        await dispatcher.close()
+
+
+async def settled(dispatcher: CallbackDispatcher):
+    """Wait until no callback is pending and every delivery task has finished"""
+    for _ in range(200):
+        if not dispatcher.stats()["pending"] and not dispatcher._tasks:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("callbacks still pending")
+
+
+def outbox_files(dispatcher: CallbackDispatcher):
+    return sorted(path.name for path in dispatcher.outbox_dir.glob("*.json"))
+
+
+async def test_delivered_callback_leaves_the_outbox(dispatcher):
+    receiver = Receiver()
+    callbacks = await dispatcher(receiver)
+    
+    delivery_id = await callbacks.send(URL, {"task_id": "task-1"})
+    await settled(callbacks)
+    
+    request = receiver.requests[0]
+    assert request.headers["X-Delivery-Id"] == delivery_id
+    assert json.loads(request.content) == {"task_id": "task-1"}
+    assert outbox_files(callbacks) == []
+    assert callbacks.stats()["success_rate"] == 1.0
+
+
+async def test_server_errors_are_retried(dispatcher):
+    receiver = Receiver(503, 429)
+    callbacks = await dispatcher(receiver)
+    
+    await callbacks.send(URL, {"task_id": "task-1"})
+    await settled(callbacks)
+    
+    stats = callbacks.stats()
+    assert len(receiver.requests) == 3
+    assert (stats["delivered"], stats["failed_attempts"], stats["dead"]) == (1, 2, 0)
+    # Retries do not count against the callback's outcome
+    assert stats["success_rate"] == 1.0
+
+
+async def test_rejected_callback_is_dead_lettered_at_once(dispatcher):
+    receiver = Receiver(400)
+    callbacks = await dispatcher(receiver)
+    
+    delivery_id = await callbacks.send(URL, {"task_id": "task-1"})
+    await settled(callbacks)
+    
+    assert len(receiver.requests) == 1
+    dead = CallbackDelivery.from_dict(json.loads((callbacks.dead_dir / f"{delivery_id}.json").read_text()))
+    assert dead.last_error == "HTTP 400"
+    assert outbox_files(callbacks) == []
+    assert callbacks.stats()["success_rate"] == 0.0
+
+
+async def test_gives_up_after_max_attempts(dispatcher):
+    receiver = Receiver()
+    
+    def failing_for_task_2(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)["task_id"] == "task-2":
+            receiver.requests.append(request)
+            return httpx.Response(500)
+        return receiver(request)
+    
+    callbacks = await dispatcher(failing_for_task_2)
+    
+    await callbacks.send(URL, {"task_id": "task-1"})
+    await callbacks.send(URL, {"task_id": "task-2"})
+    await settled(callbacks)
+    
+    stats = callbacks.stats()
+    assert len(receiver.requests) == 1 + 3
+    assert (stats["delivered"], stats["failed_attempts"], stats["dead"]) == (1, 3, 1)
+    assert stats["success_rate"] == 0.5
+    assert len(list(callbacks.dead_dir.glob("*.json"))) == 1
+
+
+async def test_backoff_uses_full_jitter(dispatcher):
+    callbacks = await dispatcher(Receiver(), retry_base=1.0, max_backoff=8.0)
+    
+    delays = [callbacks._backoff(3) for _ in range(500)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert min(delays) < 1.0
+    
+    assert max(callbacks._backoff(10) for _ in range(500)) <= 8.0
+
+
+async def test_callbacks_within_the_window_are_coalesced(dispatcher):
+    receiver = Receiver()
+    callbacks = await dispatcher(receiver, batch_window=0.05)
+    
+    first = await callbacks.send(URL, {"task_id": "task-1"})
+    second = await callbacks.send(URL, {"task_id": "task-2"})
+    await settled(callbacks)
+    
+    assert len(receiver.requests) == 1
+    events = json.loads(receiver.requests[0].content)["events"]
+    assert [(e["delivery_id"], e["task_id"]) for e in events] == [(first, "task-1"), (second, "task-2")]
+
+
+async def test_abandoned_outbox_entry_is_adopted(dispatcher, tmp_path):
+    outbox = tmp_path / "outbox"
+    outbox.mkdir()
+    orphan = CallbackDelivery(delivery_id="orphan", url=URL, payload={"task_id": "task-1"})
+    path = outbox / "orphan.deadowner.json"
+    path.write_text(json.dumps(orphan.to_dict()))
+    stale = time.time() - 120
+    os.utime(path, (stale, stale))
+    
+    receiver = Receiver()
+    callbacks = await dispatcher(receiver, lease=60.0)
+    for _ in range(100):
+        if receiver.requests:
+            break
+        await asyncio.sleep(0.01)
+    await settled(callbacks)
+    
+    assert receiver.requests[0].headers["X-Delivery-Id"] == "orphan"
+    assert callbacks.stats()["adopted"] == 1
+    assert outbox_files(callbacks) == []
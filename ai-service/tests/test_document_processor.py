@@ -0,0 +1,169 @@
+"""
+Admission paths of the document processor: batch limits, duplicate uploads
+and drain. Only storage and stores are initialized; no models are loaded and
+the job queue is not started unless a test does, so admitted jobs stay waiting
+"""
+
+import asyncio
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from src.models.pipeline_models import TaskStatus
+from src.pipeline.document_processor import DocumentProcessor
+from src.pipeline.job_queue import ServiceDrainingError
+
+from conftest import FakeUpload
+
+
+@pytest.fixture
+async def processor(settings):
+    settings.max_batch_documents = 3
+    processor = DocumentProcessor(settings)
+    await processor.file_manager.initialize()
+    await processor.task_store.initialize()
+    await processor.result_index.initialize()
+    yield processor
+    await processor.task_store.close()
+
+
+def zip_of(members) -> bytes:
+    """ZIP archive of (name, content) members"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def stored_originals(settings):
+    return list(Path(settings.storage_root_path).rglob("*.pdf"))
+
+
+async def test_batch_over_the_limit_admits_nothing(processor, settings, pdf_bytes):
+    files = [
+        FakeUpload("edital.pdf", pdf_bytes),
+        FakeUpload("anexos.zip", zip_of([(f"anexo{i}.pdf", pdf_bytes + bytes([i])) for i in range(3)]))
+    ]
+    
+    with pytest.raises(ValueError, match="maximum of 3 documents"):
+        await processor.process_batch(files, {"uasg": "986531"})
+    
+    assert processor.job_queue.stats()["waiting"] == 0
+    assert stored_originals(settings) == []
+
+
+async def test_batch_admits_pdfs_and_zip_members(processor, pdf_bytes):
+    files = [
+        FakeUpload("edital.pdf", pdf_bytes),
+        FakeUpload("anexos.zip", zip_of([
+            ("anexo1.pdf", pdf_bytes + b"1"),
+            ("docs/anexo2.pdf", pdf_bytes + b"2"),
+            ("leia-me.txt", b"text")
+        ])),
+        FakeUpload("planilha.xlsx", b"xlsx")
+    ]
+    
+    batch = await processor.process_batch(files, {"uasg": "986531"})
+    
+    assert [document["filename"] for document in batch["documents"]] == [
+        "edital.pdf", "anexo1.pdf", "anexo2.pdf"
+    ]
+    assert {entry["filename"] for entry in batch["skipped"]} == {
+        "anexos.zip/leia-me.txt", "planilha.xlsx"
+    }
+    assert processor.job_queue.stats()["waiting"] == 3
+    assert await processor.task_store.get_batch(batch["batch_id"]) == batch
+
+
+async def test_batch_without_pdfs_is_rejected(processor):
+    with pytest.raises(ValueError, match="no PDF documents"):
+        await processor.process_batch([FakeUpload("notes.txt", b"text")], {})
+
+
+async def test_unknown_profile_is_rejected_before_storing(processor, settings, pdf_bytes):
+    with pytest.raises(ValueError, match="Unknown pipeline profile"):
+        await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {"profile": "turbo"})
+    
+    assert stored_originals(settings) == []
+
+
+async def test_duplicate_upload_follows_the_first(processor, pdf_bytes):
+    leader = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {"uasg": "1"})
+    follower = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {"uasg": "1"})
+    
+    assert processor.job_queue.position(leader) == 1
+    assert processor.job_queue.position(follower) is None
+    assert (await processor.task_store.get(follower)).stage_name == f"Waiting for task {leader}"
+    
+    # Another profile is different work and gets its own pipeline
+    other = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {"profile": "fast"})
+    assert processor.job_queue.position(other) is not None
+
+
+async def test_follower_takes_over_when_leader_is_cancelled(processor, pdf_bytes):
+    leader = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    first = await processor.process_document(FakeUpload("copia.pdf", pdf_bytes), {})
+    second = await processor.process_document(FakeUpload("outra.pdf", pdf_bytes), {})
+    
+    assert await processor.cancel_task(leader)
+    
+    assert (await processor.task_store.get(leader)).status == "cancelled"
+    assert (await processor.task_store.get(first)).status == "pending"
+    assert (await processor.task_store.get(second)).status == "pending"
+    
+    # The oldest follower now runs its own pipeline; the other waits on it
+    assert processor.job_queue.position(first) == 1
+    assert processor.job_queue.position(second) is None
+    
+    assert await processor.cancel_task(first)
+    assert processor.job_queue.position(second) == 1
+    assert (await processor.task_store.get(second)).status == "pending"
+
+
+async def test_drain_interrupts_running_jobs_and_cancels_waiting_ones(processor, settings, pdf_bytes):
+    settings.shutdown_grace_period = 0.2
+    await processor.job_queue.start()
+    
+    async def blocked():
+        await asyncio.Event().wait()
+    
+    # Two runners busy, one job waiting
+    for i in range(3):
+        await processor.task_store.create(
+            TaskStatus(task_id=f"task-{i}", status="pending", current_stage=0, total_stages=9)
+        )
+        processor.job_queue.submit(f"task-{i}", blocked)
+    await asyncio.sleep(0.01)
+    assert processor.job_queue.stats()["running"] == 2
+    
+    drain = processor.start_drain()
+    assert processor.start_drain() is drain
+    assert (await processor.readiness())["status"] == "draining"
+    with pytest.raises(ServiceDrainingError):
+        await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    
+    await asyncio.wait_for(drain, timeout=2)
+    
+    status = processor.drain_status()
+    assert status["done"]
+    assert status["running"] == 0
+    assert status["waiting"] == 0
+    
+    # Without checkpoints the waiting job cannot resume later
+    waiting = await processor.task_store.get("task-2")
+    assert waiting.status == "cancelled"
+    assert waiting.error == "Service shut down before the task started"
+
+
+async def test_readiness_waits_for_warm_models(processor):
+    assert (await processor.readiness())["status"] == "starting"
+    
+    processor.extraction_engine.warmup = {"warmup_seconds": {"balanced": 4.2}}
+    processor.models_ready = True
+    readiness = await processor.readiness()
+    
+    assert readiness["ready"]
+    assert readiness["models"]["warmup"] == {"warmup_seconds": {"balanced": 4.2}}
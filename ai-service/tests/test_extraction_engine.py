@@ -0,0 +1,200 @@
+"""
+Process-pool extraction engine: cancelled or crashed workers are replaced,
+long PDFs are converted as page windows. Workers are plain spawned processes
+or a stubbed _run here; Docling is never imported
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pypdfium2 as pdfium
+import pytest
+
+from src.extractors.extraction_engine import ExtractionEngine
+from src.models.extraction_models import ExtractionResult, ProcessingStage, QualityScores
+
+from conftest import make_pdf
+
+
+@pytest.fixture
+async def engine(settings, monkeypatch):
+    settings.extraction_workers = 1
+    engine = ExtractionEngine(settings)
+    
+    # Same single-process executors, without loading a converter
+    monkeypatch.setattr(engine, "_new_executor", lambda: ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ))
+    engine._executors = [engine._new_executor()]
+    engine._idle = asyncio.Queue()
+    engine._idle.put_nowait(engine._executors[0])
+    yield engine
+    await engine.shutdown()
+
+
+def worker_process(executor: ProcessPoolExecutor):
+    return next(iter(executor._processes.values()))
+
+
+async def test_run_uses_the_worker_process(engine):
+    assert await engine._run(os.getpid) != os.getpid()
+    assert engine._idle.qsize() == 1
+
+
+async def test_cancel_kills_and_replaces_the_worker(engine):
+    first_pid = await engine._run(os.getpid)
+    process = worker_process(engine._executors[0])
+    
+    conversion = asyncio.create_task(engine._run(time.sleep, 30))
+    await asyncio.sleep(0.2)
+    conversion.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await conversion
+    
+    # The stuck process is gone and a fresh worker takes its place
+    await asyncio.to_thread(process.join, 5)
+    assert not process.is_alive()
+    assert engine._idle.qsize() == 1
+    assert await engine._run(os.getpid) not in (first_pid, os.getpid())
+
+
+async def test_dead_worker_is_replaced(engine):
+    with pytest.raises(BrokenProcessPool):
+        await engine._run(os._exit, 1)
+    
+    assert engine._idle.qsize() == 1
+    assert await engine._run(os.getpid) != os.getpid()
+
+
+async def test_run_before_initialize_fails(settings):
+    with pytest.raises(RuntimeError, match="not initialized"):
+        await ExtractionEngine(settings)._run(os.getpid)
+
+
+def converted(path: str, ocr: bool) -> ExtractionResult:
+    """What a worker returns for a file: one text item per page"""
+    pdf = pdfium.PdfDocument(path)
+    pages = len(pdf)
+    pdf.close()
+    return ExtractionResult(
+        filename=Path(path).name,
+        markdown_content=Path(path).name,
+        text_content=Path(path).name,
+        json_content={
+            "texts": [{"self_ref": f"#/texts/{n}", "prov": [{"page_no": n + 1}]} for n in range(pages)],
+            "pages": {str(n): {"page_no": n} for n in range(1, pages + 1)}
+        },
+        tables=[],
+        quality_scores=QualityScores(0.9, 0.9, 0.9, 0.9, 0.9, "EXCELLENT"),
+        processing_stages=[
+            ProcessingStage(stage_id=1, stage_name="Document Parsing", duration_seconds=1.0,
+                            status="completed", confidence=0.9, metadata={"ocr": ocr})
+        ],
+        total_processing_time=1.0,
+        confidence_score=0.9
+    )
+
+
+@pytest.fixture
+def window_engine(settings):
+    """Engine whose _run converts in-process and records (file, ocr) per call"""
+    settings.extraction_workers = 4
+    settings.small_lane_slots = 0
+    settings.split_page_threshold = 4
+    settings.split_window_pages = 2
+    settings.text_fast_path = False
+    engine = ExtractionEngine(settings)
+    engine._idle = asyncio.Queue()
+    engine.calls = []
+    
+    async def run(fn, path, filename, ocr, profile):
+        engine.calls.append((Path(path).name, ocr))
+        await asyncio.sleep(0.01)
+        return converted(path, ocr)
+    
+    engine._run = run
+    return engine
+
+
+async def test_long_pdf_is_converted_in_windows(window_engine, tmp_path):
+    source = make_pdf(tmp_path / "edital.pdf", ["text"] * 5)
+    
+    result = await window_engine.extract(source, "edital.pdf")
+    
+    assert sorted(window_engine.calls) == [
+        ("pages_00001_00002.pdf", True), ("pages_00003_00004.pdf", True), ("pages_00005_00005.pdf", True)
+    ]
+    texts = result.json_content["texts"]
+    assert [text["self_ref"] for text in texts] == [f"#/texts/{n}" for n in range(5)]
+    assert [text["prov"][0]["page_no"] for text in texts] == [1, 2, 3, 4, 5]
+    assert result.processing_stages[0].metadata["windows"] == 3
+    
+    # Window files are temporary
+    assert list(Path(window_engine.settings.temp_directory_path).glob("windows_*")) == []
+
+
+async def test_short_pdf_is_converted_whole(window_engine, tmp_path):
+    source = make_pdf(tmp_path / "edital.pdf", ["text"] * 4)
+    
+    await window_engine.extract(source, "edital.pdf")
+    
+    assert window_engine.calls == [("edital.pdf", True)]
+
+
+async def test_failed_window_stops_its_siblings_first(window_engine, tmp_path):
+    source = make_pdf(tmp_path / "edital.pdf", ["text"] * 6)
+    events = []
+    
+    async def run(fn, path, filename, ocr, profile):
+        name = Path(path).name
+        try:
+            if name.startswith("pages_00001"):
+                await asyncio.sleep(0.05)
+                raise RuntimeError("window broke")
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            # The window file must still be there while its conversion stops
+            events.append((name, Path(path).exists()))
+            raise
+    
+    window_engine._run = run
+    with pytest.raises(RuntimeError, match="window broke"):
+        await window_engine.extract(source, "edital.pdf")
+    
+    assert sorted(events) == [("pages_00003_00004.pdf", True), ("pages_00005_00006.pdf", True)]
+    assert list(Path(window_engine.settings.temp_directory_path).glob("windows_*")) == []
+
+
+async def test_born_digital_pdf_skips_ocr(window_engine, tmp_path):
+    window_engine.settings.text_fast_path = True
+    
+    await window_engine.extract(make_pdf(tmp_path / "digital.pdf", ["text"] * 3), "digital.pdf")
+    await window_engine.extract(make_pdf(tmp_path / "scanned.pdf", ["scan+stamp", "scan"]), "scanned.pdf")
+    
+    assert window_engine.calls == [("digital.pdf", False), ("scanned.pdf", True)]
+
+
+async def test_mixed_pdf_ocrs_only_its_scanned_pages(window_engine, tmp_path):
+    window_engine.settings.text_fast_path = True
+    window_engine.settings.split_window_pages = 10
+    source = make_pdf(tmp_path / "edital.pdf", ["text"] * 3 + ["scan", "scan+stamp"])
+    
+    result = await window_engine.extract(source, "edital.pdf")
+    
+    assert sorted(window_engine.calls) == [("pages_00001_00003.pdf", False), ("pages_00004_00005.pdf", True)]
+    assert result.processing_stages[0].metadata["ocr_pages"] == 2
+
+
+async def test_short_mixed_pdf_is_not_split_further(window_engine, tmp_path):
+    window_engine.settings.text_fast_path = True
+    source = make_pdf(tmp_path / "edital.pdf", ["text", "scan+stamp", "scan"])
+    
+    await window_engine.extract(source, "edital.pdf")
+    
+    # One OCR run under the split threshold is converted as the whole file
+    assert window_engine.calls == [("edital.pdf", True)]
@@ -0,0 +1,56 @@
+"""
+Upload spooling into organized storage
+"""
+
+import hashlib
+
+import pytest
+
+from src.models.pipeline_models import ProcessingContext
+from src.storage.file_manager import FileManager, FileTooLargeError
+
+from conftest import FakeUpload
+
+
+@pytest.fixture
+async def file_manager(settings):
+    manager = FileManager(settings)
+    await manager.initialize()
+    return manager
+
+
+def context(task_id: str, filename: str = "edital.pdf") -> ProcessingContext:
+    return ProcessingContext(task_id=task_id, filename=filename, ano=2025, uasg="986531")
+
+
+async def test_spool_upload_hashes_and_stores(file_manager):
+    content = b"%PDF-1.4 edital"
+    upload = await file_manager.spool_upload(FakeUpload("edital.pdf", content), "edital.pdf",
+                                             context("task-1"))
+    
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.path.read_bytes() == content
+    assert upload.path.name == "edital.pdf"
+
+
+async def test_same_filename_never_overwrites_another_task(file_manager):
+    first = await file_manager.spool_upload(FakeUpload("edital.pdf", b"first"), "edital.pdf",
+                                            context("task-1"))
+    second = await file_manager.spool_upload(FakeUpload("edital.pdf", b"second"), "edital.pdf",
+                                             context("task-2"))
+    
+    assert first.path != second.path
+    assert first.path.read_bytes() == b"first"
+    assert second.path.read_bytes() == b"second"
+
+
+async def test_oversized_upload_leaves_nothing_behind(file_manager, settings):
+    settings.max_file_size = 1024
+    content = b"x" * 3000
+    
+    with pytest.raises(FileTooLargeError):
+        await file_manager.spool_upload(FakeUpload("big.pdf", content), "big.pdf", context("task-1"))
+    
+    stored = [path for path in file_manager.storage_root.rglob("*") if path.is_file()]
+    assert stored == []
@@ -0,0 +1,155 @@
+"""
+Scheduling behaviour of the in-process job queue
+"""
+
+import asyncio
+
+import pytest
+
+from src.pipeline.job_queue import JobQueue, QueueFullError, TenantPolicy, job_priority
+
+
+async def settle():
+    """Let runners pick up jobs"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class Recorder:
+    """Job factories that record their start order and block until released"""
+    
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+    
+    def job(self, name: str):
+        async def run():
+            self.started.append(name)
+            await self.release.wait()
+        return run
+
+
+async def run_all(queue: JobQueue, recorder: Recorder, count: int):
+    """Start the queue and let every job run to completion"""
+    recorder.release.set()
+    await queue.start()
+    for _ in range(100):
+        if len(recorder.started) == count:
+            break
+        await asyncio.sleep(0)
+    await queue.stop()
+
+
+def test_job_priority_ages_long_jobs():
+    # A long job is overtaken by short jobs arriving soon after it, not later ones
+    long_job = job_priority(enqueued_at=0.0, cost=10, cost_weight_seconds=1.0)
+    assert job_priority(enqueued_at=5.0, cost=1, cost_weight_seconds=1.0) < long_job
+    assert job_priority(enqueued_at=11.0, cost=1, cost_weight_seconds=1.0) > long_job
+
+
+async def test_shortest_job_first():
+    queue = JobQueue(max_concurrent=1, max_depth=10, small_lane_slots=0)
+    recorder = Recorder()
+    for name, cost in [("large", 50), ("small", 5), ("medium", 20)]:
+        queue.submit(name, recorder.job(name), cost=cost)
+    
+    await run_all(queue, recorder, 3)
+    assert recorder.started == ["small", "medium", "large"]
+
+
+async def test_submit_rejects_when_backlog_full():
+    queue = JobQueue(max_concurrent=1, max_depth=2)
+    recorder = Recorder()
+    queue.submit("a", recorder.job("a"))
+    queue.submit("b", recorder.job("b"))
+    
+    with pytest.raises(QueueFullError) as excinfo:
+        queue.submit("c", recorder.job("c"))
+    assert excinfo.value.retry_after >= 1
+    
+    # Batch children are admitted as a whole
+    queue.submit("d", recorder.job("d"), check_depth=False)
+    assert queue.stats()["waiting"] == 3
+
+
+async def test_small_lane_runs_small_jobs_next_to_large_ones():
+    queue = JobQueue(max_concurrent=2, max_depth=10, small_job_cost=20, small_lane_slots=1)
+    recorder = Recorder()
+    queue.submit("large-1", recorder.job("large-1"), cost=100)
+    queue.submit("large-2", recorder.job("large-2"), cost=100)
+    await queue.start()
+    await settle()
+    
+    # Only one runner takes large jobs; the other stays free for small ones
+    assert recorder.started == ["large-1"]
+    
+    queue.submit("small", recorder.job("small"), cost=5)
+    await settle()
+    assert recorder.started == ["large-1", "small"]
+    assert queue.stats()["running_large"] == 1
+    
+    await queue.stop()
+
+
+async def test_tenants_share_runners():
+    queue = JobQueue(max_concurrent=1, max_depth=10, small_lane_slots=0)
+    recorder = Recorder()
+    for name in ["a1", "a2", "a3"]:
+        queue.submit(name, recorder.job(name), tenant="agency-a")
+    queue.submit("b1", recorder.job("b1"), tenant="agency-b")
+    
+    await run_all(queue, recorder, 4)
+    assert recorder.started == ["a1", "b1", "a2", "a3"]
+
+
+async def test_tenant_weights_and_caps():
+    policy = TenantPolicy(weights={"agency-a": 2.0}, default_max_concurrent=1)
+    queue = JobQueue(max_concurrent=2, max_depth=10, small_lane_slots=0, tenant_policy=policy)
+    recorder = Recorder()
+    queue.submit("a1", recorder.job("a1"), tenant="agency-a")
+    queue.submit("a2", recorder.job("a2"), tenant="agency-a")
+    await queue.start()
+    await settle()
+    
+    # The per-tenant cap leaves the second runner idle
+    assert recorder.started == ["a1"]
+    assert queue.stats()["tenants"]["agency-a"] == {
+        "waiting": 1,
+        "waiting_small": 1,
+        "running": 1,
+        "served_cost": 1.0,
+        "weight": 2.0,
+        "max_concurrent": 1
+    }
+    
+    await queue.stop()
+
+
+async def test_cancel_waiting_job():
+    queue = JobQueue(max_concurrent=1, max_depth=10)
+    recorder = Recorder()
+    queue.submit("a", recorder.job("a"))
+    queue.submit("b", recorder.job("b"))
+    
+    job = queue.cancel("b")
+    assert job is not None and job.started_at is None
+    assert queue.position("b") is None
+    assert queue.position("a") == 1
+    assert queue.cancel("unknown") is None
+
+
+async def test_cancel_running_job_frees_runner():
+    queue = JobQueue(max_concurrent=1, max_depth=10)
+    recorder = Recorder()
+    queue.submit("a", recorder.job("a"))
+    queue.submit("b", recorder.job("b"))
+    await queue.start()
+    await settle()
+    assert queue.position("a") == 0
+    
+    job = queue.cancel("a")
+    assert job.started_at is not None
+    await settle()
+    assert recorder.started == ["a", "b"]
+    
+    await queue.stop()
@@ -0,0 +1,97 @@
+"""
+Page image cache: renders on a miss, serves hits from disk, evicts least recently used pages
+Rendering is replaced by a stub; the cache logic does not depend on pixels
+"""
+
+import pytest
+
+from src.storage import page_images
+from src.storage.page_images import PageImageCache, PageRenderError, render_page_png
+
+PNG_SIZE = 100
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Record (page, dpi) of every render; each render is PNG_SIZE bytes"""
+    calls = []
+    
+    def render(file_path, page_number, dpi):
+        calls.append((page_number, dpi))
+        return bytes([page_number]) * PNG_SIZE
+    
+    monkeypatch.setattr(page_images, "render_page_png", render)
+    return calls
+
+
+@pytest.fixture
+async def cache(tmp_path):
+    cache = PageImageCache(tmp_path / "pages", max_bytes=2 * PNG_SIZE, max_dpi=200)
+    await cache.initialize()
+    return cache
+
+
+@pytest.fixture
+def original(tmp_path, pdf_bytes):
+    path = tmp_path / "edital.pdf"
+    path.write_bytes(pdf_bytes)
+    return path
+
+
+async def test_second_request_is_served_from_disk(cache, renders, original):
+    first = await cache.get(original, 1, 100)
+    second = await cache.get(original, 1, 100)
+    
+    assert first == second == bytes([1]) * PNG_SIZE
+    assert renders == [(1, 100)]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    
+    # Another resolution is another image
+    await cache.get(original, 1, 150)
+    assert renders == [(1, 100), (1, 150)]
+
+
+async def test_dpi_outside_bounds_is_refused(cache, renders, original):
+    with pytest.raises(PageRenderError):
+        await cache.get(original, 1, 201)
+    with pytest.raises(PageRenderError):
+        await cache.get(original, 1, 10)
+    assert renders == []
+
+
+async def test_least_recently_used_page_is_evicted(cache, renders, original):
+    await cache.get(original, 1, 100)
+    await cache.get(original, 2, 100)
+    await cache.get(original, 1, 100)
+    await cache.get(original, 3, 100)
+    
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] == 2 * PNG_SIZE
+    
+    # Page 1 was used more recently than page 2
+    await cache.get(original, 1, 100)
+    await cache.get(original, 2, 100)
+    assert renders == [(1, 100), (2, 100), (3, 100), (2, 100)]
+
+
+async def test_replaced_original_is_rendered_again(cache, renders, original, pdf_bytes):
+    await cache.get(original, 1, 100)
+    original.write_bytes(pdf_bytes + b"\n")
+    await cache.get(original, 1, 100)
+    
+    assert renders == [(1, 100), (1, 100)]
+
+
+async def test_size_survives_a_restart(cache, renders, original, tmp_path):
+    await cache.get(original, 1, 100)
+    
+    restarted = PageImageCache(tmp_path / "pages", max_bytes=2 * PNG_SIZE)
+    await restarted.initialize()
+    assert restarted.stats()["size_bytes"] == PNG_SIZE
+
+
+def test_render_rejects_missing_page(original):
+    with pytest.raises(ValueError, match="Page 2 not found"):
+        render_page_png(original, 2, 72)
@@ -0,0 +1,128 @@
+"""
+Page-window splitting: window planning, window files and merging per-window extractions
+"""
+
+import pypdfium2 as pdfium
+import pytest
+
+from src.extractors.pdf_splitter import (
+    PageWindow, merge_extraction_results, plan_ocr_windows, plan_windows, write_windows
+)
+from src.models.extraction_models import ExtractionResult, ProcessingStage, QualityScores, TableData
+from src.models.pipeline_models import PipelineProfile
+
+from conftest import make_pdf
+
+
+def window_result(window: PageWindow, score: float, cpu_seconds: float) -> ExtractionResult:
+    """Extraction of a window file, with window-local page numbers and references"""
+    document = {
+        "name": f"pages_{window.start_page}",
+        "body": {"self_ref": "#/body", "children": [{"$ref": "#/texts/0"}, {"$ref": "#/tables/0"}]},
+        "furniture": {"self_ref": "#/furniture", "children": []},
+        "texts": [{"self_ref": "#/texts/0", "parent": {"$ref": "#/body"}, "prov": [{"page_no": 1}]}],
+        "tables": [{"self_ref": "#/tables/0", "parent": {"$ref": "#/body"}, "prov": [{"page_no": 2}]}],
+        "pages": {str(n): {"page_no": n} for n in range(1, window.num_pages + 1)}
+    }
+    return ExtractionResult(
+        filename=document["name"],
+        markdown_content=f"window {window.start_page}",
+        text_content=f"window {window.start_page}",
+        json_content=document,
+        tables=[TableData(table_id=0, page_number=2, raw_data={})],
+        quality_scores=QualityScores(score, score, score, score, score, "GOOD"),
+        processing_stages=[
+            ProcessingStage(stage_id=1, stage_name="Document Parsing", duration_seconds=cpu_seconds,
+                            status="completed", confidence=score, cpu_seconds=cpu_seconds,
+                            metadata={"ocr": window.ocr})
+        ],
+        total_processing_time=cpu_seconds,
+        confidence_score=score
+    )
+
+
+def test_plan_windows_covers_every_page_once():
+    windows = plan_windows(120, 50)
+    
+    assert [(w.start_page, w.end_page) for w in windows] == [(1, 50), (51, 100), (101, 120)]
+    assert [w.page_offset for w in windows] == [0, 50, 100]
+    assert sum(w.num_pages for w in windows) == 120
+
+
+def test_plan_ocr_windows_folds_short_digital_runs():
+    text_pages = [True] * 4 + [False, True, False] + [True] * 3
+    
+    windows = plan_ocr_windows(text_pages, None, min_text_run=3)
+    
+    # The lone digital page 6 is OCRed with the scans around it
+    assert [(w.start_page, w.end_page, w.ocr) for w in windows] == [(1, 4, False), (5, 7, True), (8, 10, False)]
+
+
+def test_plan_ocr_windows_splits_long_runs():
+    windows = plan_ocr_windows([False] * 5 + [True] * 3, 2, min_text_run=3)
+    
+    assert [(w.start_page, w.end_page, w.ocr) for w in windows] == [
+        (1, 2, True), (3, 4, True), (5, 5, True), (6, 7, False), (8, 8, False)
+    ]
+
+
+def test_plan_ocr_windows_keeps_an_all_digital_pdf_whole():
+    windows = plan_ocr_windows([True, True], None, min_text_run=3)
+    
+    assert [(w.start_page, w.end_page, w.ocr) for w in windows] == [(1, 2, False)]
+
+
+def test_write_windows_cuts_page_ranges(tmp_path):
+    source = make_pdf(tmp_path / "edital.pdf", ["text"] * 5)
+    
+    paths = write_windows(source, plan_windows(5, 2), tmp_path / "windows")
+    
+    assert [path.name for path in paths] == [
+        "pages_00001_00002.pdf", "pages_00003_00004.pdf", "pages_00005_00005.pdf"
+    ]
+    page_counts = []
+    for path in paths:
+        pdf = pdfium.PdfDocument(str(path))
+        page_counts.append(len(pdf))
+        pdf.close()
+    assert page_counts == [2, 2, 1]
+
+
+def test_merge_rebases_pages_and_references(settings):
+    windows = [PageWindow(1, 2, ocr=False), PageWindow(3, 6, ocr=True)]
+    results = [window_result(windows[0], 0.9, 10.0), window_result(windows[1], 0.5, 30.0)]
+    
+    merged = merge_extraction_results(results, windows, "edital.pdf", settings)
+    
+    document = merged.json_content
+    assert document["name"] == "edital"
+    assert [text["self_ref"] for text in document["texts"]] == ["#/texts/0", "#/texts/1"]
+    assert [text["prov"][0]["page_no"] for text in document["texts"]] == [1, 3]
+    assert [table["prov"][0]["page_no"] for table in document["tables"]] == [2, 4]
+    assert document["body"]["children"] == [
+        {"$ref": "#/texts/0"}, {"$ref": "#/tables/0"}, {"$ref": "#/texts/1"}, {"$ref": "#/tables/1"}
+    ]
+    assert document["tables"][1]["parent"] == {"$ref": "#/body"}
+    assert sorted(document["pages"], key=int) == ["1", "2", "3", "4", "5", "6"]
+    
+    assert [(t.table_id, t.page_number) for t in merged.tables] == [(0, 2), (1, 4)]
+    
+    # Scores weighted by pages, wall time of the slowest window, CPU time summed
+    assert merged.quality_scores.overall_score == pytest.approx((0.9 * 2 + 0.5 * 4) / 6)
+    assert merged.quality_scores.quality_grade == "FAIR"
+    stage = merged.processing_stages[0]
+    assert stage.duration_seconds == 30.0
+    assert stage.cpu_seconds == 40.0
+    assert stage.metadata["windows"] == 2
+    assert stage.metadata["ocr"] is True
+    assert stage.metadata["ocr_pages"] == 4
+
+
+def test_profile_fingerprint_follows_output_settings(settings):
+    profile = PipelineProfile.from_settings(settings)[settings.default_pipeline_profile]
+    fingerprint = profile.fingerprint(settings)
+    
+    assert profile.fingerprint(settings) == fingerprint
+    
+    settings.split_window_pages = 20
+    assert profile.fingerprint(settings) != fingerprint
@@ -0,0 +1,200 @@
+"""
+Running pipelines: deadlines, cancellation and resuming after a restart
+Extraction is stubbed; no models are loaded
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.models.extraction_models import ExtractionResult, QualityScores
+from src.models.pipeline_models import ProcessingContext
+from src.pipeline.document_processor import DocumentProcessor
+from src.storage.task_journal import TaskJournal
+
+from conftest import FakeUpload
+
+
+def extraction_result(filename: str) -> ExtractionResult:
+    return ExtractionResult(
+        filename=filename, markdown_content="# edital", text_content="edital", json_content={}, tables=[],
+        quality_scores=QualityScores(0.9, 0.9, 0.9, 0.9, 0.9, "EXCELLENT"),
+        processing_stages=[], total_processing_time=1.0, confidence_score=0.9
+    )
+
+
+class StubExtraction:
+    """Extraction that blocks until released and records how it ended"""
+    
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+    
+    async def __call__(self, file_path, filename, profile=None):
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture
+async def processor(settings, monkeypatch):
+    processor = DocumentProcessor(settings)
+    await processor.file_manager.initialize()
+    await processor.task_store.initialize()
+    await processor.result_index.initialize()
+    processor.extraction = StubExtraction()
+    monkeypatch.setattr(processor.extraction_engine, "extract", processor.extraction)
+    await processor.job_queue.start()
+    yield processor
+    await processor.job_queue.stop()
+    await processor.task_store.close()
+
+
+async def wait_for_status(processor, task_id: str, status: str):
+    for _ in range(200):
+        task = await processor.task_store.get(task_id)
+        if task.status == status:
+            return task
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"task {task_id} is {task.status}, expected {status}")
+
+
+async def test_deadline_fails_the_task_and_stops_extraction(processor, settings, pdf_bytes):
+    settings.max_processing_time = 0.2
+    
+    task_id = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    task = await wait_for_status(processor, task_id, "failed")
+    
+    assert "exceeded the processing time limit" in task.error
+    assert processor.extraction.cancelled
+    
+    # The runner frees its slot right after recording the failure
+    for _ in range(100):
+        if processor.job_queue.stats()["running"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert processor.job_queue.stats()["running"] == 0
+
+
+async def test_cancel_stops_a_running_pipeline(processor, pdf_bytes):
+    task_id = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    await asyncio.wait_for(processor.extraction.started.wait(), timeout=2)
+    
+    assert await processor.cancel_task(task_id)
+    
+    task = await wait_for_status(processor, task_id, "cancelled")
+    assert task.error == "Cancelled by client"
+    for _ in range(100):
+        if processor.job_queue.stats()["running"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert processor.extraction.cancelled
+    
+    # The runner frees its slot right after recording the failure
+    for _ in range(100):
+        if processor.job_queue.stats()["running"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert processor.job_queue.stats()["running"] == 0
+    
+    # Finished tasks cannot be cancelled again
+    assert not await processor.cancel_task(task_id)
+
+
+async def test_cancel_between_stages_stops_at_the_boundary(processor, pdf_bytes, monkeypatch):
+    analysed = []
+    
+    async def extract_then_cancelled(file_path, filename, profile=None):
+        # The client cancels while extraction finishes
+        await processor.cancel_task(task_id)
+        return extraction_result(filename)
+    
+    async def analyse(*args):
+        analysed.append(args)
+        raise AssertionError("analysis ran for a cancelled task")
+    
+    monkeypatch.setattr(processor.extraction_engine, "extract", extract_then_cancelled)
+    monkeypatch.setattr(processor, "_execute_stages_4_9", analyse)
+    
+    processor.job_queue.pause()
+    task_id = await processor.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    job = processor.job_queue.take_waiting()[0]
+    await job.run()
+    
+    assert (await processor.task_store.get(task_id)).status == "cancelled"
+    assert analysed == []
+
+
+async def test_journal_round_trip(tmp_path):
+    journal = TaskJournal(tmp_path / "journal")
+    await journal.initialize()
+    
+    older = ProcessingContext(task_id="task-1", filename="a.pdf", created_at=1.0)
+    newer = ProcessingContext(task_id="task-2", filename="b.pdf", created_at=2.0)
+    await journal.open("task-2", tmp_path / "b.pdf", newer, cost=3.0)
+    await journal.open("task-1", tmp_path / "a.pdf", older, cost=1.0)
+    await journal.checkpoint("task-1", "extraction", {"text": "Aquisição"})
+    
+    assert [entry["task_id"] for entry in await journal.unfinished()] == ["task-1", "task-2"]
+    assert await journal.load("task-1", "extraction") == {"text": "Aquisição"}
+    assert await journal.load("task-1", "stage_4") is None
+    
+    # A damaged checkpoint is dropped and its stage runs again
+    (tmp_path / "journal" / "task-2" / "extraction.json.gz").write_bytes(b"not gzip")
+    assert await journal.load("task-2", "extraction") is None
+    
+    await journal.close("task-1")
+    assert [entry["task_id"] for entry in await journal.unfinished()] == ["task-2"]
+
+
+async def restarted(settings) -> DocumentProcessor:
+    """Processor with checkpoints on, storage initialized and the job queue not started"""
+    settings.enable_checkpoints = True
+    processor = DocumentProcessor(settings)
+    await processor.file_manager.initialize()
+    await processor.task_store.initialize()
+    await processor.result_index.initialize()
+    await processor.journal.initialize()
+    return processor
+
+
+async def test_restart_resumes_queued_task_after_its_checkpoint(settings, pdf_bytes, monkeypatch):
+    before = await restarted(settings)
+    task_id = await before.process_document(FakeUpload("edital.pdf", pdf_bytes), {"uasg": "986531"})
+    await before.journal.checkpoint(task_id, "extraction", extraction_result("edital.pdf").to_dict())
+    
+    # New process: empty in-memory task store, same storage
+    after = await restarted(settings)
+    await after._resume_unfinished()
+    
+    task = await after.task_store.get(task_id)
+    assert (task.status, task.stage_name) == ("pending", "Resuming after restart")
+    job = after.job_queue.take_waiting()[0]
+    assert job.job_id == task_id
+    
+    async def extract(*args, **kwargs):
+        raise AssertionError("extraction ran again")
+    
+    monkeypatch.setattr(after.extraction_engine, "extract", extract)
+    context = ProcessingContext.from_dict((await after.journal.unfinished())[0]["context"])
+    result = await after._execute_stages_1_3(task.file_path, context)
+    
+    assert result.markdown_content == "# edital"
+    assert (await after.task_store.get(task_id)).current_stage == 3
+
+
+async def test_restart_fails_task_whose_original_is_gone(settings, pdf_bytes):
+    before = await restarted(settings)
+    task_id = await before.process_document(FakeUpload("edital.pdf", pdf_bytes), {})
+    original = [entry["file_path"] for entry in await before.journal.unfinished()][0]
+    Path(original).unlink()
+    
+    await before._resume_unfinished()
+    
+    task = await before.task_store.get(task_id)
+    assert (task.status, task.error) == ("failed", "Original file lost during restart")
+    assert await before.journal.unfinished() == []
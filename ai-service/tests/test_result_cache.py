@@ -0,0 +1,70 @@
+"""
+Result cache: LRU bounded by result file bytes, filled by the file manager
+"""
+
+import json
+
+import pytest
+
+from src.models.pipeline_models import ProcessingContext
+from src.storage.file_manager import FileManager
+from src.storage.result_cache import ResultCache
+
+
+def test_least_recently_used_result_is_evicted():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a.json", {"task_id": "a"}, 40)
+    cache.put("b.json", {"task_id": "b"}, 40)
+    assert cache.get("a.json") == {"task_id": "a"}
+    
+    cache.put("c.json", {"task_id": "c"}, 40)
+    
+    assert cache.get("b.json") is None
+    assert cache.get("a.json") is not None
+    assert cache.get("c.json") is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["size_bytes"], stats["evictions"]) == (2, 80, 1)
+
+
+def test_oversized_result_is_not_cached():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a.json", {"task_id": "a"}, 101)
+    
+    assert cache.get("a.json") is None
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a.json", {"task_id": "a"}, 40)
+    cache.put("a.json", {"task_id": "a"}, 60)
+    
+    assert cache.stats()["size_bytes"] == 60
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.fixture
+async def file_manager(settings):
+    manager = FileManager(settings)
+    await manager.initialize()
+    return manager
+
+
+async def test_sizes_are_encoded_bytes(file_manager, tmp_path):
+    # Portuguese text takes more bytes than characters
+    source = tmp_path / "result.json"
+    source.write_text(json.dumps({
+        "task_id": "task-1",
+        "processing_metadata": {},
+        "structured_data": {"objeto": "Aquisição de licença de informática"}
+    }, ensure_ascii=False), encoding="utf-8")
+    
+    data = await file_manager.read_result(source)
+    assert await file_manager.read_result(source) is data
+    assert file_manager.result_cache.stats()["size_bytes"] == source.stat().st_size
+    
+    context = ProcessingContext(task_id="task-2", filename="copia.pdf", uasg="986531")
+    linked = await file_manager.link_result(source, "task-1", context)
+    
+    assert file_manager.result_cache.get(linked)["structured_data"] == data["structured_data"]
+    assert file_manager.result_cache.stats()["size_bytes"] == source.stat().st_size + linked.stat().st_size
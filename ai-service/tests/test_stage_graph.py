@@ -0,0 +1,119 @@
+"""
+Stage scheduler: independent stages overlap, dependants wait for their inputs
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.models.extraction_models import ProcessingStage
+from src.pipeline.stage_graph import StageDefinition, StageScheduler
+
+
+def stage(stage_id, inputs, outputs, seconds=0.0, log=None, use_thread=False, fail=False):
+    async def run(**kwargs):
+        if log is not None:
+            log.append(("start", stage_id))
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError(f"stage {stage_id} failed")
+        if log is not None:
+            log.append(("end", stage_id))
+        return {key: f"{key} from {sorted(kwargs)}" for key in outputs}
+    
+    return StageDefinition(stage_id, f"Stage {stage_id}", inputs, outputs, run, 0.9, use_thread)
+
+
+def test_duplicate_producer_is_rejected():
+    with pytest.raises(ValueError, match="produced more than once"):
+        StageScheduler([stage(4, ["doc"], ["a"]), stage(5, ["doc"], ["a"])], initial_keys=["doc"])
+
+
+def test_unresolved_input_is_rejected():
+    with pytest.raises(ValueError, match="unresolved inputs"):
+        StageScheduler([stage(4, ["missing"], ["a"])], initial_keys=["doc"])
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        StageScheduler([stage(4, ["b"], ["a"]), stage(5, ["a"], ["b"])], initial_keys=["doc"])
+
+
+async def test_independent_stages_run_concurrently():
+    log = []
+    scheduler = StageScheduler([
+        stage(4, ["doc"], ["risks"], 0.2, log),
+        stage(5, ["doc"], ["opportunities"], 0.2, log),
+        stage(6, ["risks", "opportunities"], ["report"], 0.0, log)
+    ], initial_keys=["doc"])
+    
+    state = {"doc": "edital"}
+    started = time.monotonic()
+    records = await scheduler.run(state)
+    
+    # Both analyses overlap; the report waits for both
+    assert time.monotonic() - started < 0.35
+    assert log[:2] == [("start", 4), ("start", 5)]
+    assert log[-2:] == [("start", 6), ("end", 6)]
+    assert state["report"] == "report from ['opportunities', 'risks']"
+    assert [record.stage_id for record in records] == [4, 5, 6]
+
+
+async def test_callbacks_and_thread_stages():
+    events = []
+    
+    async def on_start(definition):
+        events.append(("start", definition.stage_id))
+    
+    async def on_complete(definition, record):
+        events.append(("complete", definition.stage_id, record.status))
+    
+    scheduler = StageScheduler([
+        stage(4, ["doc"], ["a"], use_thread=True),
+        stage(5, ["a"], ["b"])
+    ], initial_keys=["doc"])
+    records = await scheduler.run({"doc": "edital"}, on_start, on_complete)
+    
+    assert events == [("start", 4), ("complete", 4, "completed"), ("start", 5), ("complete", 5, "completed")]
+    # CPU time is measured for thread stages only
+    assert records[0].cpu_seconds is not None
+    assert records[1].cpu_seconds is None
+
+
+async def test_completed_stages_are_not_run_again():
+    log = []
+    scheduler = StageScheduler([
+        stage(4, ["doc"], ["a"], log=log),
+        stage(5, ["a"], ["b"], log=log)
+    ], initial_keys=["doc"])
+    earlier = ProcessingStage(stage_id=4, stage_name="Stage 4", duration_seconds=3.0,
+                              status="completed", confidence=0.9)
+    
+    records = await scheduler.run({"doc": "edital", "a": "saved"}, completed={4: earlier})
+    
+    assert log == [("start", 5), ("end", 5)]
+    assert records[0] is earlier
+
+
+async def test_failing_stage_cancels_the_others():
+    log = []
+    scheduler = StageScheduler([
+        stage(4, ["doc"], ["a"], 0.05, fail=True),
+        stage(5, ["doc"], ["b"], 5.0, log)
+    ], initial_keys=["doc"])
+    
+    with pytest.raises(RuntimeError, match="stage 4 failed"):
+        await asyncio.wait_for(scheduler.run({"doc": "edital"}), timeout=2)
+    await asyncio.sleep(0)
+    assert ("end", 5) not in log
+
+
+async def test_missing_output_fails_the_stage():
+    async def run(doc):
+        return {}
+    
+    scheduler = StageScheduler([StageDefinition(4, "Stage 4", ["doc"], ["a"], run, 0.9, False)],
+                               initial_keys=["doc"])
+    with pytest.raises(RuntimeError, match="did not produce"):
+        await scheduler.run({"doc": "edital"})
@@ -0,0 +1,129 @@
+"""
+Task store contract, run against the in-memory and the Redis backend
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.models.pipeline_models import TaskStatus
+from src.storage.task_store import ACTIVE_STATUSES, InMemoryTaskStore, RedisTaskStore
+
+HEARTBEAT = 0.3
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def store(request):
+    if request.param == "memory":
+        store = InMemoryTaskStore(max_entries=100, terminal_ttl=60)
+    else:
+        request.getfixturevalue("fake_redis")
+        store = RedisTaskStore("redis://test", terminal_ttl=60, key_prefix="test:")
+    await store.initialize()
+    yield store
+    await store.close()
+
+
+def new_task(task_id: str = "task-1") -> TaskStatus:
+    return TaskStatus(task_id=task_id, status="pending", current_stage=0, total_stages=9)
+
+
+async def test_create_and_get(store):
+    await store.create(new_task())
+    
+    task = await store.get("task-1")
+    assert task.status == "pending"
+    assert task.version == 0
+    assert await store.get("unknown") is None
+
+
+async def test_update_bumps_version(store):
+    await store.create(new_task())
+    
+    updated = await store.update("task-1", status="processing", current_stage=2)
+    assert updated.status == "processing"
+    assert updated.current_stage == 2
+    assert updated.version == 1
+    assert (await store.get("task-1")).version == 1
+
+
+async def test_update_is_conditional_on_status(store):
+    await store.create(new_task())
+    await store.update("task-1", expected_status=ACTIVE_STATUSES, status="cancelled")
+    
+    # A pipeline update must not overwrite the cancellation
+    assert await store.update("task-1", expected_status=ACTIVE_STATUSES, current_stage=5) is None
+    task = await store.get("task-1")
+    assert task.status == "cancelled"
+    assert task.current_stage == 0
+    
+    assert await store.update("unknown", status="failed") is None
+
+
+async def test_delete(store):
+    await store.create(new_task())
+    await store.delete("task-1")
+    assert await store.get("task-1") is None
+
+
+async def test_batches(store):
+    batch = {
+        "batch_id": "batch-1",
+        "created_at": time.time(),
+        "documents": [{"task_id": "task-1", "filename": "a.pdf"}],
+        "skipped": []
+    }
+    await store.create_batch(batch)
+    assert await store.get_batch("batch-1") == batch
+    assert await store.get_batch("unknown") is None
+
+
+async def test_watch_waits_a_full_heartbeat(store):
+    await store.create(new_task())
+    watch = store.watch("task-1", heartbeat=HEARTBEAT)
+    
+    assert (await watch.__anext__()).version == 0
+    
+    started = time.monotonic()
+    assert await watch.__anext__() is None
+    assert time.monotonic() - started >= HEARTBEAT * 0.9
+    
+    await watch.aclose()
+
+
+async def test_watch_yields_changes_until_terminal(store):
+    await store.create(new_task())
+    watch = store.watch("task-1", heartbeat=5)
+    assert (await watch.__anext__()).status == "pending"
+    
+    async def progress():
+        await asyncio.sleep(0.05)
+        await store.update("task-1", status="processing", current_stage=3)
+    
+    updater = asyncio.create_task(progress())
+    started = time.monotonic()
+    task = await watch.__anext__()
+    assert task.current_stage == 3
+    assert time.monotonic() - started < 2
+    await updater
+    
+    await store.update("task-1", status="completed", current_stage=9)
+    assert (await watch.__anext__()).status == "completed"
+    with pytest.raises(StopAsyncIteration):
+        await watch.__anext__()
+
+
+async def test_watch_ends_when_task_is_deleted(store):
+    await store.create(new_task())
+    watch = store.watch("task-1", heartbeat=5)
+    await watch.__anext__()
+    
+    async def remove():
+        await asyncio.sleep(0.05)
+        await store.delete("task-1")
+    
+    remover = asyncio.create_task(remove())
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(watch.__anext__(), timeout=2)
+    await remover
@@ -0,0 +1,28 @@
+"""
+Text-layer inspection: which pages can skip OCR
+"""
+
+from src.extractors.text_layer import measure_text_layer
+
+from conftest import make_pdf
+
+
+def test_scanned_pages_need_ocr_even_with_a_stamp(tmp_path):
+    source = make_pdf(tmp_path / "edital.pdf", ["text", "scan", "scan+stamp", "text"])
+    
+    coverage = measure_text_layer(source)
+    
+    assert coverage.pages == 4
+    assert coverage.text_pages == [True, False, False, True]
+    assert coverage.ratio == 0.5
+    assert coverage.to_dict() == {"pages": 4, "text_pages": 2, "ratio": 0.5}
+
+
+def test_unreadable_pdf_has_no_text_layer(tmp_path):
+    source = tmp_path / "edital.pdf"
+    source.write_bytes(b"not a pdf")
+    
+    coverage = measure_text_layer(source)
+    
+    assert coverage.pages == 0
+    assert coverage.ratio == 0.0
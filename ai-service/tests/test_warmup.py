@@ -0,0 +1,37 @@
+"""
+Built-in warm-up document: a valid one-page PDF that exercises layout, tables and OCR
+"""
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from src.extractors.text_layer import measure_text_layer
+from src.extractors.warmup import warmup_pdf
+
+
+def test_warmup_pdf_has_text_a_table_and_an_image(tmp_path):
+    source = tmp_path / "warmup.pdf"
+    source.write_bytes(warmup_pdf())
+    
+    pdf = pdfium.PdfDocument(str(source))
+    try:
+        assert len(pdf) == 1
+        page = pdf[0]
+        textpage = page.get_textpage()
+        text = textpage.get_text_range()
+        images = list(page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]))
+        textpage.close()
+        page.close()
+    finally:
+        pdf.close()
+    
+    assert "Pregao Eletronico 90001/2025" in text
+    assert "Caneta esferografica azul" in text
+    assert len(images) == 1
+    
+    # The text layer is real, so the fast path would not OCR it
+    assert measure_text_layer(source).text_pages == [True]
+
+
+def test_warmup_pdf_is_stable():
+    assert warmup_pdf() == warmup_pdf()
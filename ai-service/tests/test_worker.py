@@ -0,0 +1,57 @@
+"""
+Worker shutdown: stop() with every slot busy drains within the grace period
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.pipeline.job_broker import create_job_broker
+from src.worker import Worker
+
+GRACE = 0.5
+
+
+@pytest.fixture
+def worker(settings, fake_redis, monkeypatch):
+    settings.execution_mode = "distributed"
+    settings.task_store_backend = "redis"
+    settings.max_concurrent_jobs = 1
+    settings.shutdown_grace_period = GRACE
+    worker = Worker(settings)
+    
+    async def noop(*args, **kwargs):
+        pass
+    
+    async def run_forever(payload, final_attempt=False):
+        await asyncio.Event().wait()
+    
+    monkeypatch.setattr(worker.processor, "initialize", noop)
+    monkeypatch.setattr(worker.processor, "cleanup", noop)
+    monkeypatch.setattr(worker.processor, "run_job", run_forever)
+    return worker
+
+
+async def test_stop_with_all_slots_busy_drains_within_grace(worker, settings):
+    broker = create_job_broker(settings)
+    await broker.initialize()
+    await broker.enqueue("job-1", {"task_id": "job-1"})
+    
+    run = asyncio.create_task(worker.run())
+    while "job-1" not in worker.running:
+        await asyncio.sleep(0.01)
+    
+    # The only slot is taken, so the loop waits for a slot when stop() arrives
+    started = time.monotonic()
+    worker.stop()
+    await asyncio.wait_for(run, timeout=GRACE + 2)
+    
+    assert time.monotonic() - started < GRACE + 1
+    assert worker.running == {}
+    
+    # Interrupted by shutdown: back in the queue, attempt not used up
+    stats = await broker.stats()
+    assert stats["pending"] == 1
+    assert stats["processing"] == 0
+    await broker.close()